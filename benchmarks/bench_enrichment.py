@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark: WikipediaArtEnricher against a local stub Wikipedia.
+
+Starts a local HTTP server that emulates the endpoints the enricher uses
+(REST page summaries, action API search / revisions / pageimages, article
+HTML and upload.wikimedia.org images) with configurable latency and payload
+sizes, then enriches synthetic datasets with each runner and reports
+artworks/s, requests per artwork, CPU time and peak RSS.
+
+Every case runs in its own child process (the stub server stays in this
+one), so CPU time and peak RSS belong to that case alone; CPU time includes
+the image processes of the pipelined runner.
+
+Usage:
+    python benchmarks/bench_enrichment.py [--sizes 100,1000,10000] [--modes serial,async,pipeline]
+                                          [--latency-ms 20] [--image-kb 200] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Optional PIL import (for realistic JPEG payloads)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+# Every MISSING_EVERY-th artwork uses a title without an article, so it goes through search
+MISSING_EVERY = 10
+ARTWORKS_PER_PERIOD = 500
+
+INFOBOX = """{{{{Infobox artwork
+| image_file = {filename}
+| title = {title}
+| artist = [[{artist}]]
+| year = 1503
+| medium = [[Oil paint|Oil]] on poplar panel
+| dimensions = 77 cm × 53 cm
+| museum = [[Louvre]]
+| city = Paris
+| movement = [[Renaissance]]
+}}}}
+'''{title}''' is a synthetic artwork used for benchmarking.
+"""
+
+
+def synthetic_dataset(size: int) -> Dict[str, List[Dict]]:
+    """`size` artworks split into periods of ARTWORKS_PER_PERIOD."""
+    dataset = {}
+    for index in range(size):
+        title = f"Lost Work {index}" if index % MISSING_EVERY == MISSING_EVERY - 1 else f"Synthetic Artwork {index}"
+        period = f"Period {index // ARTWORKS_PER_PERIOD + 1}"
+        dataset.setdefault(period, []).append({
+            'title': title,
+            'artist': f"Artist {index % 97}",
+            'year': str(1400 + index % 600),
+            'region': 'Western Europe',
+        })
+    return dataset
+
+
+def make_image(size_kb: int) -> bytes:
+    """A noise JPEG of roughly size_kb (random bytes if PIL is missing)."""
+    target = size_kb * 1024
+    if not PIL_AVAILABLE:
+        return os.urandom(target)
+    side = max(16, int(math.sqrt(target)))
+    for _ in range(3):
+        pixels = os.urandom(side * side * 3)
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (side, side), pixels).save(buffer, 'JPEG', quality=90)
+        data = buffer.getvalue()
+        side = max(16, int(side * math.sqrt(target / len(data))))
+    return data
+
+
+class StubWikipediaHandler(BaseHTTPRequestHandler):
+    """Serves summaries, action API queries, article HTML and images for synthetic titles."""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args) -> None:
+        pass
+    
+    def send_body(self, body: bytes, content_type: str, status: int = 200) -> None:
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_json(self, obj, status: int = 200) -> None:
+        self.send_body(json.dumps(obj).encode('utf-8'), 'application/json; charset=utf-8', status)
+    
+    def image_url(self, title: str) -> str:
+        return f"{self.server.base_url}/upload/wikipedia/commons/a/ab/{quote(title.replace(' ', '_'))}.jpg"
+    
+    @staticmethod
+    def exists(title: str) -> bool:
+        return title.startswith('Synthetic Artwork ')
+    
+    def page(self, title: str, prop: str) -> Dict:
+        page = {'ns': 0, 'title': title, 'pageid': int(title.rsplit(' ', 1)[1]) + 1}
+        if 'revisions' in prop:
+            wikitext = INFOBOX.format(title=title, artist='Artist', filename=title.replace(' ', '_') + '.jpg')
+            page['revisions'] = [{'slots': {'main': {'*': wikitext + self.server.wikitext_padding}}}]
+        if 'pageimages' in prop:
+            page['original'] = {'source': self.image_url(title), 'width': 4000, 'height': 3000}
+            page['thumbnail'] = {'source': self.image_url(title), 'width': 2000, 'height': 1500}
+        return page
+    
+    def do_HEAD(self) -> None:
+        self.do_GET()
+    
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        path = unquote(parts.path)
+        
+        if path.startswith('/api/rest_v1/page/summary/'):
+            title = path.rsplit('/', 1)[1].replace('_', ' ')
+            if not self.exists(title):
+                return self.send_json({'type': 'not_found', 'title': 'Not found.'}, 404)
+            return self.send_json({
+                'title': title,
+                'extract': f"{title} is a synthetic artwork. " + self.server.summary_padding,
+                'thumbnail': {'source': self.image_url(title), 'width': 320, 'height': 240},
+            })
+        
+        if path == '/w/api.php':
+            if query.get('list') == 'search':
+                # "Lost Work N" resolves to "Synthetic Artwork N"
+                number = query.get('srsearch', '').rsplit(' ', 1)[-1]
+                hits = [{'title': f"Synthetic Artwork {number}"}] if number.isdigit() else []
+                return self.send_json({'query': {'search': hits}})
+            pages = {}
+            for index, title in enumerate(query.get('titles', '').split('|')):
+                if self.exists(title):
+                    page = self.page(title, query.get('prop', ''))
+                    pages[str(page['pageid'])] = page
+                else:
+                    pages[str(-index - 1)] = {'ns': 0, 'title': title, 'missing': ''}
+            return self.send_json({'batchcomplete': '', 'query': {'pages': pages}})
+        
+        if path.startswith('/wiki/'):
+            title = path[len('/wiki/'):].replace('_', ' ')
+            if not self.exists(title):
+                return self.send_body(b'<html><body>Not found</body></html>', 'text/html; charset=utf-8', 404)
+            html = (f'<html><body><div class="mw-parser-output"><table class="infobox"><tr><td>'
+                    f'<img src="{self.image_url(title)}"></td></tr></table>'
+                    f'<p>{self.server.html_padding}</p><h2>History</h2></div></body></html>')
+            return self.send_body(html.encode('utf-8'), 'text/html; charset=utf-8')
+        
+        if path.startswith('/upload/'):
+            return self.send_body(self.server.image, 'image/jpeg')
+        
+        self.send_json({'type': 'not_found'}, 404)
+
+
+def start_server(latency_ms: float, image_kb: int, wikitext_kb: int, html_kb: int,
+                 summary_kb: int) -> ThreadingHTTPServer:
+    """Start the stub server on a free local port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWikipediaHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.image = make_image(image_kb)
+    server.wikitext_padding = "\n== History ==\nLorem ipsum dolor sit amet. " * (wikitext_kb * 1024 // 48)
+    server.html_padding = "Lorem ipsum dolor sit amet. " * (html_kb * 1024 // 28)
+    server.summary_padding = "Lorem ipsum dolor sit amet. " * (summary_kb * 1024 // 28)
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_case(config: Dict) -> Dict:
+    """Enrich one synthetic dataset against the stub server (runs in a child process)."""
+    import enrich_dataset as ed
+    
+    base_url = config['base_url']
+    
+    class StubEnricher(ed.WikipediaArtEnricher):
+        WIKIPEDIA_API_URL = f"{base_url}/api/rest_v1"
+        WIKIPEDIA_PAGE_URL = f"{base_url}/wiki"
+        WIKIPEDIA_ACTION_API_URL = f"{base_url}/w/api.php"
+    
+    dataset = synthetic_dataset(config['size'])
+    finished = 0
+    
+    def on_result(period: str, index: int, enriched: Dict) -> None:
+        nonlocal finished
+        finished += 1
+    
+    with tempfile.TemporaryDirectory() as images_dir:
+        enricher = StubEnricher(images_dir=images_dir, requests_per_second=config['rate'], burst=config['rate'])
+        mode, concurrency = config['mode'], config['concurrency']
+        start = time.monotonic()
+        # The enricher's progress lines are part of the cost but not of the report
+        with contextlib.redirect_stdout(io.StringIO()) if config['quiet'] else contextlib.nullcontext():
+            if mode == 'pipeline':
+                ed.enrich_dataset_pipelined(enricher, dataset, concurrency, config['cpu_workers'], on_result=on_result)
+            elif mode == 'async':
+                asyncio.run(ed.enrich_dataset_async(enricher, dataset, concurrency, on_result=on_result))
+            else:
+                ed.enrich_dataset_serial(enricher, dataset, on_result=on_result)
+        elapsed = time.monotonic() - start
+        images = len(os.listdir(images_dir))
+    
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'size': config['size'],
+        'mode': mode,
+        'artworks': finished,
+        'images': images,
+        'seconds': elapsed,
+        'artworks_per_second': finished / elapsed if elapsed else 0.0,
+        'requests_per_artwork': enricher.stats['requests'] / max(1, finished),
+        'cpu_seconds': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'peak_rss_mb': max(own.ru_maxrss, children.ru_maxrss) / 1024,  # ru_maxrss is in KB on Linux
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark enrichment end to end against a stub Wikipedia.")
+    parser.add_argument('--sizes', default='100,1000,10000', help="dataset sizes (default: 100,1000,10000)")
+    parser.add_argument('--modes', default='serial,async,pipeline', help="runners (default: serial,async,pipeline)")
+    parser.add_argument('--concurrency', type=int, default=8, help="artworks in flight / I/O workers (default: 8)")
+    parser.add_argument('--cpu-workers', type=int, default=None, help="image processes in pipeline mode")
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help="requests per second allowed by the rate limiter (default: 1000)")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="stub response latency (default: 20)")
+    parser.add_argument('--image-kb', type=int, default=200, help="image payload size (default: 200)")
+    parser.add_argument('--wikitext-kb', type=int, default=40, help="article wikitext size (default: 40)")
+    parser.add_argument('--html-kb', type=int, default=100, help="article HTML size (default: 100)")
+    parser.add_argument('--summary-kb', type=int, default=1, help="summary extract size (default: 1)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="show the enricher's progress output")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(run_case(json.loads(args.child))))
+        return
+    
+    server = start_server(args.latency_ms, args.image_kb, args.wikitext_kb, args.html_kb, args.summary_kb)
+    print(f"Stub Wikipedia at {server.base_url}: {args.latency_ms:g} ms latency, "
+          f"{len(server.image) / 1024:.0f} KB images, {args.wikitext_kb} KB wikitext, {args.html_kb} KB HTML")
+    print(f"{'size':>6} {'mode':<9} {'seconds':>8} {'artworks/s':>10} {'req/artwork':>11} {'CPU s':>7} {'peak RSS MB':>11}")
+    
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        for mode in args.modes.split(','):
+            config = {
+                'base_url': server.base_url, 'size': size, 'mode': mode, 'concurrency': args.concurrency,
+                'cpu_workers': args.cpu_workers, 'rate': args.rate, 'quiet': not args.verbose,
+            }
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)],
+                                   stdout=subprocess.PIPE, text=True)
+            if child.returncode != 0:
+                print(f"{size:>6} {mode:<9} failed (exit code {child.returncode})")
+                continue
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{size:>6} {mode:<9} {result['seconds']:>8.1f} {result['artworks_per_second']:>10.1f} "
+                  f"{result['requests_per_artwork']:>11.2f} {result['cpu_seconds']:>7.1f} {result['peak_rss_mb']:>11.0f}")
+    
+    server.shutdown()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Compares the single-pass infobox parser with the old per-field regex scans.
+
+The new parser is a correctness fix: the old scans cut values at the first
+pipe or template, so piped links, {{convert}} and <ref>s came out mangled.
+For the wikitext fixtures in benchmarks/fixtures/wikitext (and, optionally,
+every article wikitext stored in the enrichment response cache) this prints
+the fields the two parsers disagree on, then the time per article.
+
+Fixtures named *.excerpt.wikitext are hand-written excerpts (infobox plus
+the first sections, 4-9 KB); on them the new parser is no faster than the
+old one (0.8-1.0x). The others are full article revisions saved with
+--fetch, whose revision ids are kept in revisions.json. None are checked in
+yet, so no speedup is claimed for real articles.
+
+Usage:
+    python benchmarks/bench_infobox.py [--cache .wikipedia_cache.sqlite] [--number 200]
+    python benchmarks/bench_infobox.py --fetch "Mona Lisa" "The Starry Night"  (needs network access)
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import timeit
+import zlib
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from wikitext import parse_infobox
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'wikitext')
+REVISIONS_FILE = os.path.join(FIXTURES_DIR, 'revisions.json')
+EXCERPT_SUFFIX = '.excerpt.wikitext'
+
+ACTION_API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = 'ArtDatasetEnricher/1.0 (https://example.com/contact)'
+
+
+def legacy_parse_infobox(content: str) -> Dict:
+    """The previous WikipediaArtEnricher._parse_infobox, kept for comparison."""
+    data = {}
+    
+    location_patterns = [
+        r'\|\s*location\s*=\s*([^\n|]+)',
+        r'\|\s*museum\s*=\s*([^\n|]+)',
+        r'\|\s*collection\s*=\s*([^\n|]+)',
+        r'\|\s*repository\s*=\s*([^\n|]+)'
+    ]
+    dimensions_patterns = [
+        r'\|\s*dimensions\s*=\s*([^\n|]+)',
+        r'\|\s*size\s*=\s*([^\n|]+)',
+        r'\|\s*height\s*=\s*([^\n|]+)'
+    ]
+    
+    for pattern in location_patterns:
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match and 'location' not in data:
+            value = match.group(1).strip()
+            value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)
+            value = re.sub(r'\{\{.*?\}\}', '', value)
+            data['location'] = value
+            break
+    
+    for pattern in dimensions_patterns:
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match and 'dimensions' not in data:
+            value = match.group(1).strip()
+            value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)
+            value = re.sub(r'\{\{.*?\}\}', '', value)
+            data['dimensions'] = value
+            break
+    
+    single_patterns = {
+        'medium': r'\|\s*medium\s*=\s*([^\n|]+)',
+        'style': r'\|\s*style\s*=\s*([^\n|]+)',
+        'movement': r'\|\s*movement\s*=\s*([^\n|]+)',
+    }
+    
+    for key, pattern in single_patterns.items():
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match and key not in data:
+            value = match.group(1).strip()
+            value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)
+            value = re.sub(r'\{\{.*?\}\}', '', value)
+            data[key] = value
+    
+    return data
+
+
+def load_fixtures(excerpts: bool) -> List[Tuple[str, str]]:
+    """Load (name, wikitext) pairs of the excerpt fixtures, or of the full revisions."""
+    articles = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith('.wikitext') and name.endswith(EXCERPT_SUFFIX) == excerpts:
+            with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+                articles.append((name[:-len('.wikitext')], f.read()))
+    return articles
+
+
+def fetch_revisions(titles: List[str]) -> None:
+    """Save the current revision of each article as a fixture and record its revision id."""
+    import requests
+    
+    revisions = {}
+    if os.path.exists(REVISIONS_FILE):
+        with open(REVISIONS_FILE, 'r', encoding='utf-8') as f:
+            revisions = json.load(f)
+    response = requests.get(ACTION_API_URL, headers={'User-Agent': USER_AGENT}, timeout=30, params={
+        'action': 'query', 'prop': 'revisions', 'rvprop': 'ids|content', 'rvslots': 'main',
+        'titles': '|'.join(titles), 'redirects': 1, 'format': 'json', 'formatversion': 2,
+    })
+    response.raise_for_status()
+    for page in response.json()['query']['pages']:
+        if page.get('missing') or not page.get('revisions'):
+            print(f"  ❌ {page['title']}: not found")
+            continue
+        revision = page['revisions'][0]
+        name = page['title'].replace(' ', '_')
+        with open(os.path.join(FIXTURES_DIR, f"{name}.wikitext"), 'w', encoding='utf-8') as f:
+            f.write(revision['slots']['main']['content'])
+        revisions[name] = revision['revid']
+        print(f"  ✓ {page['title']}: revision {revision['revid']}, {len(revision['slots']['main']['content'])} chars")
+    with open(REVISIONS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(revisions, f, indent=2, sort_keys=True)
+
+
+def load_from_cache(cache_file: str) -> List[Tuple[str, str]]:
+    """Pull article wikitext out of cached action=query responses."""
+    articles = []
+    conn = sqlite3.connect(cache_file)
+    rows = conn.execute("SELECT body FROM responses WHERE url LIKE '%/w/api.php' AND status = 200")
+    for (body,) in rows:
+        try:
+            data = json.loads(zlib.decompress(body))
+        except ValueError:
+            continue
+        for page in data.get('query', {}).get('pages', {}).values():
+            for revision in page.get('revisions', [])[:1]:
+                content = revision.get('slots', {}).get('main', {}).get('*')
+                if content:
+                    articles.append((page.get('title', '?'), content))
+    conn.close()
+    return articles
+
+
+def time_parsers(content: str, number: int) -> Tuple[float, float]:
+    """Return (legacy, new) seconds per parse."""
+    legacy = min(timeit.repeat(lambda: legacy_parse_infobox(content), number=number, repeat=3)) / number
+    new = min(timeit.repeat(lambda: parse_infobox(content), number=number, repeat=3)) / number
+    return legacy, new
+
+
+def print_differences(articles: List[Tuple[str, str]]) -> None:
+    """Print, for each article, the fields the two parsers extract differently."""
+    print("Fields the parsers disagree on:")
+    for name, content in articles:
+        legacy, new = legacy_parse_infobox(content), parse_infobox(content)
+        fields = sorted(set(legacy) | set(new))
+        differing = [field for field in fields if legacy.get(field) != new.get(field)]
+        print(f"  {name}: {len(differing)} of {len(fields)} fields differ")
+        for field in differing:
+            print(f"    {field:<11} legacy: {legacy.get(field)!r}")
+            print(f"    {'':<11} new:    {new.get(field)!r}")
+
+
+def print_table(title: str, articles: List[Tuple[str, str]], number: int) -> None:
+    """Time both parsers on each article and print a table with the overall legacy/new time ratio."""
+    print(f"\n{title}:")
+    print(f"{'article':<40} {'size':>8} {'legacy µs':>10} {'new µs':>10} {'legacy/new':>10}")
+    total_legacy = total_new = 0.0
+    for name, content in articles:
+        legacy, new = time_parsers(content, number)
+        total_legacy += legacy
+        total_new += new
+        print(f"{name[:40]:<40} {len(content):>8} {legacy * 1e6:>10.1f} {new * 1e6:>10.1f} {legacy / new:>9.1f}x")
+    print(f"{len(articles)} articles: legacy {total_legacy * 1e3:.2f} ms, new {total_new * 1e3:.2f} ms "
+          f"({total_legacy / total_new:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the infobox parsers' output and timing.")
+    parser.add_argument('--cache', help="also use article wikitext found in this response cache")
+    parser.add_argument('--number', type=int, default=200, help="parses per article per run (default: 200)")
+    parser.add_argument('--fetch', nargs='+', metavar='TITLE',
+                        help="save the current revisions of these articles as fixtures and exit")
+    args = parser.parse_args()
+    
+    if args.fetch:
+        fetch_revisions(args.fetch)
+        return
+    
+    excerpts = load_fixtures(excerpts=True)
+    articles = load_fixtures(excerpts=False)
+    if args.cache:
+        articles.extend(load_from_cache(args.cache))
+    
+    print_differences(articles + excerpts)
+    if articles:
+        print_table("Full article revisions", articles, args.number)
+    else:
+        print("\nNo full article revisions (add some with --fetch, or read a response cache with --cache); "
+              "no speedup is claimed without them")
+    print_table("Hand-written excerpts", excerpts, args.number)
+
+
+if __name__ == "__main__":
+    main()
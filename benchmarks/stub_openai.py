@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenAI endpoints used by enrich_with_ai.py.
+
+Serves chat completions, file upload/download and the Batch API, so the
+async and batch modes (submit, poll, ingest) can be exercised offline. A
+completion echoes the art piece from the prompt with "type" and "region"
+filled in; batches complete a configurable time after submission. Usage
+reports cached tokens for system prompts seen before, like OpenAI's
+prompt cache.
+
+Usage:
+    python benchmarks/stub_openai.py [--port 8001] [--complete-after 5] [--fail-every 0] [--latency-ms 0]
+    OPENAI_API_KEY=stub python enrich_with_ai.py --batch --batch-poll 1 --base-url http://127.0.0.1:8001/v1
+"""
+
+import argparse
+import email.parser
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Set
+
+
+# Marks the JSON art piece in a create_prompt prompt
+CURRENT_DATA_MARKER = "CURRENT DATA"
+
+# Like OpenAI's prompt cache: prefixes of at least 1024 tokens, cached in 128-token steps
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+
+def _enrich(art_piece: Dict) -> Dict:
+    return {**art_piece, 'type': art_piece.get('type') or 'painting',
+            'region': art_piece.get('region') or 'Western Europe', 'year': art_piece.get('year') or 'c. 1500'}
+
+
+def fake_completion(body: Dict, number: int, cached_tokens: int = 0, drop_every: int = 0) -> Dict:
+    """A chat completion answering an enrichment prompt.
+    
+    Prompts with an array of art pieces get an array back, leaving out every
+    `drop_every`-th element (to exercise retries of single art pieces).
+    """
+    prompt = body['messages'][-1]['content']
+    data = {}
+    marker = prompt.find(CURRENT_DATA_MARKER)
+    starts = [index for index in (prompt.find('[', marker), prompt.find('{', marker)) if index >= 0]
+    if starts:
+        try:
+            data, _ = json.JSONDecoder().raw_decode(prompt[min(starts):])
+        except json.JSONDecodeError:
+            pass
+    if isinstance(data, list):
+        answer = [_enrich(art_piece) for index, art_piece in enumerate(data)
+                  if not (drop_every and (number + index) % drop_every == 0)]
+    else:
+        answer = _enrich(data)
+    prompt_tokens = sum(len(message['content']) for message in body['messages']) // 4
+    content = json.dumps(answer, indent=2, ensure_ascii=False)
+    return {
+        'id': f"chatcmpl-stub{number}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'stub'),
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                  'total_tokens': prompt_tokens + len(content) // 4,
+                  'prompt_tokens_details': {'cached_tokens': cached_tokens}},
+    }
+
+
+def _jsonl_bytes(rows) -> bytes:
+    return ''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8')
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Chat completions, /v1/files and /v1/batches backed by in-memory state."""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args) -> None:
+        pass
+    
+    def send_body(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_json(self, obj, status: int = 200) -> None:
+        self.send_body(json.dumps(obj).encode('utf-8'), 'application/json', status)
+    
+    def not_found(self) -> None:
+        self.send_json({'error': {'message': f"no route for {self.command} {self.path}", 'type': 'invalid_request_error'}},
+                       404)
+    
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    
+    def do_POST(self) -> None:
+        server = self.server
+        if self.path == '/v1/chat/completions':
+            body = json.loads(self.read_body())
+            time.sleep(server.latency)
+            number = next(server.counter)
+            if server.fail_every and number % server.fail_every == 0:
+                self.send_json({'error': {'message': 'stub failure', 'type': 'server_error'}}, 500)
+                return
+            self.send_json(fake_completion(body, number, server.cached_tokens(body), server.fail_every))
+        elif self.path == '/v1/files':
+            message = email.parser.BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + self.read_body())
+            fields = {part.get_param('name', header='content-disposition'): part for part in message.get_payload()}
+            data = fields['file'].get_payload(decode=True)
+            file_object = server.add_file(data, fields['file'].get_filename() or 'upload.jsonl',
+                                          fields['purpose'].get_payload(decode=True).decode('utf-8'))
+            self.send_json(file_object)
+        elif self.path == '/v1/batches':
+            request = json.loads(self.read_body())
+            self.send_json(server.create_batch(request))
+        elif self.path.startswith('/v1/batches/') and self.path.endswith('/cancel'):
+            batch = server.batches.get(self.path.split('/')[3])
+            if batch is None:
+                return self.not_found()
+            batch['status'] = 'cancelled'
+            self.send_json(batch)
+        else:
+            self.not_found()
+    
+    def do_GET(self) -> None:
+        server = self.server
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:2] == ['v1', 'batches'] and len(parts) == 3:
+            batch = server.refresh_batch(parts[2])
+            return self.send_json(batch) if batch else self.not_found()
+        if parts[:2] == ['v1', 'files'] and len(parts) in (3, 4):
+            entry = server.files.get(parts[2])
+            if entry is None:
+                return self.not_found()
+            if len(parts) == 4 and parts[3] == 'content':
+                return self.send_body(entry['data'], 'application/octet-stream')
+            return self.send_json(entry['object'])
+        self.not_found()
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """Holds uploaded files and batches; batches complete `complete_after` seconds after creation."""
+    
+    daemon_threads = True
+    
+    def __init__(self, address, complete_after: float = 5.0, fail_every: int = 0, latency: float = 0.0):
+        super().__init__(address, StubOpenAIHandler)
+        self.complete_after = complete_after
+        self.fail_every = fail_every
+        self.latency = latency
+        self.counter = itertools.count(1)
+        self.files: Dict[str, Dict] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.cached_prefixes: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    def cached_tokens(self, body: Dict) -> int:
+        """Tokens of the system message a repeated request would get from the prompt cache."""
+        prefix = body['messages'][0]['content']
+        tokens = len(prefix) // 4
+        if tokens < CACHE_MIN_TOKENS:
+            return 0
+        with self._lock:
+            if prefix not in self.cached_prefixes:
+                self.cached_prefixes.add(prefix)
+                return 0
+        return tokens // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS
+    
+    def add_file(self, data: bytes, filename: str, purpose: str) -> Dict:
+        with self._lock:
+            file_id = f"file-stub{len(self.files) + 1}"
+            file_object = {'id': file_id, 'object': 'file', 'bytes': len(data), 'created_at': int(time.time()),
+                           'filename': filename, 'purpose': purpose, 'status': 'processed'}
+            self.files[file_id] = {'object': file_object, 'data': data}
+        return file_object
+    
+    def create_batch(self, request: Dict) -> Dict:
+        with self._lock:
+            batch_id = f"batch_stub{len(self.batches) + 1}"
+            lines = self.files[request['input_file_id']]['data'].decode('utf-8').splitlines()
+            batch = {
+                'id': batch_id, 'object': 'batch', 'endpoint': request['endpoint'], 'errors': None,
+                'input_file_id': request['input_file_id'], 'completion_window': request['completion_window'],
+                'status': 'validating', 'output_file_id': None, 'error_file_id': None,
+                'created_at': int(time.time()), 'metadata': request.get('metadata'),
+                'request_counts': {'total': len([line for line in lines if line.strip()]), 'completed': 0, 'failed': 0},
+            }
+            self.batches[batch_id] = batch
+        return batch
+    
+    def refresh_batch(self, batch_id: str) -> Optional[Dict]:
+        """Advance a batch: in_progress right away, completed (with output files) after complete_after seconds."""
+        batch = self.batches.get(batch_id)
+        if batch is None or batch['status'] in ('completed', 'cancelled'):
+            return batch
+        if time.time() - batch['created_at'] < self.complete_after:
+            batch['status'] = 'in_progress'
+            return batch
+        outputs, errors = [], []
+        for line in self.files[batch['input_file_id']]['data'].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            number = next(self.counter)
+            if self.fail_every and number % self.fail_every == 0:
+                errors.append({'id': f"batch_req_{number}", 'custom_id': request['custom_id'], 'error': None,
+                               'response': {'status_code': 500, 'request_id': str(number),
+                                            'body': {'error': {'message': 'stub failure', 'type': 'server_error'}}}})
+            else:
+                outputs.append({'id': f"batch_req_{number}", 'custom_id': request['custom_id'], 'error': None,
+                                'response': {'status_code': 200, 'request_id': str(number),
+                                             'body': fake_completion(request['body'], number,
+                                                                     self.cached_tokens(request['body']))}})
+        batch['output_file_id'] = self.add_file(_jsonl_bytes(outputs), f"{batch_id}_output.jsonl", 'batch_output')['id']
+        if errors:
+            batch['error_file_id'] = self.add_file(_jsonl_bytes(errors), f"{batch_id}_error.jsonl", 'batch_output')['id']
+        batch['request_counts'].update(completed=len(outputs), failed=len(errors))
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+        return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI chat, files and batch APIs.")
+    parser.add_argument('--port', type=int, default=8001, help="port to listen on (default: 8001)")
+    parser.add_argument('--complete-after', type=float, default=5.0,
+                        help="seconds until a submitted batch completes (default: 5)")
+    parser.add_argument('--fail-every', type=int, default=0,
+                        help="fail every Nth request with a server error, and leave out every Nth "
+                             "element of array answers (default: never)")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="delay added to each chat completion (default: 0)")
+    args = parser.parse_args()
+    
+    server = StubOpenAIServer(('127.0.0.1', args.port), complete_after=args.complete_after,
+                              fail_every=args.fail_every, latency=args.latency_ms / 1000)
+    print(f"Stub OpenAI API on http://127.0.0.1:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
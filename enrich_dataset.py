@@ -6,104 +6,667 @@ This script enriches the art dataset by fetching comprehensive information
 from Wikipedia for each art piece and downloading the main images.
 """
 
+import argparse
+import asyncio
+import codecs
+import io
 import json
 import os
+import queue
 import re
+import threading
 import time
 import requests
-from urllib.parse import quote, unquote
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import quote, unquote, urlparse
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from html_images import ArticleImageScanner, is_svg_url
+from http_cache import HTTPCache
+from http_client import HTTPClient
+from http_fixtures import FixtureStore
+from image_store import ImageStore
+from journal import EnrichmentJournal
+from manifest import EnrichmentManifest, record_hash
+from rate_limit import HostRateLimiter
+from retry import RetryPolicy, is_maxlag
+from stage_trace import ArtworkTrace, StageTracer
+from wiki_dump import DumpPage, WikipediaDump
+from wikitext import parse_infobox
+
+# Characters not allowed in image filenames, and runs of whitespace/underscores
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+_FILENAME_GAPS_RE = re.compile(r'[\s_]+')
+
+# An original file on upload.wikimedia.org that Wikimedia can render thumbnails of
+_UPLOAD_ORIGINAL_RE = re.compile(
+    r'^(https://upload\.wikimedia\.org/wikipedia/[^/]+)/([0-9a-f]/[0-9a-f]{2})/([^/]+\.(?:jpe?g|png|gif|webp))$',
+    re.IGNORECASE,
+)
+
+# Receives (period, index within the period, enriched art piece) as each artwork finishes
+ResultCallback = Callable[[str, int, Dict], None]
+
+# Most pixels we are willing to hold decoded for one image (after JPEG draft scaling)
+MAX_DECODE_PIXELS = 60_000_000
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageFile
     PIL_AVAILABLE = True
-    # Increase PIL's decompression bomb limit to handle very large images
-    Image.MAX_IMAGE_PIXELS = None
+    # Raise PIL's decompression bomb limit to handle very large artwork scans;
+    # download_image enforces MAX_DECODE_PIXELS itself
+    Image.MAX_IMAGE_PIXELS = 500_000_000
 except ImportError:
     PIL_AVAILABLE = False
 
 
+def encode_jpeg_to_size(img: "Image.Image", max_bytes: int, min_quality: int = 50,
+                        max_quality: int = 85, quality_step: int = 5) -> Tuple[bytes, int, int]:
+    """Encode an RGB image as JPEG no larger than max_bytes, keeping quality as high as possible.
+    
+    Binary-searches quality (in quality_step increments) between min_quality and
+    max_quality. If even min_quality is too large the image is scaled down by
+    the estimated ratio and the search repeats. All encodes happen in memory.
+    
+    Returns (jpeg_bytes, quality, number_of_encode_passes).
+    """
+    passes = 0
+    
+    def encode(image, quality):
+        nonlocal passes
+        passes += 1
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+    
+    qualities = list(range(min_quality, max_quality + 1, quality_step))
+    if qualities[-1] != max_quality:
+        qualities.append(max_quality)
+    
+    while True:
+        # Most images fit at the top quality straight away
+        best = encode(img, qualities[-1])
+        if len(best) <= max_bytes:
+            return best, qualities[-1], passes
+        
+        # Highest quality index known to fit, and lowest known not to
+        lo, hi = -1, len(qualities) - 1
+        smallest = best
+        best = None
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            data = encode(img, qualities[mid])
+            if len(data) <= max_bytes:
+                lo, best = mid, data
+            else:
+                hi, smallest = mid, data
+        if best is not None:
+            return best, qualities[lo], passes
+        
+        # Still too large at min_quality: shrink by the estimated ratio and retry
+        width, height = img.size
+        if min(width, height) <= 16:
+            return smallest, min_quality, passes
+        scale = min(0.95, (max_bytes / len(smallest)) ** 0.5 * 0.95)
+        img = img.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.Resampling.LANCZOS)
+
+
+def check_decode_size(img: "Image.Image", max_dimension: int) -> None:
+    """Reject images whose decoded size would blow past MAX_DECODE_PIXELS.
+    
+    JPEGs are decoded in draft mode, so their budget is checked against the
+    reduced size the decoder will actually produce.
+    """
+    width, height = img.size
+    scale = 1
+    if img.format == 'JPEG':
+        ratio = max(width, height) // max_dimension
+        scale = next((s for s in (8, 4, 2, 1) if ratio >= s), 1)
+    decoded_pixels = -(-width // scale) * -(-height // scale)
+    if decoded_pixels > MAX_DECODE_PIXELS:
+        raise Image.DecompressionBombError(
+            f"image is {width}x{height} ({decoded_pixels} pixels to decode, limit {MAX_DECODE_PIXELS})"
+        )
+
+
+def shrink_image(img: "Image.Image", current_size_mb: float, max_size_mb: float = 1.0) -> Tuple[bytes, int, int]:
+    """Downscale and re-encode an image as JPEG under max_size_mb.
+    
+    Returns (jpeg_bytes, quality, number_of_encode_passes).
+    """
+    # Need to resize
+    max_dimension = 2000
+    
+    # Convert to RGB if necessary (for JPEG)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    width, height = img.size
+    quality = 85
+    
+    # If file is extremely large, aggressively reduce dimensions first
+    if current_size_mb > 10:
+        aggressive_max_dim = 1200
+        if max(width, height) > aggressive_max_dim:
+            if width > height:
+                new_width = aggressive_max_dim
+                new_height = int(height * (aggressive_max_dim / width))
+            else:
+                new_height = aggressive_max_dim
+                new_width = int(width * (aggressive_max_dim / height))
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    elif max(width, height) > max_dimension:
+        if width > height:
+            new_width = max_dimension
+            new_height = int(height * (max_dimension / width))
+        else:
+            new_height = max_dimension
+            new_width = int(width * (max_dimension / height))
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    
+    # Search for the best quality (and, if needed, scale) that fits the budget
+    return encode_jpeg_to_size(img, int(max_size_mb * 1024 * 1024), max_quality=quality)
+
+
+def _write_file(filepath: str, data: bytes) -> None:
+    """Write a file via a temp file, so an existing (possibly hardlinked) file is replaced, not overwritten."""
+    temp_path = filepath + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, filepath)
+
+
+def save_image_bytes(data: io.BytesIO, filepath: str, max_size_mb: float = 1.0) -> int:
+    """Write a buffer of downloaded image bytes to filepath, downscaled to be under max_size_mb.
+    
+    Returns the number of JPEG encode passes (0 if the bytes were stored unchanged).
+    """
+    # getvalue() shares the buffer's bytes instead of copying them
+    size_mb = len(data.getvalue()) / (1024 * 1024)
+    if size_mb <= max_size_mb or not PIL_AVAILABLE:
+        # Image is already small enough (or can't be resized), store it unchanged
+        _write_file(filepath, data.getvalue())
+        return 0
+    
+    try:
+        data.seek(0)
+        with Image.open(data) as img:
+            if img.format == 'JPEG':
+                # Let the JPEG decoder scale down by up to 8x while decoding
+                max_dimension = 1200 if size_mb > 10 else 2000
+                factor = max(img.size) / max_dimension
+                if factor > 1:
+                    img.draft(img.mode, (int(img.size[0] / factor), int(img.size[1] / factor)))
+            encoded, quality, passes = shrink_image(img, size_mb, max_size_mb)
+    except Image.DecompressionBombError:
+        raise
+    except Exception as e:
+        print(f"  Warning: Could not resize image: {e}")
+        # If resizing fails, just use the original
+        encoded, passes = data.getvalue(), 0
+    else:
+        print(f"  Encoded {len(encoded) / (1024 * 1024):.2f} MB JPEG at quality {quality} in {passes} passes")
+    
+    _write_file(filepath, encoded)
+    return passes
+
+
+def process_image_job(data: io.BytesIO, filepath: str, max_size_mb: float = 1.0) -> Tuple[int, float]:
+    """Image stage of the pipelined mode, run in a worker process.
+    
+    Returns (encode passes, seconds spent) for the utilization report.
+    """
+    started = time.perf_counter()
+    passes = save_image_bytes(data, filepath, max_size_mb)
+    return passes, time.perf_counter() - started
+
+
 class WikipediaArtEnricher:
     """Handles Wikipedia API interactions and data enrichment."""
     
     WIKIPEDIA_API_URL = "https://en.wikipedia.org/api/rest_v1"
     WIKIPEDIA_PAGE_URL = "https://en.wikipedia.org/wiki"
+    WIKIPEDIA_ACTION_API_URL = "https://en.wikipedia.org/w/api.php"
     
-    def __init__(self, images_dir: str = "images"):
-        """Initialize the enricher with an images directory."""
+    # The MediaWiki API accepts at most 50 pipe-joined titles per query
+    QUERY_BATCH_SIZE = 50
+    
+    USER_AGENT = 'ArtDatasetEnricher/1.0 (https://example.com/contact)'
+    
+    def __init__(self, images_dir: str = "images", requests_per_second: float = 5.0,
+                 burst: float = 10.0, cache: Optional[HTTPCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None, maxlag: Optional[int] = 5,
+                 thumbnail_width: Optional[int] = None, http: Optional[HTTPClient] = None,
+                 tracer: Optional[StageTracer] = None, metadata_for_existing_images: bool = False):
+        """Initialize the enricher with an images directory.
+        
+        Args:
+            images_dir: Directory where downloaded images are stored.
+            requests_per_second: Sustained request rate allowed per host.
+            burst: Number of requests per host that may be issued back to back.
+            cache: Optional persistent response cache for Wikipedia API calls.
+            retry_policy: Retry/backoff policy for transient failures (default: RetryPolicy()).
+            maxlag: MediaWiki maxlag parameter sent with action API requests (None to omit).
+            thumbnail_width: If set, download Wikimedia renditions at most this many
+                pixels wide instead of full-resolution originals.
+            http: Shared HTTP transport (default: a new HTTPClient).
+            tracer: Optional per-artwork stage tracer.
+            metadata_for_existing_images: If True, still look up the Wikipedia metadata of
+                artworks whose image already exists (only the image lookup is skipped).
+        """
         self.images_dir = images_dir
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'ArtDatasetEnricher/1.0 (https://example.com/contact)'
-        })
+        self.http = http or HTTPClient(user_agent=self.USER_AGENT)
+        self.session = self.http.session
+        self.rate_limiter = HostRateLimiter(rate=requests_per_second, burst=burst)
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.maxlag = maxlag
+        self.thumbnail_width = thumbnail_width
+        self.tracer = tracer
+        self.metadata_for_existing_images = metadata_for_existing_images
+        self.stats = {'requests': 0, 'throttle_seconds': 0.0, 'retries': 0, 'backoff_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+        # Filled by prefetch(): query -> resolved article title (None if not found),
+        # and article title -> page data (infobox fields and page images)
+        self._resolved_titles: Dict[str, Optional[str]] = {}
+        self._prefetched: Dict[str, Dict] = {}
+        # Thumbnail URL -> (original pixels, rendition pixels), to estimate the bytes thumbnails save
+        self._rendition_pixels: Dict[str, Tuple[int, int]] = {}
+        # Hashes of input records whose enrichment hit a transient failure, see mark_for_retry()
+        self._retry_hashes: Set[str] = set()
+        # Per-artwork fetch memo, see _memoized()
+        self._local = threading.local()
         os.makedirs(self.images_dir, exist_ok=True)
+        # One directory scan up front; existing-image checks are answered from memory
+        self.image_store = ImageStore(self.images_dir)
+    
+    def _count(self, key: str, amount: float = 1) -> None:
+        """Increment a stats counter (safe to call from worker threads)."""
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+    
+    def _trace(self) -> Optional[ArtworkTrace]:
+        """The trace of the artwork being enriched on this thread, if tracing."""
+        return getattr(self._local, 'trace', None)
+    
+    def _stage(self, name: str):
+        """Context manager timing a block as an enrichment stage of the current artwork."""
+        trace = self._trace()
+        return trace.stage(name) if trace is not None else nullcontext()
+    
+    def _trace_add(self, key: str, amount: float = 1) -> None:
+        trace = self._trace()
+        if trace is not None:
+            trace.add(key, amount)
+    
+    def _trace_note(self, key: str, value) -> None:
+        trace = self._trace()
+        if trace is not None:
+            trace.note(key, value)
+    
+    def _note_failure(self) -> None:
+        """Remember that a lookup for the artwork being enriched on this thread failed."""
+        self._local.failed = True
+    
+    def mark_for_retry(self, art_piece: Dict) -> None:
+        """Flag an art piece whose result came from a transient failure (safe to call from worker threads)."""
+        with self._stats_lock:
+            self._retry_hashes.add(record_hash(art_piece))
+    
+    def needs_retry(self, art_piece: Dict) -> bool:
+        """Whether an art piece hit a transient failure (failed request or download) in this run."""
+        with self._stats_lock:
+            return record_hash(art_piece) in self._retry_hashes
+    
+    def begin_trace(self, art_piece: Dict) -> Optional[ArtworkTrace]:
+        """Start tracing an artwork on this thread (no-op without a tracer)."""
+        if self.tracer is None:
+            return None
+        trace = ArtworkTrace(art_piece.get('title', 'Unknown'), art_piece.get('artist', 'Unknown'))
+        self._local.trace = trace
+        return trace
+    
+    def detach_trace(self) -> Optional[ArtworkTrace]:
+        """Stop tracing on this thread and return the trace (e.g. to finish it on another thread)."""
+        trace = self._trace()
+        self._local.trace = None
+        return trace
+    
+    def finish_trace(self, trace: Optional[ArtworkTrace]) -> None:
+        """Hand a finished artwork's trace to the tracer."""
+        if trace is not None:
+            self.tracer.write(trace)
+    
+    def _send(self, url: str, method: str = 'GET', **kwargs) -> requests.Response:
+        """Issue a request on the network, waiting for the per-host rate limiter first.
+        
+        Throttling responses, transient server errors, maxlag refusals and
+        connection errors are retried per self.retry_policy. Throttling also
+        slows the host down in the rate limiter until requests succeed again.
+        A maxlag refusal that outlasts the retries raises requests.HTTPError.
+        """
+        host = urlparse(url).netloc
+        if self.maxlag is not None and url == self.WIKIPEDIA_ACTION_API_URL:
+            kwargs['params'] = dict(kwargs.get('params') or {}, maxlag=self.maxlag)
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            waited = self.rate_limiter.acquire(host)
+            self._count('requests')
+            self._trace_add('requests')
+            if waited:
+                self._count('throttle_seconds', waited)
+                self._trace_add('rate_wait_seconds', waited)
+            response = None
+            try:
+                response = self.http.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= policy.max_retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                if not kwargs.get('stream'):
+                    self._trace_add('bytes', len(response.content))
+                if not policy.should_retry(response):
+                    self.rate_limiter.recover(host)
+                    return response
+                if attempt >= policy.max_retries:
+                    if is_maxlag(response):
+                        response.close()
+                        raise requests.HTTPError(f"{host} still refused with maxlag after {attempt} retries",
+                                                 response=response)
+                    return response
+                reason = 'maxlag' if response.status_code == 200 else f"HTTP {response.status_code}"
+                response.close()
+            
+            throttled = policy.is_throttled(response)
+            retry_after = policy.retry_after(response)
+            if throttled:
+                # Slow every worker down; a Retry-After pauses the host in the rate limiter
+                rate = self.rate_limiter.backoff(host, retry_after)
+                self._count('rate_reductions')
+                print(f"  ⚠️  {reason} from {host}, slowing to {rate:.2f} requests/s")
+            if not (throttled and retry_after is not None):
+                delay = retry_after if retry_after is not None else policy.backoff(attempt)
+                self._count('backoff_seconds', delay)
+                time.sleep(delay)
+            attempt += 1
+            self._count('retries')
+    
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """Issue a GET request, answering from the response cache when possible.
+        
+        Streaming requests (image downloads) always go to the network.
+        """
+        if self.cache is not None and not kwargs.get('stream'):
+            trace = self._trace()
+            if trace is None:
+                return self.cache.get(self._send, url, **kwargs)
+            sent = trace.record['requests']
+            response = self.cache.get(self._send, url, **kwargs)
+            if trace.record['requests'] == sent:
+                trace.add('cache_hits')
+            return response
+        return self._send(url, **kwargs)
     
     def sanitize_filename(self, text: str) -> str:
         """Sanitize text for use as filename."""
         # Replace problematic characters
-        text = re.sub(r'[<>:"/\\|?*]', '', text)
-        text = re.sub(r'\s+', '_', text)
-        text = re.sub(r'_+', '_', text)
+        text = _UNSAFE_FILENAME_RE.sub('', text)
+        text = _FILENAME_GAPS_RE.sub('_', text)
         text = text.strip('_')
         # Limit length
         if len(text) > 200:
             text = text[:200]
         return text
     
+    def _memoized(self, kind: str, title: str, fetch):
+        """Return fetch() once per (kind, title) while enriching a single artwork.
+        
+        Outside enrich_art_piece there is no memo and fetch() is always called.
+        """
+        memo = getattr(self._local, 'memo', None)
+        if memo is None:
+            return fetch()
+        key = (kind, title)
+        if key in memo:
+            self._count('memo_saved_requests')
+            self._trace_add('memo_hits')
+            return memo[key]
+        value = fetch()
+        memo[key] = value
+        return value
+    
+    def _fetch_summary(self, title: str) -> requests.Response:
+        """Fetch the REST page summary for a title."""
+        url = f"{self.WIKIPEDIA_API_URL}/page/summary/{quote(title)}"
+        return self._memoized('summary', title, lambda: self._get(url))
+    
+    def _fetch_page_query(self, title: str) -> Optional[Dict]:
+        """Fetch wikitext and page images for a title via the action API."""
+        def fetch():
+            params = {
+                'action': 'query',
+                'prop': 'revisions|pageimages',
+                'titles': title,
+                'rvprop': 'content',
+                'rvslots': 'main',
+                'piprop': 'original|thumbnail',
+                'pithumbsize': self.thumbnail_width or 2000,
+                'format': 'json'
+            }
+            response = self._get(self.WIKIPEDIA_ACTION_API_URL, params=params)
+            if response.status_code == 200:
+                pages = response.json().get('query', {}).get('pages', {})
+                if pages:
+                    return list(pages.values())[0]
+            return None
+        return self._memoized('wikitext', title, fetch)
+    
+    def _fetch_article_html(self, title: str) -> Optional[str]:
+        """Fetch the rendered article HTML for a title."""
+        def fetch():
+            response = self._get(f"{self.WIKIPEDIA_PAGE_URL}/{quote(title)}")
+            if response.status_code == 200:
+                return response.text
+            return None
+        return self._memoized('html', title, fetch)
+    
+    def _scan_article_images(self, title: str) -> Optional[ArticleImageScanner]:
+        """Scan the rendered article for its images, reading no further than needed.
+        
+        Without a response cache the page is streamed and the download is
+        abandoned as soon as the scanner has found the lead image. With a
+        cache the page is read whole (so it can be stored) and the scan still
+        stops early.
+        """
+        def fetch():
+            scanner = ArticleImageScanner()
+            if self.cache is not None:
+                html = self._fetch_article_html(title)
+                if html is None:
+                    return None
+                for start in range(0, len(html), 8192):
+                    scanner.feed(html[start:start + 8192])
+                    if scanner.done:
+                        break
+            else:
+                response = self._get(f"{self.WIKIPEDIA_PAGE_URL}/{quote(title)}", stream=True)
+                try:
+                    if response.status_code != 200:
+                        return None
+                    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+                    for chunk in response.iter_content(chunk_size=8192):
+                        scanner.feed(decoder.decode(chunk))
+                        if scanner.done:
+                            break
+                finally:
+                    response.close()
+            scanner.close()
+            return scanner
+        return self._memoized('html_scan', title, fetch)
+    
     def search_wikipedia(self, query: str) -> Optional[str]:
         """Search Wikipedia for an article title."""
+        if query in self._resolved_titles:
+            return self._resolved_titles[query]
         try:
-            search_url = f"{self.WIKIPEDIA_API_URL}/page/summary/{quote(query)}"
-            response = self.session.get(search_url, timeout=10)
+            response = self._fetch_summary(query)
             if response.status_code == 200:
                 return query
             elif response.status_code == 404:
                 # Try search API
-                search_api_url = "https://en.wikipedia.org/w/api.php"
-                params = {
-                    'action': 'query',
-                    'list': 'search',
-                    'srsearch': query,
-                    'format': 'json',
-                    'srlimit': 1
-                }
-                search_response = self.session.get(search_api_url, params=params, timeout=10)
-                if search_response.status_code == 200:
-                    data = search_response.json()
-                    if 'query' in data and 'search' in data['query'] and len(data['query']['search']) > 0:
-                        return data['query']['search'][0]['title']
+                return self._search_top_title(query)
             return None
         except Exception as e:
             print(f"  Error searching Wikipedia: {e}")
+            self._note_failure()
             return None
     
+    def _search_top_title(self, query: str) -> Optional[str]:
+        """Return the title of the best full-text search hit for a query."""
+        params = {
+            'action': 'query',
+            'list': 'search',
+            'srsearch': query,
+            'format': 'json',
+            'srlimit': 1
+        }
+        search_response = self._get(self.WIKIPEDIA_ACTION_API_URL, params=params)
+        if search_response.status_code == 200:
+            data = search_response.json()
+            if 'query' in data and 'search' in data['query'] and len(data['query']['search']) > 0:
+                return data['query']['search'][0]['title']
+        return None
+    
+    def _query_pages(self, titles: List[str]) -> Dict[str, Dict]:
+        """Fetch infobox wikitext and page images for many titles at once.
+        
+        Titles are sent QUERY_BATCH_SIZE at a time. Returns page data keyed by
+        the title as it was requested (before MediaWiki normalization).
+        """
+        pages_by_title = {}
+        for start in range(0, len(titles), self.QUERY_BATCH_SIZE):
+            batch = titles[start:start + self.QUERY_BATCH_SIZE]
+            params = {
+                'action': 'query',
+                'prop': 'revisions|pageimages',
+                'titles': '|'.join(batch),
+                'rvprop': 'content',
+                'rvslots': 'main',
+                'piprop': 'original|thumbnail',
+                'pithumbsize': self.thumbnail_width or 2000,
+                'pilimit': self.QUERY_BATCH_SIZE,
+                'format': 'json'
+            }
+            while True:
+                response = self._get(self.WIKIPEDIA_ACTION_API_URL, params=params)
+                if response.status_code != 200:
+                    break
+                data = response.json()
+                query = data.get('query', {})
+                normalized = {n['to']: n['from'] for n in query.get('normalized', [])}
+                for page in query.get('pages', {}).values():
+                    requested = normalized.get(page.get('title'), page.get('title'))
+                    pages_by_title.setdefault(requested, {}).update(
+                        {k: v for k, v in page.items() if k != 'revisions'}
+                    )
+                    if page.get('revisions'):
+                        pages_by_title[requested]['revisions'] = page['revisions']
+                # Large wikitext can spill over into continuation requests
+                if 'continue' not in data:
+                    break
+                params = {**params, **data['continue']}
+        return pages_by_title
+    
+    def _store_prefetched(self, title: str, page: Dict) -> None:
+        """Keep only what the per-artwork steps need from a prefetched page."""
+        content = None
+        if page.get('revisions'):
+            content = page['revisions'][0]['slots']['main']['*']
+        self._prefetched[title] = {
+            'original': page.get('original'),
+            'thumbnail': page.get('thumbnail'),
+            'infobox': self._parse_infobox(content) if content else {},
+        }
+    
+    def prefetch(self, titles: List[str]) -> None:
+        """Resolve titles, infobox data and image URLs for many artworks in a few requests.
+        
+        search_wikipedia, extract_infobox_data and get_image_url answer from
+        the prefetched data afterwards instead of querying one title at a time.
+        """
+        wanted = [t for t in dict.fromkeys(titles) if t not in self._resolved_titles]
+        if not wanted:
+            return
+        requests_before = self.stats['requests']
+        
+        try:
+            pages = self._query_pages(wanted)
+            searched = []
+            for title in wanted:
+                page = pages.get(title)
+                if page is None:
+                    continue  # Batch request failed; fall back to per-artwork lookups
+                if 'missing' in page or 'invalid' in page:
+                    # Same fallback as search_wikipedia: use the top search hit
+                    resolved = self._search_top_title(title)
+                    self._resolved_titles[title] = resolved
+                    if resolved and resolved not in self._prefetched:
+                        searched.append(resolved)
+                else:
+                    self._resolved_titles[title] = title
+                    self._store_prefetched(title, page)
+            
+            # Second round for articles found through search
+            if searched:
+                for title, page in self._query_pages(searched).items():
+                    if 'missing' not in page and 'invalid' not in page:
+                        self._store_prefetched(title, page)
+        except Exception as e:
+            print(f"  Error prefetching titles: {e}")
+        
+        print(f"Prefetched {len(self._prefetched)} articles for {len(wanted)} titles "
+              f"in {self.stats['requests'] - requests_before} requests")
+    
+    def clear_prefetched(self) -> None:
+        """Drop prefetched data (e.g. after finishing a period)."""
+        self._resolved_titles.clear()
+        self._prefetched.clear()
+    
     def get_page_summary(self, title: str) -> Optional[Dict]:
         """Get page summary/extract from Wikipedia."""
         try:
-            url = f"{self.WIKIPEDIA_API_URL}/page/summary/{quote(title)}"
-            response = self.session.get(url, timeout=10)
+            response = self._fetch_summary(title)
             if response.status_code == 200:
                 return response.json()
             return None
         except Exception as e:
             print(f"  Error getting summary: {e}")
+            self._note_failure()
             return None
     
     def get_page_content(self, title: str) -> Optional[Dict]:
         """Get full page content with infobox data."""
         try:
-            url = f"{self.WIKIPEDIA_API_URL}/page/html/{quote(title)}"
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
+            html = self._fetch_article_html(title)
+            if html is not None:
                 # Also get structured data
                 structured_url = f"{self.WIKIPEDIA_API_URL}/page/structured-content/{quote(title)}"
-                structured_response = self.session.get(structured_url, timeout=10)
+                structured_response = self._get(structured_url)
                 structured_data = None
                 if structured_response.status_code == 200:
                     structured_data = structured_response.json()
                 
                 return {
-                    'html': response.text,
+                    'html': html,
                     'structured': structured_data
                 }
             return None
@@ -115,145 +678,119 @@ class WikipediaArtEnricher:
         """Extract data from Wikipedia infobox using API."""
         infobox_data = {}
         
+        prefetched = self._prefetched.get(title)
+        if prefetched is not None:
+            if prefetched.get('original'):
+                infobox_data['image_url'] = prefetched['original']['source']
+            infobox_data.update(prefetched['infobox'])
+            return infobox_data
+        
         try:
-            api_url = "https://en.wikipedia.org/w/api.php"
-            params = {
-                'action': 'query',
-                'prop': 'revisions|pageimages',
-                'titles': title,
-                'rvprop': 'content',
-                'rvslots': 'main',
-                'piprop': 'original',
-                'pithumbsize': 2000,
-                'format': 'json'
-            }
-            response = self.session.get(api_url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                pages = data.get('query', {}).get('pages', {})
-                if pages:
-                    page_data = list(pages.values())[0]
-                    
-                    # Extract image
-                    if 'original' in page_data:
-                        original = page_data['original']
-                        if isinstance(original, dict) and 'source' in original:
-                            infobox_data['image_url'] = original['source']
-                    
-                    # Parse infobox from revision content
-                    if 'revisions' in page_data and len(page_data['revisions']) > 0:
-                        content = page_data['revisions'][0]['slots']['main']['*']
-                        infobox_data.update(self._parse_infobox(content))
+            # Same query also answers get_image_url's pageimages lookup
+            page_data = self._fetch_page_query(title)
+            if page_data:
+                # Extract image
+                if 'original' in page_data:
+                    original = page_data['original']
+                    if isinstance(original, dict) and 'source' in original:
+                        infobox_data['image_url'] = original['source']
+                
+                # Parse infobox from revision content
+                if 'revisions' in page_data and len(page_data['revisions']) > 0:
+                    content = page_data['revisions'][0]['slots']['main']['*']
+                    infobox_data.update(self._parse_infobox(content))
         except Exception as e:
             print(f"  Error extracting infobox: {e}")
+            self._note_failure()
         
         return infobox_data
     
     def _parse_infobox(self, content: str) -> Dict:
         """Parse infobox data from Wikipedia markup."""
-        data = {}
-        
-        # Extract common infobox fields (try multiple patterns for same field)
-        location_patterns = [
-            r'\|\s*location\s*=\s*([^\n|]+)',
-            r'\|\s*museum\s*=\s*([^\n|]+)',
-            r'\|\s*collection\s*=\s*([^\n|]+)',
-            r'\|\s*repository\s*=\s*([^\n|]+)'
-        ]
-        dimensions_patterns = [
-            r'\|\s*dimensions\s*=\s*([^\n|]+)',
-            r'\|\s*size\s*=\s*([^\n|]+)',
-            r'\|\s*height\s*=\s*([^\n|]+)'
-        ]
-        
-        # Try location patterns
-        for pattern in location_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match and 'location' not in data:
-                value = match.group(1).strip()
-                value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)  # Remove wikilinks
-                value = re.sub(r'\{\{.*?\}\}', '', value)  # Remove templates
-                data['location'] = value
-                break
-        
-        # Try dimensions patterns
-        for pattern in dimensions_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match and 'dimensions' not in data:
-                value = match.group(1).strip()
-                value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)
-                value = re.sub(r'\{\{.*?\}\}', '', value)
-                data['dimensions'] = value
-                break
-        
-        # Single patterns
-        single_patterns = {
-            'medium': r'\|\s*medium\s*=\s*([^\n|]+)',
-            'style': r'\|\s*style\s*=\s*([^\n|]+)',
-            'movement': r'\|\s*movement\s*=\s*([^\n|]+)',
-        }
-        
-        for key, pattern in single_patterns.items():
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match and key not in data:
-                value = match.group(1).strip()
-                value = re.sub(r'\[\[([^\]]+)\]\]', r'\1', value)
-                value = re.sub(r'\{\{.*?\}\}', '', value)
-                data[key] = value
-        
-        return data
+        return parse_infobox(content)
     
     def _is_svg_url(self, url: str) -> bool:
         """Check if a URL points to an SVG file (which we want to skip)."""
-        if not url:
-            return False
-        url_lower = url.lower()
-        # Check for .svg extension (may be URL-encoded or in query params)
-        return '.svg' in url_lower or '%2Esvg' in url_lower or '%2esvg' in url_lower
+        return bool(url) and is_svg_url(url)
     
     def get_image_url(self, title: str) -> Optional[str]:
-        """Get the main image URL for a Wikipedia article using multiple methods.
+        """Get the main image URL for a Wikipedia article.
+        
+        In thumbnail mode this is a Wikimedia rendition at most thumbnail_width
+        pixels wide, or the original if that is smaller.
+        """
+        image_url = self._find_image_url(title)
+        if image_url and self.thumbnail_width:
+            return self._sized_image_url(title, image_url)
+        return image_url
+    
+    def _sized_image_url(self, title: str, original_url: str) -> str:
+        """Pick the rendition of an original image to download in thumbnail mode."""
+        page_data = self._prefetched.get(title) or self._fetch_page_query(title) or {}
+        original = page_data.get('original')
+        if isinstance(original, dict) and original.get('source') == original_url and original.get('width'):
+            # pageimages reports the original's size and a rendition whose long side is pithumbsize
+            width, height = original['width'], original.get('height') or original['width']
+            if max(width, height) <= self.thumbnail_width:
+                return original_url
+            thumbnail = page_data.get('thumbnail')
+            if isinstance(thumbnail, dict) and thumbnail.get('source') and thumbnail.get('width'):
+                sized_url = thumbnail['source']
+                sized = (thumbnail['width'], thumbnail.get('height') or thumbnail['width'])
+            else:
+                # /thumb/ URLs only take a width; pick the one that bounds the long side
+                sized_width = max(1, self.thumbnail_width * width // max(width, height))
+                sized_url = self._original_to_thumbnail(original_url, sized_width)
+                sized = (sized_width, max(1, sized_width * height // width))
+            self._rendition_pixels[sized_url] = (width * height, sized[0] * sized[1])
+            return sized_url
+        # Unknown size: bounded by width only, the decoder downscales the rest
+        return self._original_to_thumbnail(original_url, self.thumbnail_width)
+    
+    def _original_to_thumbnail(self, original_url: str, width: int) -> str:
+        """Build the /thumb/ URL of a Wikimedia original rendered `width` pixels wide.
+        
+        URLs that aren't plain upload.wikimedia.org originals are returned unchanged.
+        """
+        match = _UPLOAD_ORIGINAL_RE.match(original_url)
+        if not match:
+            return original_url
+        base, hash_path, name = match.groups()
+        return f"{base}/thumb/{hash_path}/{name}/{width}px-{name}"
+    
+    def _find_image_url(self, title: str) -> Optional[str]:
+        """Get the original image URL for a Wikipedia article using multiple methods.
         Skips SVG files as they are usually logos/icons, not artwork photos."""
         try:
-            api_url = "https://en.wikipedia.org/w/api.php"
-            
             # Method 1: Try to get original image URL via pageimages API
-            params = {
-                'action': 'query',
-                'prop': 'pageimages',
-                'titles': title,
-                'piprop': 'original|thumbnail',
-                'pithumbsize': 2000,
-                'format': 'json'
-            }
-            response = self.session.get(api_url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                pages = data.get('query', {}).get('pages', {})
-                if pages:
-                    page_data = list(pages.values())[0]
-                    
-                    # Try original first
-                    if 'original' in page_data:
-                        original = page_data['original']
-                        if isinstance(original, dict) and 'source' in original:
-                            url = original['source']
-                            if not self._is_svg_url(url):
-                                return url
-                        elif isinstance(original, str):
-                            if not self._is_svg_url(original):
-                                return original
+            # (already known if the title was batch-prefetched)
+            page_data = self._prefetched.get(title)
+            if page_data is None:
+                page_data = self._fetch_page_query(title)
+            if page_data:
+                # Try original first
+                if 'original' in page_data:
+                    original = page_data['original']
+                    if isinstance(original, dict) and 'source' in original:
+                        url = original['source']
+                        if not self._is_svg_url(url):
+                            self._trace_note('image_method', 'pageimages')
+                            return url
+                    elif isinstance(original, str):
+                        if not self._is_svg_url(original):
+                            self._trace_note('image_method', 'pageimages')
+                            return original
             
-                    # Try thumbnail and convert to original
-                    if 'thumbnail' in page_data:
-                        thumbnail = page_data['thumbnail']
-                        if isinstance(thumbnail, dict) and 'source' in thumbnail:
-                            thumbnail_url = thumbnail['source']
-                            # Convert thumbnail URL to original
-                            original_url = self._thumbnail_to_original(thumbnail_url)
-                            if original_url and not self._is_svg_url(original_url):
-                                return original_url
+                # Try thumbnail and convert to original
+                if 'thumbnail' in page_data:
+                    thumbnail = page_data['thumbnail']
+                    if isinstance(thumbnail, dict) and 'source' in thumbnail:
+                        thumbnail_url = thumbnail['source']
+                        # Convert thumbnail URL to original
+                        original_url = self._thumbnail_to_original(thumbnail_url)
+                        if original_url and not self._is_svg_url(original_url):
+                            self._trace_note('image_method', 'pageimages')
+                            return original_url
             
             # Method 2: Try from page summary thumbnail
             summary = self.get_page_summary(title)
@@ -261,143 +798,87 @@ class WikipediaArtEnricher:
                 thumbnail_url = summary['thumbnail']['source']
                 original_url = self._thumbnail_to_original(thumbnail_url)
                 if original_url and not self._is_svg_url(original_url):
+                    self._trace_note('image_method', 'summary')
                     return original_url
             
-            # Method 3: Try parsing HTML for infobox image
+            # Methods 3-5: scan the rendered article HTML
             try:
-                page_url = f"{self.WIKIPEDIA_PAGE_URL}/{quote(title)}"
-                html_response = self.session.get(page_url, timeout=10)
-                if html_response.status_code == 200:
-                    html_content = html_response.text
-                    
-                    # Look for infobox image
-                    # Pattern: <img src="..." in infobox
-                    infobox_pattern = r'<table[^>]*class="[^"]*infobox[^"]*"[^>]*>.*?<img[^>]*(?:src|data-src)="([^"]+)"'
-                    match = re.search(infobox_pattern, html_content, re.DOTALL | re.IGNORECASE)
-                    if match:
-                        img_src = match.group(1)
-                        # Convert to full URL if relative
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = 'https://en.wikipedia.org' + img_src
-                        # Convert thumbnail to original
-                        original_url = self._thumbnail_to_original(img_src)
-                        if original_url and not self._is_svg_url(original_url):
-                            return original_url
-                    
-                    # Also look for images in the main content area (not just infobox)
-                    # Many artwork pages have the main image in the content, not infobox
-                    content_img_pattern = r'<div[^>]*class="[^"]*mw-parser-output[^"]*"[^>]*>.*?<img[^>]*(?:src|data-src)="([^"]+)"'
-                    content_match = re.search(content_img_pattern, html_content, re.DOTALL | re.IGNORECASE)
-                    if content_match:
-                        img_src = content_match.group(1)
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = 'https://en.wikipedia.org' + img_src
-                        # Check if it's a Wikimedia URL
-                        if 'upload.wikimedia.org' in img_src:
-                            original_url = self._thumbnail_to_original(img_src)
-                            if original_url and not self._is_svg_url(original_url):
-                                return original_url
-                    
-                    # Method 4: Look for direct upload.wikimedia.org links in the page
-                    # This catches images that are already original URLs
-                    # Pattern needs to handle:
-                    # - URL-encoded characters (%27, %2C, etc.)
-                    # - URLs in various attributes (src, href, data-src, etc.)
-                    # - URLs that might span multiple lines
-                    # - Both commons and en namespaces
-                    
-                    # More comprehensive pattern that handles various contexts
-                    # Look for upload.wikimedia.org URLs in any attribute or as standalone URLs
-                    # The pattern: upload.wikimedia.org/wikipedia/(commons|en)/[hash]/[hash]/[filename]
-                    # Where [hash] is a single hex character, and filename can contain URL-encoded chars
-                    
-                    # Pattern 1: In HTML attributes (src, href, data-*, etc.)
-                    # Exclude SVG files as they are usually logos/icons, not artwork photos
-                    attr_pattern = r'(?:src|href|data-src|data-image|data-file|data-original)="(https://upload\.wikimedia\.org/wikipedia/(?:commons|en)/[a-f0-9]/[a-f0-9]{2}/[^"]+\.(?:jpg|jpeg|png|gif|webp))"'
-                    
-                    # Pattern 2: Standalone URLs (in JSON, JavaScript, or plain text)
-                    # This pattern is more flexible and handles URL encoding
-                    # Exclude SVG files as they are usually logos/icons, not artwork photos
-                    standalone_pattern = r'https://upload\.wikimedia\.org/wikipedia/(?:commons|en)/[a-f0-9]/[a-f0-9]{2}/[^\s"\'<>\)]+(?:%[0-9a-fA-F]{2})*[^\s"\'<>\)]*\.(?:jpg|jpeg|png|gif|webp)'
-                    
-                    all_matches = []
-                    
-                    # Search in attributes
-                    attr_matches = re.findall(attr_pattern, html_content, re.IGNORECASE | re.MULTILINE)
-                    if attr_matches:
-                        all_matches.extend(attr_matches)
-                    
-                    # Search for standalone URLs
-                    standalone_matches = re.findall(standalone_pattern, html_content, re.IGNORECASE | re.MULTILINE)
-                    if standalone_matches:
-                        all_matches.extend(standalone_matches)
-                    
-                    # Remove duplicates and decode URLs
-                    unique_matches = []
-                    seen = set()
-                    for url in all_matches:
-                        # Decode URL-encoded characters
-                        try:
-                            decoded_url = unquote(url) if '%' in url else url
-                        except:
-                            decoded_url = url
-                        
-                        # Normalize the URL (remove trailing query params, fragments, etc.)
-                        normalized = decoded_url.split('?')[0].split('#')[0]
-                        
-                        if normalized not in seen:
-                            seen.add(normalized)
-                            unique_matches.append(normalized)
-                    
-                    if unique_matches:
-                        # Prefer original URLs (not thumbnails) and commons over en
-                        # Also prefer images that seem to be the main artwork image
-                        # Skip SVG files
-                        for url in unique_matches:
-                            if '/thumb/' not in url and not self._is_svg_url(url):
-                                # Prefer commons namespace
-                                if '/commons/' in url:
-                                    return url
-                        
-                        # If no commons found, return first non-thumbnail (non-SVG)
-                        for url in unique_matches:
-                            if '/thumb/' not in url and not self._is_svg_url(url):
-                                return url
-                        
-                        # If only thumbnails found, convert the first non-SVG one
-                        for url in unique_matches:
-                            original_url = self._thumbnail_to_original(url)
-                            if original_url and not self._is_svg_url(original_url):
-                                return original_url
-                    
-                    # Method 5: Look for data-src or data-image attributes (lazy-loaded images)
-                    # Exclude SVG files as they are usually logos/icons, not artwork photos
-                    lazy_pattern = r'(?:data-src|data-image)="([^"]*upload\.wikimedia\.org[^"]+\.(?:jpg|jpeg|png|gif|webp))"'
-                    lazy_matches = re.findall(lazy_pattern, html_content, re.IGNORECASE)
-                    if lazy_matches:
-                        for url in lazy_matches:
-                            if not url.startswith('http'):
-                                url = 'https:' + url if url.startswith('//') else 'https://en.wikipedia.org' + url
-                            # Skip SVG files
-                            if self._is_svg_url(url):
-                                continue
-                            if '/thumb/' not in url:
-                                return url
-                            original_url = self._thumbnail_to_original(url)
-                            if original_url and not self._is_svg_url(original_url):
-                                return original_url
+                scan = self._scan_article_images(title)
+                if scan is not None:
+                    return self._image_url_from_scan(scan)
             except Exception as e:
                 pass  # Silently fail HTML parsing
             
             return None
         except Exception as e:
             print(f"  Error getting image URL: {e}")
+            self._note_failure()
             return None
     
+    def _image_url_from_scan(self, scan: ArticleImageScanner) -> Optional[str]:
+        """Pick the article image from an HTML scan, in order of preference."""
+        def absolute(src):
+            if src.startswith('//'):
+                return 'https:' + src
+            elif src.startswith('/'):
+                return 'https://en.wikipedia.org' + src
+            return src
+        
+        # Method 3: the infobox image, else the first image in the content area
+        # Many artwork pages have the main image in the content, not infobox
+        for src in (scan.infobox_image, scan.content_image):
+            if src:
+                original_url = self._thumbnail_to_original(absolute(src))
+                if original_url and not self._is_svg_url(original_url):
+                    self._trace_note('image_method', 'html_lead_image')
+                    return original_url
+        
+        # Method 4: direct upload.wikimedia.org links anywhere in the page
+        # Remove duplicates and decode URLs
+        unique_matches = []
+        seen = set()
+        for url in scan.attribute_urls + scan.standalone_urls:
+            decoded_url = unquote(url) if '%' in url else url
+            # Normalize the URL (remove trailing query params, fragments, etc.)
+            normalized = decoded_url.split('?')[0].split('#')[0]
+            if normalized not in seen:
+                seen.add(normalized)
+                unique_matches.append(normalized)
+        
+        # Prefer original URLs (not thumbnails) and commons over en, skipping SVG files
+        originals = [url for url in unique_matches if '/thumb/' not in url and not self._is_svg_url(url)]
+        for url in originals:
+            if '/commons/' in url:
+                self._trace_note('image_method', 'html_upload_links')
+                return url
+        if originals:
+            self._trace_note('image_method', 'html_upload_links')
+            return originals[0]
+        
+        # If only thumbnails found, convert the first non-SVG one
+        for url in unique_matches:
+            original_url = self._thumbnail_to_original(url)
+            if original_url and not self._is_svg_url(original_url):
+                self._trace_note('image_method', 'html_upload_links')
+                return original_url
+        
+        # Method 5: lazy-loaded images (data-src / data-image)
+        for url in scan.lazy_urls:
+            if not url.startswith('http'):
+                url = 'https:' + url if url.startswith('//') else 'https://en.wikipedia.org' + url
+            # Skip SVG files
+            if self._is_svg_url(url):
+                continue
+            if '/thumb/' not in url:
+                self._trace_note('image_method', 'html_lazy_images')
+                return url
+            original_url = self._thumbnail_to_original(url)
+            if original_url and not self._is_svg_url(original_url):
+                self._trace_note('image_method', 'html_lazy_images')
+                return original_url
+        
+        return None
+    
     def _thumbnail_to_original(self, thumbnail_url: str) -> Optional[str]:
         """Convert a Wikipedia thumbnail URL to the original image URL."""
         if not thumbnail_url:
@@ -446,31 +927,74 @@ class WikipediaArtEnricher:
         
             return None
     
+    def _open_image(self, image_url: str) -> Optional[requests.Response]:
+        """Start a streamed image download, or return None if it fails.
+        
+        A thumbnail Wikimedia can't render (typically because the original is
+        smaller than the requested width) falls back to the original file.
+        """
+        response = self._get(image_url, stream=True)
+        if response.status_code == 200:
+            return response
+        if self.thumbnail_width and '/thumb/' in image_url:
+            response.close()
+            original_url = self._thumbnail_to_original(image_url)
+            print(f"  Thumbnail not available (HTTP {response.status_code}), downloading original")
+            response = self._get(original_url, stream=True)
+            if response.status_code == 200:
+                return response
+        response.close()  # Frees the host's download slot
+        return None
+    
+    def _record_image_bytes(self, image_url: str, size: int) -> None:
+        """Count downloaded image bytes; for thumbnails, log the estimated bytes saved over the original.
+        
+        The estimate scales the rendition's size by the pixel counts pageimages
+        reported, so it costs no extra request.
+        """
+        self._count('image_bytes', size)
+        self._trace_add('image_bytes', size)
+        if not self.thumbnail_width or '/thumb/' not in image_url:
+            return
+        pixels = self._rendition_pixels.get(image_url)
+        if pixels is None:
+            print(f"  Thumbnail: {size / (1024 * 1024):.2f} MB")
+            return
+        original_size = size * pixels[0] // max(1, pixels[1])
+        saved = original_size - size
+        self._count('image_bytes_saved', saved)
+        print(f"  Thumbnail: {size / (1024 * 1024):.2f} MB instead of ~{original_size / (1024 * 1024):.2f} MB "
+              f"(~{saved / (1024 * 1024):.2f} MB saved)")
+    
     def download_image(self, image_url: str, filename: str, max_size_mb: float = 1.0) -> bool:
-        """Download an image from URL to filename and resize to be under max_size_mb."""
+        """Download an image from URL to filename and resize to be under max_size_mb.
+        
+        A URL downloaded before is linked from the store instead of fetched
+        again, and a download identical to a stored image becomes a hardlink to it.
+        """
+        if self._reuse_download(image_url, filename):
+            return True
         try:
-            response = self.session.get(image_url, timeout=15, stream=True)
-            if response.status_code == 200:
+            with self._stage('download'):
+                response = self._open_image(image_url)
+            if response is not None:
                 filepath = os.path.join(self.images_dir, filename)
                 
-                # Download to temporary file first
-                temp_path = filepath + '.tmp'
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
-                # Resize image if it's too large and PIL is available
                 if PIL_AVAILABLE:
-                    try:
-                        self._resize_image_if_needed(temp_path, filepath, max_size_mb)
-                    except Exception as e:
-                        print(f"  Warning: Could not resize image: {e}")
-                        # If resizing fails, just use the original
-                        os.rename(temp_path, filepath)
+                    # Decode and downscale straight from the response stream
+                    self._stream_image_to_file(response, filepath, max_size_mb)
                 else:
-                    # If PIL not available, just use the downloaded file
+                    # If PIL not available, just store the downloaded file
+                    temp_path = filepath + '.tmp'
+                    size = 0
+                    with self._stage('download'), response, open(temp_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=8192):
+                            f.write(chunk)
+                            size += len(chunk)
                     os.rename(temp_path, filepath)
+                    self._record_image_bytes(response.url or image_url, size)
                 
+                self._ingest_image(filename, image_url)
                 return True
             return False
         except Exception as e:
@@ -481,88 +1005,131 @@ class WikipediaArtEnricher:
                 os.remove(temp_path)
             return False
     
+    def _reuse_download(self, image_url: str, filename: str) -> bool:
+        """Link filename to an earlier download of the same URL, if there is one."""
+        original = self.image_store.link_download(image_url, filename)
+        if original is None:
+            return False
+        print(f"  ✓ Already downloaded as {original}, linked")
+        return True
+    
+    def _ingest_image(self, filename: str, image_url: str) -> None:
+        """Add a freshly written image to the store, hardlinking it if its content is already stored."""
+        original = self.image_store.ingest(filename, image_url)
+        if original is not None:
+            print(f"  ✓ Identical to {original}, stored as a link")
+    
+    def _read_image_stream(self, response: requests.Response) -> io.BytesIO:
+        """Read a streamed image response into an in-memory buffer.
+        
+        Chunks are written to the buffer as they arrive, so the image is held
+        once rather than as chunks plus their join. The image header is parsed
+        from the first chunks so oversized images are rejected before the rest
+        is downloaded.
+        """
+        parser = ImageFile.Parser() if PIL_AVAILABLE else None
+        header = None
+        data = io.BytesIO()
+        # Closing the response frees the host's download slot
+        with self._stage('download'), response:
+            for chunk in response.iter_content(chunk_size=65536):
+                data.write(chunk)
+                if parser is not None and header is None:
+                    parser.feed(chunk)
+                    if parser.image is not None:
+                        header = parser.image
+                        check_decode_size(header, 2000)
+        self._record_image_bytes(response.url or '', data.tell())
+        data.seek(0)
+        return data
+    
+    def fetch_image_bytes(self, image_url: str) -> Optional[io.BytesIO]:
+        """Download an image into memory without decoding it. Returns None on failure."""
+        try:
+            with self._stage('download'):
+                response = self._open_image(image_url)
+            if response is not None:
+                return self._read_image_stream(response)
+            return None
+        except Exception as e:
+            print(f"  Error downloading image: {e}")
+            return None
+    
+    def _stream_image_to_file(self, response: requests.Response, filepath: str, max_size_mb: float = 1.0) -> None:
+        """Save a streamed image response to filepath, downscaled to be under max_size_mb.
+        
+        Nothing but the final file is written to disk.
+        """
+        data = self._read_image_stream(response)
+        with self._stage('resize'):
+            passes = save_image_bytes(data, filepath, max_size_mb)
+        self._count('encode_passes', passes)
+    
     def _resize_image_if_needed(self, input_path: str, output_path: str, max_size_mb: float = 1.0) -> None:
         """Resize image to be under max_size_mb MB if needed."""
-        def get_file_size_mb(path: str) -> float:
-            return os.path.getsize(path) / (1024 * 1024)
-        
-        current_size_mb = get_file_size_mb(input_path)
+        current_size_mb = os.path.getsize(input_path) / (1024 * 1024)
         
         if current_size_mb <= max_size_mb:
             # Image is already small enough, just rename
             os.rename(input_path, output_path)
             return
         
-        # Need to resize
-        max_dimension = 2000
-        
-        with Image.open(input_path) as img:
-            # Convert to RGB if necessary (for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            width, height = img.size
-            quality = 85
-            
-            # If file is extremely large, aggressively reduce dimensions first
-            if current_size_mb > 10:
-                aggressive_max_dim = 1200
-                if max(width, height) > aggressive_max_dim:
-                    if width > height:
-                        new_width = aggressive_max_dim
-                        new_height = int(height * (aggressive_max_dim / width))
-                    else:
-                        new_height = aggressive_max_dim
-                        new_width = int(width * (aggressive_max_dim / height))
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            elif max(width, height) > max_dimension:
-                if width > height:
-                    new_width = max_dimension
-                    new_height = int(height * (max_dimension / width))
-                else:
-                    new_height = max_dimension
-                    new_width = int(width * (max_dimension / height))
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Save with decreasing quality until we're under the size limit
-            attempts = 0
-            max_attempts = 20
-            
-            while attempts < max_attempts:
-                img.save(output_path, format='JPEG', quality=quality, optimize=True)
-                new_size_mb = get_file_size_mb(output_path)
-                
-                if new_size_mb <= max_size_mb:
-                    break
-                
-                # If still too large, reduce dimensions further
-                if attempts > 5 and new_size_mb > max_size_mb * 1.5:
-                    width, height = img.size
-                    img = img.resize((int(width * 0.9), int(height * 0.9)), Image.Resampling.LANCZOS)
-                
-                quality = max(50, quality - 5)
-                attempts += 1
-            
-            # Remove temp file
-            if os.path.exists(input_path):
-                os.remove(input_path)
+        with self._stage('resize'), Image.open(input_path) as img:
+            data, quality, passes = shrink_image(img, current_size_mb, max_size_mb)
+        self._count('encode_passes', passes)
+        print(f"  Encoded {len(data) / (1024 * 1024):.2f} MB JPEG at quality {quality} in {passes} passes")
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        
+        # Remove temp file
+        if os.path.exists(input_path):
+            os.remove(input_path)
+    
+    def image_base_filename(self, art_piece: Dict) -> str:
+        """Return the image filename (without extension) used for an art piece."""
+        sanitized_artist = self.sanitize_filename(art_piece.get('artist', 'Unknown'))
+        sanitized_title = self.sanitize_filename(art_piece['title'])
+        return f"{sanitized_artist}_{sanitized_title}"
+    
+    def find_existing_image(self, base_filename: str) -> Optional[str]:
+        """Return the filename of an already downloaded image (excluding SVG), if any."""
+        return self.image_store.find(base_filename)
+    
+    def prefetch_art_pieces(self, art_pieces: List[Dict]) -> None:
+        """Batch-prefetch Wikipedia data for the art pieces that still need enrichment."""
+        titles = [
+            art_piece['title'] for art_piece in art_pieces
+            if self.metadata_for_existing_images or not self.find_existing_image(self.image_base_filename(art_piece))
+        ]
+        if titles:
+            self.prefetch(titles)
     
     def enrich_art_piece(self, art_piece: Dict) -> Dict:
         """Enrich a single art piece with Wikipedia data."""
-        title = art_piece['title']
-        artist = art_piece.get('artist', 'Unknown')
-        
-        print(f"\nProcessing: {title} by {artist}")
-        
+        self.begin_trace(art_piece)
+        try:
+            enriched, image_url = self.enrich_metadata(art_piece)
+            if image_url:
+                # Always save as .jpg since we resize and convert to JPEG
+                # This ensures consistent format and size
+                image_filename = f"{self.image_base_filename(art_piece)}.jpg"
+                if self.download_image(image_url, image_filename):
+                    print(f"  ✓ Downloaded and resized image: {image_filename}")
+                    enriched['image_filename'] = f"images/{image_filename}"
+                    self._trace_note('outcome', 'downloaded')
+                else:
+                    print(f"  ⚠️  Failed to download image")
+                    enriched['image_filename'] = None
+                    self._trace_note('outcome', 'download_failed')
+                    self.mark_for_retry(art_piece)
+            return enriched
+        finally:
+            self.finish_trace(self.detach_trace())
+    
+    @staticmethod
+    def unenriched(art_piece: Dict) -> Dict:
+        """Copy of an art piece with every enriched field at its default (None)."""
         enriched = art_piece.copy()
-        
-        # Initialize default values
         enriched['wikipedia_url'] = None
         enriched['description'] = None
         enriched['location'] = None
@@ -571,43 +1138,63 @@ class WikipediaArtEnricher:
         enriched['style'] = None
         enriched['significance'] = None
         enriched['image_filename'] = None
+        return enriched
+    
+    def enrich_metadata(self, art_piece: Dict) -> Tuple[Dict, Optional[str]]:
+        """Fill in the Wikipedia fields for an art piece without downloading its image.
+        
+        Returns (enriched art piece, image URL still to download or None). If
+        a lookup failed along the way the art piece is marked for retry.
+        """
+        # Each summary/wikitext/HTML resource is fetched at most once per artwork
+        self._local.memo = {}
+        self._local.failed = False
+        try:
+            return self._enrich_metadata(art_piece)
+        finally:
+            self._local.memo = None
+            if self._local.failed:
+                self.mark_for_retry(art_piece)
+    
+    def _enrich_metadata(self, art_piece: Dict) -> Tuple[Dict, Optional[str]]:
+        title = art_piece['title']
+        artist = art_piece.get('artist', 'Unknown')
+        
+        print(f"\nProcessing: {title} by {artist}")
+        
+        enriched = self.unenriched(art_piece)
         
         # FIRST: Check if we already have an image for this artwork
-        # If image exists, skip Wikipedia entirely
-        sanitized_artist = self.sanitize_filename(artist)
-        sanitized_title = self.sanitize_filename(title)
-        base_filename = f"{sanitized_artist}_{sanitized_title}"
-        
-        # Check for existing images with various extensions
-        existing_image = None
-        # Check for existing images (excluding SVG)
-        for ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
-            potential_filename = f"{base_filename}{ext}"
-            potential_path = os.path.join(self.images_dir, potential_filename)
-            if os.path.exists(potential_path):
-                existing_image = potential_filename
-                print(f"  ✓ Image already exists: {existing_image}")
-                enriched['image_filename'] = f"images/{existing_image}"
-                # Skip Wikipedia if image already exists
-                return enriched
-        
-        # Only if image doesn't exist, search Wikipedia
+        # If image exists, skip Wikipedia entirely (unless its metadata is wanted anyway)
+        base_filename = self.image_base_filename(art_piece)
+        existing_image = self.find_existing_image(base_filename)
+        if existing_image:
+            print(f"  ✓ Image already exists: {existing_image}")
+            enriched['image_filename'] = f"images/{existing_image}"
+            self._trace_note('outcome', 'existing_image')
+            if not self.metadata_for_existing_images:
+                return enriched, None
+        
         # Search for Wikipedia article
-        wiki_title = self.search_wikipedia(title)
+        with self._stage('search'):
+            wiki_title = self.search_wikipedia(title)
         if not wiki_title:
             print(f"  ⚠️  Wikipedia article not found for '{title}'")
-            return enriched
+            self._trace_note('outcome', 'article_not_found')
+            return enriched, None
         
         print(f"  Found Wikipedia article: {wiki_title}")
         
         # Get page summary
-        summary = self.get_page_summary(wiki_title)
+        with self._stage('summary'):
+            summary = self.get_page_summary(wiki_title)
         if summary:
             enriched['wikipedia_url'] = f"{self.WIKIPEDIA_PAGE_URL}/{quote(wiki_title)}"
             enriched['description'] = summary.get('extract', '')
             
             # Extract additional information from infobox
-            infobox_data = self.extract_infobox_data(wiki_title)
+            with self._stage('infobox'):
+                infobox_data = self.extract_infobox_data(wiki_title)
             
             enriched['location'] = infobox_data.get('location', None)
             enriched['medium'] = infobox_data.get('medium', None)
@@ -619,69 +1206,138 @@ class WikipediaArtEnricher:
                 # Could add logic here to extract key points about significance
                 pass
         
-        # Get and download image from Wikipedia
-        image_url = self.get_image_url(wiki_title)
-        if image_url:
-            print(f"  Found image: {image_url[:80]}...")
-            
-            # Always save as .jpg since we resize and convert to JPEG
-            # This ensures consistent format and size
-            image_filename = f"{base_filename}.jpg"
-            image_path = os.path.join(self.images_dir, image_filename)
-            
-            # Double-check if image exists (check for .jpg or other extensions)
-            if os.path.exists(image_path):
-                print(f"  Image already exists: {image_filename}")
-                enriched['image_filename'] = f"images/{image_filename}"
-            else:
-                # Also check for other extensions
-                found_existing = False
-                # Check for existing images (excluding SVG)
-                for ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
-                    potential_path = os.path.join(self.images_dir, f"{base_filename}{ext}")
-                    if os.path.exists(potential_path):
-                        print(f"  Image already exists: {base_filename}{ext}")
-                        enriched['image_filename'] = f"images/{base_filename}{ext}"
-                        found_existing = True
-                        break
-                
-                if not found_existing:
-                    if self.download_image(image_url, image_filename):
-                        print(f"  ✓ Downloaded and resized image: {image_filename}")
-                        enriched['image_filename'] = f"images/{image_filename}"
-                    else:
-                        print(f"  ⚠️  Failed to download image")
-                        enriched['image_filename'] = None
-        else:
+        if existing_image:
+            return enriched, None
+        
+        # Find the image on Wikipedia; downloading it is left to the caller
+        with self._stage('image_url'):
+            image_url = self.get_image_url(wiki_title)
+        if not image_url:
             print(f"  ⚠️  No image found")
-            enriched['image_filename'] = None
+            self._trace_note('outcome', 'no_image')
+            return enriched, None
         
-        # Small delay to be respectful to Wikipedia API
-        time.sleep(0.5)
+        print(f"  Found image: {image_url[:80]}...")
         
-        return enriched
+        # Double-check if image exists (another worker may have saved it meanwhile)
+        existing_image = self.find_existing_image(base_filename)
+        if existing_image:
+            print(f"  Image already exists: {existing_image}")
+            enriched['image_filename'] = f"images/{existing_image}"
+            self._trace_note('outcome', 'existing_image')
+            return enriched, None
+        
+        return enriched, image_url
 
 
-def main():
-    """Main function to enrich the dataset."""
-    print("Wikipedia Art Dataset Enrichment")
-    print("=" * 50)
+class DumpArtEnricher(WikipediaArtEnricher):
+    """Enricher that reads articles from a local Wikipedia dump instead of the API.
     
-    # Read input dataset
-    input_file = "dataset.json"
-    if not os.path.exists(input_file):
-        print(f"Error: {input_file} not found!")
-        return
+    Titles, summaries, infobox fields and image URLs come from the dump's
+    wikitext; only the images themselves are downloaded.
+    """
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        dataset = json.load(f)
+    def __init__(self, dump: WikipediaDump, **kwargs):
+        """Initialize with an opened dump (other arguments as WikipediaArtEnricher)."""
+        super().__init__(**kwargs)
+        self.dump = dump
+        # Guards _dump_pages and _dump_queued only, never held during a dump lookup
+        self._dump_lock = threading.Lock()
+        # Held by the one thread reading the dump (WikipediaDump isn't thread-safe)
+        self._dump_lookup_lock = threading.Lock()
+        # Requested or resolved title -> dump page (None if not in the dump)
+        self._dump_pages: Dict[str, Optional[DumpPage]] = {}
+        # Titles missed by workers, resolved together by the next lookup
+        self._dump_queued: Set[str] = set()
     
-    print(f"Loaded {sum(len(pieces) for pieces in dataset.values())} art pieces from {input_file}")
+    def _store_dump_pages(self, pages: Dict[str, Optional[DumpPage]]) -> None:
+        with self._dump_lock:
+            for title, page in pages.items():
+                self._dump_pages[title] = page
+                if page is not None:
+                    self._dump_pages.setdefault(page.title, page)
     
-    # Initialize enricher
-    enricher = WikipediaArtEnricher()
+    def _dump_page(self, title: str) -> Optional[DumpPage]:
+        """Look up one title.
+        
+        Titles not prefetched cost a pass over the index; misses from all
+        workers are queued and resolved together by a single pass, while
+        lookups of known titles don't wait for it.
+        """
+        with self._dump_lock:
+            if title in self._dump_pages:
+                return self._dump_pages[title]
+            self._dump_queued.add(title)
+        with self._dump_lookup_lock:
+            with self._dump_lock:
+                if title in self._dump_pages:
+                    return self._dump_pages[title]  # Resolved by another worker's pass
+                wanted = list(self._dump_queued | {title})
+                self._dump_queued.clear()
+            pages = self.dump.pages(wanted)
+            self._store_dump_pages(pages)
+        return pages[title]
     
-    # Enrich dataset
+    def prefetch(self, titles: List[str]) -> None:
+        """Resolve many titles with one pass over the dump index."""
+        with self._dump_lock:
+            wanted = [t for t in dict.fromkeys(titles) if t not in self._dump_pages]
+        if not wanted:
+            return
+        with self._dump_lookup_lock:
+            streams_before = self.dump.stats['streams_read']
+            self._store_dump_pages(self.dump.pages(wanted))
+            streams_read = self.dump.stats['streams_read'] - streams_before
+        with self._dump_lock:
+            found = sum(1 for title in wanted if self._dump_pages[title] is not None)
+        print(f"Found {found} of {len(wanted)} titles in the dump ({streams_read} streams read)")
+    
+    def clear_prefetched(self) -> None:
+        super().clear_prefetched()
+        with self._dump_lock:
+            self._dump_pages.clear()
+    
+    def search_wikipedia(self, query: str) -> Optional[str]:
+        """Resolve a title in the dump (redirects followed, case-insensitive fallback)."""
+        page = self._dump_page(query)
+        return page.title if page else None
+    
+    def get_page_summary(self, title: str) -> Optional[Dict]:
+        page = self._dump_page(title)
+        if page is None:
+            return None
+        return {'title': page.title, 'extract': page.summary}
+    
+    def extract_infobox_data(self, title: str) -> Dict:
+        page = self._dump_page(title)
+        if page is None:
+            return {}
+        infobox_data = {}
+        if page.image_url:
+            infobox_data['image_url'] = page.image_url
+        infobox_data.update(page.infobox)
+        return infobox_data
+    
+    def get_image_url(self, title: str) -> Optional[str]:
+        """Commons URL of the article's lead image (a /thumb/ rendition in thumbnail mode)."""
+        page = self._dump_page(title)
+        image_url = page.image_url if page else None
+        if not image_url or self._is_svg_url(image_url):
+            return None
+        self._trace_note('image_method', 'dump')
+        if self.thumbnail_width:
+            # The original's size is unknown offline; _open_image falls back to it if needed
+            return self._original_to_thumbnail(image_url, self.thumbnail_width)
+        return image_url
+
+
+def enrich_dataset_serial(enricher: WikipediaArtEnricher, dataset: Dict[str, List[Dict]],
+                          on_result: Optional[ResultCallback] = None) -> Dict[str, List[Dict]]:
+    """Enrich every art piece one after another.
+    
+    If on_result is given, each enriched art piece is handed to it as soon as
+    it is done instead of being collected, and an empty dict is returned.
+    """
     enriched_dataset = {}
     total_pieces = sum(len(pieces) for pieces in dataset.values())
     current_piece = 0
@@ -691,26 +1347,480 @@ def main():
         print(f"Processing period: {period}")
         print(f"{'=' * 50}")
         
+        enricher.prefetch_art_pieces(art_pieces)
         enriched_pieces = []
-        for art_piece in art_pieces:
+        for index, art_piece in enumerate(art_pieces):
             current_piece += 1
             print(f"\n[{current_piece}/{total_pieces}]")
             enriched_piece = enricher.enrich_art_piece(art_piece)
-            enriched_pieces.append(enriched_piece)
+            if on_result is not None:
+                on_result(period, index, enriched_piece)
+            else:
+                enriched_pieces.append(enriched_piece)
         
-        enriched_dataset[period] = enriched_pieces
+        if on_result is None:
+            enriched_dataset[period] = enriched_pieces
+        enricher.clear_prefetched()
+    
+    return enriched_dataset
+
+
+async def enrich_dataset_async(enricher: WikipediaArtEnricher, dataset: Dict[str, List[Dict]],
+                               concurrency: int = 8, on_result: Optional[ResultCallback] = None) -> Dict[str, List[Dict]]:
+    """Enrich art pieces concurrently, keeping up to `concurrency` lookups in flight.
+    
+    Each artwork runs the regular (blocking) enrich_art_piece on a worker
+    thread; request pacing is left to the enricher's per-host rate limiter.
+    Results are returned in the same order as the serial path, or passed to
+    on_result as they complete (an empty dict is then returned).
+    """
+    total_pieces = sum(len(pieces) for pieces in dataset.values())
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    done = 0
+    
+    # Let every worker keep its own keep-alive connection per host
+    enricher.http.set_pool_size(concurrency)
     
-    # Write output
+    async def run_one(executor: ThreadPoolExecutor, period: str, index: int, art_piece: Dict) -> Optional[Dict]:
+        nonlocal done
+        async with semaphore:
+            enriched_piece = await loop.run_in_executor(executor, enricher.enrich_art_piece, art_piece)
+        done += 1
+        print(f"\n[{done}/{total_pieces}] done: {art_piece.get('title', 'Unknown')}")
+        if on_result is not None:
+            on_result(period, index, enriched_piece)
+            return None
+        return enriched_piece
+    
+    # Resolve the whole dataset in a few batched round trips up front
+    enricher.prefetch_art_pieces([art_piece for pieces in dataset.values() for art_piece in pieces])
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        periods = list(dataset.keys())
+        results = await asyncio.gather(*[
+            asyncio.gather(*[run_one(executor, period, index, art_piece)
+                             for index, art_piece in enumerate(dataset[period])])
+            for period in periods
+        ])
+    
+    if on_result is not None:
+        return {}
+    return {period: list(pieces) for period, pieces in zip(periods, results)}
+
+
+def enrich_dataset_pipelined(enricher: WikipediaArtEnricher, dataset: Dict[str, List[Dict]],
+                             io_workers: int = 8, cpu_workers: Optional[int] = None,
+                             queue_depth: int = 16, max_size_mb: float = 1.0,
+                             on_result: Optional[ResultCallback] = None) -> Dict[str, List[Dict]]:
+    """Enrich art pieces in a three-stage pipeline.
+    
+    I/O threads look up the Wikipedia metadata and download image bytes, a
+    process pool decodes, resizes and encodes the images, and the calling
+    thread collects results back into dataset order. The queues between
+    stages hold at most `queue_depth` items (and the process pool at most
+    two jobs per worker), so downloaded images never pile up in memory.
+    
+    If on_result is given, each enriched art piece is handed to it as soon as
+    it is done instead of being collected, and an empty dict is returned.
+    """
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    items = [(period, index, art_piece) for period, pieces in dataset.items() for index, art_piece in enumerate(pieces)]
+    total_pieces = len(items)
+    fetch_queue = queue.Queue(maxsize=queue_depth)
+    process_queue = queue.Queue(maxsize=queue_depth)
+    results_queue = queue.Queue()
+    busy = {'fetch': 0.0, 'process': 0.0, 'collect': 0.0}
+    busy_lock = threading.Lock()
+    
+    def add_busy(stage: str, seconds: float) -> None:
+        with busy_lock:
+            busy[stage] += seconds
+    
+    # Let every I/O worker keep its own keep-alive connection per host
+    enricher.http.set_pool_size(io_workers)
+    
+    def feed() -> None:
+        for position, (_, _, art_piece) in enumerate(items):
+            fetch_queue.put((position, art_piece))
+        for _ in range(io_workers):
+            fetch_queue.put(None)
+    
+    def fetch_worker() -> None:
+        while True:
+            item = fetch_queue.get()
+            if item is None:
+                process_queue.put(None)
+                return
+            index, art_piece = item
+            started = time.monotonic()
+            image_filename = image_url = data = None
+            enricher.begin_trace(art_piece)
+            try:
+                enriched, image_url = enricher.enrich_metadata(art_piece)
+                if image_url:
+                    image_filename = f"{enricher.image_base_filename(art_piece)}.jpg"
+                    if enricher._reuse_download(image_url, image_filename):
+                        enriched['image_filename'] = f"images/{image_filename}"
+                        image_filename = image_url = None
+                    else:
+                        data = enricher.fetch_image_bytes(image_url)
+                        if data is None:
+                            print(f"  ⚠️  Failed to download image")
+                            enricher._trace_note('outcome', 'download_failed')
+                            enricher.mark_for_retry(art_piece)
+            except Exception as e:
+                print(f"  Error enriching '{art_piece.get('title', 'Unknown')}': {e}")
+                enriched = enricher.unenriched(art_piece)
+                enricher._trace_note('outcome', 'error')
+                enricher.mark_for_retry(art_piece)
+            # The trace is finished by the collector, after the image is processed
+            trace = enricher.detach_trace()
+            add_busy('fetch', time.monotonic() - started)
+            # Blocks while the image stage is behind
+            process_queue.put((index, enriched, image_filename, image_url, data, trace))
+    
+    def dispatch_images(pool: ProcessPoolExecutor) -> None:
+        try:
+            submit_images(pool)
+        except BaseException as e:
+            # E.g. BrokenProcessPool after a worker died; without this the collector would wait forever
+            results_queue.put(e)
+    
+    def submit_images(pool: ProcessPoolExecutor) -> None:
+        in_flight = threading.BoundedSemaphore(cpu_workers * 2)
+        finished_workers = 0
+        while finished_workers < io_workers:
+            item = process_queue.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            index, enriched, image_filename, image_url, data, trace = item
+            if data is None:
+                results_queue.put((index, enriched, None, None, None, trace))
+                continue
+            in_flight.acquire()
+            filepath = os.path.join(enricher.images_dir, image_filename)
+            future = pool.submit(process_image_job, data, filepath, max_size_mb)
+            del data, item
+            
+            def done(future, index=index, enriched=enriched, image_filename=image_filename, image_url=image_url,
+                     trace=trace):
+                in_flight.release()
+                results_queue.put((index, enriched, image_filename, image_url, future, trace))
+            future.add_done_callback(done)
+    
+    # Resolve the whole dataset in a few batched round trips up front
+    enricher.prefetch_art_pieces([art_piece for _, _, art_piece in items])
+    
+    start_time = time.monotonic()
+    results: List[Optional[Dict]] = [None] * total_pieces
+    finished = [False] * total_pieces
+    next_index = 0
+    with ProcessPoolExecutor(max_workers=cpu_workers) as pool:
+        threads = [threading.Thread(target=feed, daemon=True),
+                   threading.Thread(target=dispatch_images, args=(pool,), daemon=True)]
+        threads += [threading.Thread(target=fetch_worker, daemon=True) for _ in range(io_workers)]
+        for thread in threads:
+            thread.start()
+        
+        for _ in range(total_pieces):
+            item = results_queue.get()
+            if isinstance(item, BaseException):
+                raise RuntimeError(f"image stage failed: {item!r}") from item
+            index, enriched, image_filename, image_url, future, trace = item
+            started = time.monotonic()
+            if future is not None:
+                try:
+                    passes, seconds = future.result()
+                    add_busy('process', seconds)
+                    enricher._count('encode_passes', passes)
+                    enricher._ingest_image(image_filename, image_url)
+                    print(f"  ✓ Downloaded and resized image: {image_filename}")
+                    enriched['image_filename'] = f"images/{image_filename}"
+                    if trace is not None:
+                        trace.add_stage('resize', seconds)
+                        trace.note('outcome', 'downloaded')
+                except Exception as e:
+                    print(f"  ⚠️  Failed to process image {image_filename}: {e}")
+                    enriched['image_filename'] = None
+                    enricher.mark_for_retry(items[index][2])
+                    if trace is not None:
+                        trace.note('outcome', 'download_failed')
+            enricher.finish_trace(trace)
+            finished[index] = True
+            if on_result is not None:
+                period, period_index, _ = items[index]
+                on_result(period, period_index, enriched)
+            else:
+                results[index] = enriched
+            # Report progress in dataset order
+            while next_index < total_pieces and finished[next_index]:
+                next_index += 1
+                print(f"\n[{next_index}/{total_pieces}] done: {items[next_index - 1][2].get('title', 'Unknown')}")
+            add_busy('collect', time.monotonic() - started)
+        
+        for thread in threads:
+            thread.join()
+    elapsed = max(time.monotonic() - start_time, 1e-9)
+    
+    print(f"\nPipeline stages ({elapsed:.1f}s wall):")
+    for stage, workers in (('fetch', io_workers), ('process', cpu_workers), ('collect', 1)):
+        print(f"  {stage:<8} {workers:>3} workers  {busy[stage]:>8.1f}s busy  "
+              f"{busy[stage] / (workers * elapsed):>6.1%} utilization")
+    
+    if on_result is not None:
+        return {}
+    enriched_dataset: Dict[str, List[Dict]] = {period: [] for period in dataset}
+    for (period, _, _), enriched in zip(items, results):
+        enriched_dataset[period].append(enriched)
+    return enriched_dataset
+
+
+def main(async_mode: bool = False, concurrency: int = 8, requests_per_second: float = 5.0,
+         cache_file: Optional[str] = ".wikipedia_cache.sqlite", pipeline: bool = False,
+         cpu_workers: Optional[int] = None, queue_depth: int = 16, max_retries: int = 4,
+         maxlag: Optional[int] = 5, incremental: bool = False,
+         manifest_file: str = "dataset_complete.manifest.json",
+         journal_file: str = "dataset_complete.journal.jsonl", thumbnail_width: Optional[int] = None,
+         http_metrics_file: Optional[str] = None, trace_file: Optional[str] = None,
+         record_file: Optional[str] = None, replay_file: Optional[str] = None,
+         replay_latency: Optional[str] = None, dump_file: Optional[str] = None,
+         dump_index_file: Optional[str] = None):
+    """Main function to enrich the dataset.
+    
+    Args:
+        async_mode: If True, enrich several artworks concurrently.
+        concurrency: Maximum number of artworks in flight in async mode (I/O workers in pipeline mode).
+        requests_per_second: Request rate allowed per host.
+        cache_file: SQLite file for the persistent response cache (None disables it).
+        pipeline: If True, fetch with I/O threads and resize images in a process pool.
+        cpu_workers: Image processes in pipeline mode (default: one per CPU).
+        queue_depth: Maximum items waiting between pipeline stages.
+        max_retries: Retries for throttled or failed requests.
+        maxlag: MediaWiki maxlag sent with action API requests (None to omit).
+        incremental: If True, reuse results for input records unchanged since the last run.
+        manifest_file: Input-record hash -> enriched record manifest used in incremental mode.
+        journal_file: JSONL journal of finished records, resumed from after an interrupted run.
+        thumbnail_width: If set, download Wikimedia renditions this wide instead of originals.
+        http_metrics_file: If set, write per-host HTTP metrics to this JSON file.
+        trace_file: If set, write a per-artwork stage trace (JSONL) and print a stage summary.
+        record_file: If set, record every HTTP exchange to this fixture file.
+        replay_file: If set, serve every HTTP request from this fixture file instead of the network.
+        replay_latency: Delay for replayed responses: 'recorded' or a number of seconds.
+        dump_file: If set, read articles from this multistream dump instead of the Wikipedia API.
+        dump_index_file: The dump's offset index (default: the -index.txt.bz2 next to the dump).
+    """
+    print("Wikipedia Art Dataset Enrichment")
+    print("=" * 50)
+    
+    # Read input dataset
+    input_file = "dataset.json"
+    if not os.path.exists(input_file):
+        print(f"Error: {input_file} not found!")
+        return
+    
+    with open(input_file, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    
+    print(f"Loaded {sum(len(pieces) for pieces in dataset.values())} art pieces from {input_file}")
     output_file = "dataset_complete.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(enriched_dataset, f, indent=2, ensure_ascii=False)
+    
+    # Every finished record goes to the journal straight away; a rerun after a
+    # crash resumes from it
+    journal = EnrichmentJournal(journal_file)
+    completed = journal.completed(dataset)
+    if completed:
+        print(f"Resuming: {len(completed)} records already in {journal_file}")
+    
+    # In incremental mode unchanged records are reused from the manifest
+    if incremental:
+        manifest = EnrichmentManifest(manifest_file)
+        if not len(manifest):
+            adopted = manifest.seed_from_output(dataset, output_file)
+            if adopted:
+                print(f"Adopted {adopted} unchanged records from existing {output_file}")
+        reused = manifest.reusable(dataset)
+        for (period, index), enriched in reused.items():
+            if (period, index) not in completed:
+                journal.append(period, index, dataset[period][index], enriched)
+                completed.add((period, index))
+        print(f"Incremental mode: {len(reused)} records unchanged")
+    
+    # Only records not finished yet are enriched; positions maps them back to their dataset index
+    to_enrich: Dict[str, List[Dict]] = {}
+    positions: Dict[str, List[int]] = {}
+    for period, pieces in dataset.items():
+        for index, art_piece in enumerate(pieces):
+            if (period, index) not in completed:
+                to_enrich.setdefault(period, []).append(art_piece)
+                positions.setdefault(period, []).append(index)
+    del completed
+    print(f"{sum(len(pieces) for pieces in to_enrich.values())} art pieces to enrich")
+    
+    def on_result(period: str, position: int, enriched: Dict) -> None:
+        index = positions[period][position]
+        source = dataset[period][index]
+        journal.append(period, index, source, enriched, retry=enricher.needs_retry(source))
+    
+    # Record or replay HTTP fixtures; the response cache would hide requests from both
+    fixtures = None
+    if record_file or replay_file:
+        if not replay_file:
+            fixtures = FixtureStore(record_file, 'record')
+        elif replay_latency == 'recorded':
+            fixtures = FixtureStore(replay_file, 'replay', recorded_latency=True)
+        else:
+            fixtures = FixtureStore(replay_file, 'replay', latency=float(replay_latency or 0))
+        print(f"{'Replaying' if fixtures.replaying else 'Recording'} HTTP fixtures: {fixtures.path} "
+              f"(response cache disabled)")
+        cache_file = None
+    
+    # Initialize enricher
+    cache = HTTPCache(cache_file) if cache_file else None
+    tracer = StageTracer(trace_file) if trace_file else None
+    http = HTTPClient(user_agent=WikipediaArtEnricher.USER_AGENT, fixtures=fixtures)
+    # An edited record keeps its image but still needs its Wikipedia metadata
+    enricher_options = dict(requests_per_second=requests_per_second, cache=cache,
+                            retry_policy=RetryPolicy(max_retries=max_retries), maxlag=maxlag,
+                            thumbnail_width=thumbnail_width, http=http, tracer=tracer,
+                            metadata_for_existing_images=incremental)
+    if dump_file:
+        dump = WikipediaDump(dump_file, dump_index_file)
+        print(f"Offline mode: articles from {dump.dump_path} (index {dump.index_path}), only images downloaded")
+        enricher = DumpArtEnricher(dump, **enricher_options)
+    else:
+        enricher = WikipediaArtEnricher(**enricher_options)
+    
+    # Enrich dataset
+    start_time = time.monotonic()
+    try:
+        if pipeline:
+            print(f"Pipeline mode: {concurrency} I/O workers, {cpu_workers or os.cpu_count()} image processes, "
+                  f"queue depth {queue_depth}")
+            enrich_dataset_pipelined(enricher, to_enrich, concurrency, cpu_workers, queue_depth, on_result=on_result)
+        elif async_mode:
+            print(f"Async mode: up to {concurrency} artworks in flight, {requests_per_second} requests/s per host")
+            asyncio.run(enrich_dataset_async(enricher, to_enrich, concurrency, on_result=on_result))
+        else:
+            enrich_dataset_serial(enricher, to_enrich, on_result=on_result)
+    finally:
+        # Make everything finished so far durable, even if the run was interrupted
+        journal.close()
+        if tracer:
+            tracer.close()
+    elapsed = time.monotonic() - start_time
+    
+    # Compact the journal into the nested-by-period output
+    written = journal.compact(dataset, output_file)
+    if incremental:
+        retries = journal.retries(dataset)
+        for period, index, enriched in journal.iter_records(dataset):
+            manifest.update(dataset[period][index], enriched, retry=(period, index) in retries)
+        manifest.prune(dataset)
+        manifest.save()
+        if retries:
+            print(f"⚠️  {len(retries)} records hit failed requests or downloads and will be retried "
+                  f"by the next incremental run")
+    journal.remove()
     
     print(f"\n{'=' * 50}")
-    print(f"✓ Enrichment complete!")
-    print(f"✓ Saved to {output_file}")
+    print(f"✓ Enrichment complete in {elapsed:.1f}s")
+    print(f"✓ {enricher.stats['requests']} requests, {enricher.stats['throttle_seconds']:.1f}s waiting on rate limiter")
+    print(f"✓ {enricher.stats['retries']} retries, {enricher.stats['backoff_seconds']:.1f}s backing off, "
+          f"{enricher.stats.get('rate_reductions', 0)} rate reductions")
+    print(f"✓ {enricher.stats.get('memo_saved_requests', 0)} duplicate fetches avoided by per-artwork memo")
+    image_mb = enricher.stats.get('image_bytes', 0) / (1024 * 1024)
+    saved_mb = enricher.stats.get('image_bytes_saved', 0) / (1024 * 1024)
+    print(f"✓ {image_mb:.1f} MB of images downloaded" + (f", ~{saved_mb:.1f} MB saved by thumbnails" if saved_mb else ""))
+    store_stats = enricher.image_store.stats
+    print(f"✓ {store_stats['downloads_skipped']} repeat downloads linked, {store_stats['linked']} duplicate images "
+          f"linked ({store_stats['bytes_reclaimed'] / (1024 * 1024):.1f} MB reclaimed)")
+    enricher.image_store.save_index()
+    if dump_file:
+        dump_stats = enricher.dump.stats
+        print(f"✓ Dump: {dump_stats['index_scans']} index scans, {dump_stats['streams_read']} streams read "
+              f"({dump_stats['bytes_decompressed'] / (1024 * 1024):.1f} MB decompressed)")
+    if cache:
+        print(f"✓ Cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses, "
+              f"{cache.stats['revalidated']} revalidated, {cache.stats['evictions']} evicted")
+        cache.close()
+    if tracer:
+        print(f"\nEnrichment stages (trace in {trace_file}):\n{tracer.summary()}")
+    print(f"\nHTTP transport:\n{enricher.http.metrics.report()}")
+    if http_metrics_file:
+        enricher.http.metrics.dump(http_metrics_file)
+        print(f"✓ HTTP metrics written to {http_metrics_file}")
+    enricher.http.close()
+    if fixtures:
+        print(f"✓ Fixtures: {fixtures.stats['recorded']} recorded, {fixtures.stats['replayed']} replayed, "
+              f"{fixtures.stats['missing']} missing")
+        fixtures.close()
+    print(f"✓ Saved {written} records to {output_file}")
     print(f"✓ Images saved to {enricher.images_dir}/")
     print(f"{'=' * 50}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Enrich the art dataset with Wikipedia data.")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="enrich several artworks concurrently")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="fetch on I/O threads and resize images in separate processes")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="maximum artworks in flight in async mode, or I/O workers in pipeline mode (default: 8)")
+    parser.add_argument('--cpu-workers', type=int, default=None,
+                        help="image processes in pipeline mode (default: one per CPU)")
+    parser.add_argument('--queue-depth', type=int, default=16,
+                        help="items allowed to wait between pipeline stages (default: 16)")
+    parser.add_argument('--thumbnails', nargs='?', type=int, const=2000, default=None, metavar='WIDTH',
+                        help="download Wikimedia renditions WIDTH px wide (default 2000) instead of originals")
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help="requests per second allowed per host (default: 5)")
+    parser.add_argument('--max-retries', type=int, default=4,
+                        help="retries for throttled or failed requests (default: 4)")
+    parser.add_argument('--maxlag', type=int, default=5,
+                        help="MediaWiki maxlag in seconds, negative to omit (default: 5)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only enrich records that are new or changed since the last run")
+    parser.add_argument('--manifest-file', default="dataset_complete.manifest.json",
+                        help="manifest used by --incremental (default: dataset_complete.manifest.json)")
+    parser.add_argument('--journal-file', default="dataset_complete.journal.jsonl",
+                        help="journal of finished records used to resume (default: dataset_complete.journal.jsonl)")
+    parser.add_argument('--cache-file', default=".wikipedia_cache.sqlite",
+                        help="SQLite file for the response cache (default: .wikipedia_cache.sqlite)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="do not read or write the response cache")
+    parser.add_argument('--http-metrics', default=None, metavar='FILE',
+                        help="write per-host HTTP latency/bytes/status metrics to FILE as JSON")
+    fixture_group = parser.add_mutually_exclusive_group()
+    fixture_group.add_argument('--record', default=None, metavar='FILE',
+                               help="record every HTTP exchange to a fixture file")
+    fixture_group.add_argument('--replay', default=None, metavar='FILE',
+                               help="answer HTTP requests from a recorded fixture file (no network)")
+    parser.add_argument('--replay-latency', default=None, metavar='SECONDS|recorded',
+                        help="delay replayed responses by a fixed time or by their recorded latency")
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help="write per-artwork stage timings to FILE (JSONL) and print p50/p95 per stage")
+    parser.add_argument('--dump', default=None, metavar='FILE',
+                        help="read articles from a pages-articles-multistream.xml.bz2 dump instead of the API")
+    parser.add_argument('--dump-index', default=None, metavar='FILE',
+                        help="the dump's offset index (default: the matching -index.txt.bz2 next to it)")
+    args = parser.parse_args()
+    if args.replay_latency is not None:
+        if not args.replay:
+            parser.error("--replay-latency requires --replay")
+        if args.replay_latency != 'recorded':
+            try:
+                float(args.replay_latency)
+            except ValueError:
+                parser.error(f"--replay-latency must be a number of seconds or 'recorded', not {args.replay_latency!r}")
+    
+    main(async_mode=args.async_mode, concurrency=args.concurrency, requests_per_second=args.rate,
+         cache_file=None if args.no_cache else args.cache_file, pipeline=args.pipeline,
+         cpu_workers=args.cpu_workers, queue_depth=args.queue_depth, max_retries=args.max_retries,
+         maxlag=args.maxlag if args.maxlag >= 0 else None, incremental=args.incremental,
+         manifest_file=args.manifest_file, journal_file=args.journal_file, thumbnail_width=args.thumbnails,
+         http_metrics_file=args.http_metrics, trace_file=args.trace, record_file=args.record,
+         replay_file=args.replay, replay_latency=args.replay_latency, dump_file=args.dump,
+         dump_index_file=args.dump_index)
@@ -6,14 +6,40 @@ This script uses OpenAI's ChatGPT API to enrich art pieces with missing informat
 including adding 'type' and 'region' categories.
 """
 
+import argparse
+import asyncio
 import json
 import os
-import sys
 import time
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import openai
 from dotenv import load_dotenv
 
+from ai_batch import (MAX_BATCH_REQUESTS, completion_content, read_batch_results, remove_files, submit_batch,
+                      wait_for_batches, write_batch_file)
+from llm_cache import LLMCache
+from rate_limit import ModelRateLimiter
+
+
+DEFAULT_MODEL = "gpt-4.1"
+SYSTEM_MESSAGE = "You are an expert art historian. Return only valid JSON, no additional text."
+TEMPERATURE = 0.3
+MAX_TOKENS = 2000
+
+# Completion tokens allowed per art piece in a multi-artwork request
+GROUP_MAX_TOKENS_PER_PIECE = 800
+
+# Seconds all async requests hold off after a request fails with a rate-limit error
+RATE_LIMIT_PAUSE = 10.0
+
+# Times a rate-limited async request is queued again before the run stops
+RATE_LIMIT_RETRIES = 5
+
+# Submitted batches of an unfinished batch-mode run
+BATCH_STATE_FILE = "dataset_AI.batch.json"
+
+# Model answers cached by prompt hash, so re-runs with unchanged prompts make no API calls
+LLM_CACHE_FILE = ".llm_cache.sqlite"
 
 # Define available types
 ART_TYPES = [
@@ -69,31 +95,44 @@ def format_regions_for_prompt() -> str:
     return "\n".join(lines)
 
 
-def create_prompt(art_piece: Dict) -> str:
-    """Create a prompt for ChatGPT to enrich an art piece."""
-    
-    # Example of a filled-in artwork
-    example = {
-        "title": "Mona Lisa",
-        "artist": "Leonardo da Vinci",
-        "year": "c. 1503",
-        "wikipedia_url": "https://en.wikipedia.org/wiki/Mona_Lisa",
-        "description": "The Mona Lisa is a half-length portrait painting by Italian artist Leonardo da Vinci...",
-        "current_location": "Louvre Museum, Paris, France",
-        "creation_location": "Florence, Italy",
-        "medium": "Oil on poplar wood panel",
-        "dimensions": "77 cm × 53 cm (30 in × 21 in)",
-        "style": "High Renaissance",
-        "significance": "One of the most famous paintings in the world, known for its enigmatic smile and masterful technique.",
-        "image_filename": "images/Leonardo_da_Vinci_Mona_Lisa.jpg",
-        "type": "painting",
-        "region": "Western Europe"
-    }
-    
-    prompt = f"""You are an art historian expert. Your task is to enrich the following art piece with complete information.
+# Examples of filled-in artworks (a non-painting, non-European one too, for type and region)
+EXAMPLE_ARTWORKS = [{
+    "title": "Mona Lisa",
+    "artist": "Leonardo da Vinci",
+    "year": "c. 1503",
+    "wikipedia_url": "https://en.wikipedia.org/wiki/Mona_Lisa",
+    "description": "The Mona Lisa is a half-length portrait painting by Italian artist Leonardo da Vinci...",
+    "current_location": "Louvre Museum, Paris, France",
+    "creation_location": "Florence, Italy",
+    "medium": "Oil on poplar wood panel",
+    "dimensions": "77 cm × 53 cm (30 in × 21 in)",
+    "style": "High Renaissance",
+    "significance": "One of the most famous paintings in the world, known for its enigmatic smile and masterful technique.",
+    "image_filename": "images/Leonardo_da_Vinci_Mona_Lisa.jpg",
+    "type": "painting",
+    "region": "Western Europe"
+}, {
+    "title": "The Great Wave off Kanagawa",
+    "artist": "Katsushika Hokusai",
+    "year": "c. 1831",
+    "wikipedia_url": "https://en.wikipedia.org/wiki/The_Great_Wave_off_Kanagawa",
+    "description": "The Great Wave off Kanagawa is a woodblock print by the Japanese ukiyo-e artist Hokusai...",
+    "current_location": "Metropolitan Museum of Art, New York, USA (one of many impressions)",
+    "creation_location": "Edo (Tokyo), Japan",
+    "medium": "Woodblock print; ink and color on paper",
+    "dimensions": "25.7 cm × 37.9 cm (10.1 in × 14.9 in)",
+    "style": "Ukiyo-e",
+    "significance": "The best-known work of Japanese art, from the series Thirty-six Views of Mount Fuji; it shaped European Japonisme.",
+    "image_filename": "images/Hokusai_The_Great_Wave_off_Kanagawa.jpg",
+    "type": "print",
+    "region": "East Asia"
+}]
 
-CURRENT DATA (you can edit any field if you have better information):
-{json.dumps(art_piece, indent=2)}
+
+def create_static_prompt() -> str:
+    """Create the instructions shared by every art piece (types, regions, examples and rules)."""
+    examples = "\n\n".join(json.dumps(example, indent=2, ensure_ascii=False) for example in EXAMPLE_ARTWORKS)
+    return f"""You are an art historian expert. Your task is to enrich the art piece given as CURRENT DATA with complete information.
 
 AVAILABLE ART TYPES (choose exactly one):
 {', '.join(ART_TYPES)}
@@ -103,8 +142,8 @@ AVAILABLE REGIONS (choose exactly one main category):
 
 For the region field, return ONLY the main category name (e.g., "Western Europe", "East Asia", "North America", etc.), not the subcategory.
 
-EXAMPLE OF COMPLETE ARTWORK:
-{json.dumps(example, indent=2)}
+EXAMPLES OF COMPLETE ARTWORKS:
+{examples}
 
 INSTRUCTIONS:
 1. Fill in ALL missing or null fields with accurate information
@@ -119,73 +158,514 @@ INSTRUCTIONS:
 10. Ensure "style" describes the art movement or style period
 11. Ensure "significance" provides a brief explanation of why this artwork is important
 12. Keep the "image_filename" field as is
-13. Return ONLY valid JSON, no additional text or markdown formatting
+13. Return ONLY valid JSON, no additional text or markdown formatting"""
+
+
+# Built once per process. It opens every request unchanged, so the provider's
+# prompt cache can serve it and only the per-artwork tail is processed anew
+SYSTEM_PROMPT = f"{SYSTEM_MESSAGE}\n\n{create_static_prompt()}"
+
+
+def create_prompt(art_piece: Dict) -> str:
+    """Create the per-artwork part of the prompt, sent after SYSTEM_PROMPT."""
+    return f"""CURRENT DATA (you can edit any field if you have better information):
+{json.dumps(art_piece, indent=2)}
 
 Return the complete JSON object for this artwork:"""
+
+
+def build_messages(art_piece: Dict) -> List[Dict]:
+    """Chat messages asking the model to enrich an art piece."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": create_prompt(art_piece)}
+    ]
+
+
+def build_request(art_piece: Dict, model: str = DEFAULT_MODEL) -> Dict:
+    """Chat completion parameters for enriching an art piece."""
+    return {
+        "model": model,
+        "messages": build_messages(art_piece),
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS
+    }
+
+
+def create_group_prompt(art_pieces: List[Dict]) -> str:
+    """Create the per-request part of a prompt enriching several art pieces at once."""
+    return f"""CURRENT DATA: {len(art_pieces)} art pieces (you can edit any field if you have better information):
+{json.dumps(art_pieces, indent=2)}
+
+Enrich each art piece on its own. Return a JSON array with the complete JSON object for every art piece, in the same order:"""
+
+
+def build_group_request(art_pieces: List[Dict], model: str = DEFAULT_MODEL) -> Dict:
+    """Chat completion parameters for enriching several art pieces in one request."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": create_group_prompt(art_pieces)}
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": GROUP_MAX_TOKENS_PER_PIECE * len(art_pieces)
+    }
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int = MAX_TOKENS) -> int:
+    """Tokens a request counts against the tokens-per-minute limit.
+    
+    OpenAI reserves the prompt plus max_tokens when a request is admitted;
+    the prompt is estimated at ~4 characters per token.
+    """
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // 4 + 4 * len(messages) + max_tokens
+
+
+def strip_code_fences(content: str) -> str:
+    """Remove markdown code blocks around a JSON answer, if present."""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content.strip()
+
+
+def validation_problems(enriched: Dict) -> List[str]:
+    """Warnings about missing fields or values outside ART_TYPES / the main REGIONS categories."""
+    problems = []
+    
+    # Validate required fields
+    required_fields = ["title", "artist", "year", "type", "region"]
+    for field in required_fields:
+        if field not in enriched:
+            problems.append(f"Missing field '{field}' in response")
+    
+    # Validate type
+    if enriched.get("type") not in ART_TYPES:
+        problems.append(f"Invalid type '{enriched.get('type')}', should be one of {ART_TYPES}")
+    
+    # Validate region (check if it's a main category)
+    valid_regions = []
+    for major_region, sub_regions in REGIONS.items():
+        valid_regions.extend(sub_regions.keys())
     
-    return prompt
+    if enriched.get("region") not in valid_regions:
+        problems.append(f"Region '{enriched.get('region')}' may not be a valid main category")
+    
+    return problems
 
 
-def enrich_art_piece_with_ai(client: openai.OpenAI, art_piece: Dict, model: str = "gpt-4.1") -> Dict:
-    """Enrich a single art piece using OpenAI API."""
-    prompt = create_prompt(art_piece)
-    content = ""
+def parse_ai_response(content: str, art_piece: Dict) -> Dict:
+    """Parse and validate the model's JSON answer (the original art piece if it can't be parsed)."""
+    content = strip_code_fences(content)
     
+    # Parse JSON
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are an expert art historian. Return only valid JSON, no additional text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=2000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
-        
-        # Parse JSON
         enriched = json.loads(content)
-        
-        # Validate required fields
-        required_fields = ["title", "artist", "year", "type", "region"]
-        for field in required_fields:
-            if field not in enriched:
-                print(f"  ⚠️  Warning: Missing field '{field}' in response")
-        
-        # Validate type
-        if enriched.get("type") not in ART_TYPES:
-            print(f"  ⚠️  Warning: Invalid type '{enriched.get('type')}', should be one of {ART_TYPES}")
-        
-        # Validate region (check if it's a main category)
-        valid_regions = []
-        for major_region, sub_regions in REGIONS.items():
-            valid_regions.extend(sub_regions.keys())
-        
-        if enriched.get("region") not in valid_regions:
-            print(f"  ⚠️  Warning: Region '{enriched.get('region')}' may not be a valid main category")
-        
-        return enriched
-        
     except json.JSONDecodeError as e:
         print(f"  ❌ Error parsing JSON response: {e}")
         if content:
             print(f"  Response was: {content[:200]}...")
         return art_piece  # Return original if parsing fails
+    
+    for problem in validation_problems(enriched):
+        print(f"  ⚠️  Warning: {problem}")
+    
+    return enriched
+
+
+def _match_key(art_piece: Dict) -> Tuple[str, str]:
+    return (str(art_piece.get("title", "")).strip().casefold(), str(art_piece.get("artist", "")).strip().casefold())
+
+
+def parse_group_response(content: str, art_pieces: List[Dict]) -> List[Optional[Dict]]:
+    """Map the model's JSON array answer back onto the art pieces it was asked about.
+    
+    Elements are matched by title and artist, then by position if the array
+    has one element per art piece (the model may have corrected a title).
+    Art pieces without a valid element get None, to be retried on their own.
+    """
+    try:
+        data = json.loads(strip_code_fences(content))
+    except json.JSONDecodeError as e:
+        print(f"  ❌ Error parsing JSON array response: {e}")
+        return [None] * len(art_pieces)
+    if isinstance(data, dict):
+        # Tolerate {"artworks": [...]} and a lone object
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    elements = [element for element in data if isinstance(element, dict)] if isinstance(data, list) else []
+    
+    positions = {}
+    for position, element in enumerate(elements):
+        positions.setdefault(_match_key(element), position)
+    results: List[Optional[Dict]] = [None] * len(art_pieces)
+    claimed = set()
+    for index, art_piece in enumerate(art_pieces):
+        position = positions.get(_match_key(art_piece))
+        if position is not None and position not in claimed:
+            results[index] = elements[position]
+            claimed.add(position)
+    if len(elements) == len(art_pieces):
+        for index in range(len(art_pieces)):
+            if results[index] is None and index not in claimed:
+                results[index] = elements[index]
+                claimed.add(index)
+    
+    for index, enriched in enumerate(results):
+        if enriched is not None and validation_problems(enriched):
+            results[index] = None
+    return results
+
+
+class TokenUsage:
+    """Running totals of the API's usage fields, including prompt cache hits."""
+    
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        # Latency of requests that did / didn't hit the prompt cache: [count, seconds]
+        self.latency = {'cached': [0, 0.0], 'uncached': [0, 0.0]}
+    
+    def record(self, usage, seconds: Optional[float] = None) -> None:
+        """Add a response's usage (an SDK object, or the dict from a batch output file)."""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") or 0
+        self.requests += 1
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.cached_tokens += cached
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        if seconds is not None:
+            bucket = self.latency['cached' if cached else 'uncached']
+            bucket[0] += 1
+            bucket[1] += seconds
+    
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+    
+    def report(self) -> str:
+        lines = [f"{self.requests} requests: {self.prompt_tokens} prompt tokens, {self.cached_tokens} from the "
+                 f"prompt cache ({self.cached_ratio:.0%}), {self.completion_tokens} completion tokens"]
+        timed = {kind: seconds / count for kind, (count, seconds) in self.latency.items() if count}
+        if timed:
+            lines.append("  Average latency: " + ", ".join(f"{kind} {seconds:.2f}s" for kind, seconds in timed.items()))
+        return "\n".join(lines)
+
+
+def is_json_answer(content: str) -> bool:
+    """Whether an answer parses as JSON (only those are worth caching)."""
+    try:
+        json.loads(strip_code_fences(content))
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def _label(art_pieces: List[Dict]) -> str:
+    first = art_pieces[0]
+    label = f"{first.get('title', 'Unknown')} by {first.get('artist', 'Unknown')}"
+    return label if len(art_pieces) == 1 else f"{len(art_pieces)} art pieces from {label}"
+
+
+def complete(client: openai.OpenAI, request: Dict, usage: Optional[TokenUsage] = None,
+             cache: Optional[LLMCache] = None, label: str = '') -> str:
+    """Answer text of a chat completion request, from the cache if it was asked before."""
+    if cache is not None:
+        cached = cache.lookup(request)
+        if cached is not None:
+            return cached[0]
+    start = time.monotonic()
+    response = client.chat.completions.create(**request)
+    if usage is not None:
+        usage.record(response.usage, time.monotonic() - start)
+    content = response.choices[0].message.content or ""
+    if cache is not None and is_json_answer(content):
+        cache.store(request, content, response.usage, label)
+    return content
+
+
+async def complete_async(client: "openai.AsyncOpenAI", request: Dict, limiter: Optional[ModelRateLimiter] = None,
+                         usage: Optional[TokenUsage] = None, cache: Optional[LLMCache] = None,
+                         label: str = '') -> str:
+    """Async complete(); only requests that miss the cache wait for the rate limiter."""
+    # The cache's SQLite calls run in a worker thread so they don't stall the event loop
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.lookup, request)
+        if cached is not None:
+            return cached[0]
+    if limiter is not None:
+        await limiter.acquire(estimate_tokens(request["messages"], request["max_tokens"]))
+    start = time.monotonic()
+    response = await client.chat.completions.create(**request)
+    if usage is not None:
+        usage.record(response.usage, time.monotonic() - start)
+    content = response.choices[0].message.content or ""
+    if cache is not None and is_json_answer(content):
+        await asyncio.to_thread(cache.store, request, content, response.usage, label)
+    return content
+
+
+async def complete_retrying_async(client: "openai.AsyncOpenAI", request: Dict,
+                                  limiter: Optional[ModelRateLimiter] = None, usage: Optional[TokenUsage] = None,
+                                  cache: Optional[LLMCache] = None, label: str = '') -> str:
+    """complete_async(), queued again behind a RATE_LIMIT_PAUSE each time the API answers with a rate-limit error."""
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return await complete_async(client, request, limiter, usage, cache, label)
+        except openai.RateLimitError as e:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            # The client already retried; hold everyone back, then wait our turn again
+            print(f"  ⚠️  Rate limited by OpenAI API, retrying after {RATE_LIMIT_PAUSE:g}s: {e}")
+            if limiter is not None:
+                limiter.pause(RATE_LIMIT_PAUSE)
+            else:
+                await asyncio.sleep(RATE_LIMIT_PAUSE)
+
+
+def enrich_art_piece_with_ai(client: openai.OpenAI, art_piece: Dict, model: str = DEFAULT_MODEL,
+                             usage: Optional[TokenUsage] = None, cache: Optional[LLMCache] = None) -> Dict:
+    """Enrich a single art piece using OpenAI API (or the response cache)."""
+    try:
+        content = complete(client, build_request(art_piece, model), usage, cache, _label([art_piece]))
+        return parse_ai_response(content, art_piece)
+    except Exception as e:
+        print(f"  ❌ Error calling OpenAI API: {e}")
+        return art_piece  # Return original on error
+
+
+def enrich_group_with_ai(client: openai.OpenAI, art_pieces: List[Dict], model: str = DEFAULT_MODEL,
+                         usage: Optional[TokenUsage] = None, cache: Optional[LLMCache] = None) -> List[Dict]:
+    """Enrich several art pieces with one request; the ones that fail are retried individually."""
+    if len(art_pieces) == 1:
+        return [enrich_art_piece_with_ai(client, art_pieces[0], model, usage, cache)]
+    try:
+        content = complete(client, build_group_request(art_pieces, model), usage, cache, _label(art_pieces))
+        results = parse_group_response(content, art_pieces)
+    except Exception as e:
+        print(f"  ❌ Error calling OpenAI API: {e}")
+        results = [None] * len(art_pieces)
+    
+    failed = [index for index, enriched in enumerate(results) if enriched is None]
+    if failed:
+        print(f"  ⚠️  {len(failed)} of {len(art_pieces)} art pieces failed in the group, retrying them individually")
+    for index in failed:
+        results[index] = enrich_art_piece_with_ai(client, art_pieces[index], model, usage, cache)
+    return results
+
+
+async def enrich_art_piece_with_ai_async(client: "openai.AsyncOpenAI", art_piece: Dict, model: str = DEFAULT_MODEL,
+                                         limiter: Optional[ModelRateLimiter] = None,
+                                         usage: Optional[TokenUsage] = None,
+                                         cache: Optional[LLMCache] = None) -> Dict:
+    """Enrich a single art piece with the async client, waiting for the rate limiter first.
+    
+    Raises openai.RateLimitError if the request is still rate limited after
+    RATE_LIMIT_RETRIES attempts, rather than passing the art piece on unenriched.
+    """
+    try:
+        content = await complete_retrying_async(client, build_request(art_piece, model), limiter, usage, cache,
+                                                _label([art_piece]))
+        return parse_ai_response(content, art_piece)
+    except openai.RateLimitError:
+        raise
     except Exception as e:
         print(f"  ❌ Error calling OpenAI API: {e}")
         return art_piece  # Return original on error
 
 
+async def enrich_group_with_ai_async(client: "openai.AsyncOpenAI", art_pieces: List[Dict], model: str = DEFAULT_MODEL,
+                                     limiter: Optional[ModelRateLimiter] = None,
+                                     usage: Optional[TokenUsage] = None,
+                                     cache: Optional[LLMCache] = None) -> List[Dict]:
+    """Async enrich_group_with_ai, waiting for the rate limiter before each request."""
+    if len(art_pieces) == 1:
+        return [await enrich_art_piece_with_ai_async(client, art_pieces[0], model, limiter, usage, cache)]
+    try:
+        content = await complete_retrying_async(client, build_group_request(art_pieces, model), limiter, usage,
+                                                cache, _label(art_pieces))
+        results = parse_group_response(content, art_pieces)
+    except openai.RateLimitError:
+        raise
+    except Exception as e:
+        print(f"  ❌ Error calling OpenAI API: {e}")
+        results = [None] * len(art_pieces)
+    
+    failed = [index for index, enriched in enumerate(results) if enriched is None]
+    if failed:
+        print(f"  ⚠️  {len(failed)} of {len(art_pieces)} art pieces failed in the group, retrying them individually")
+    retried = await asyncio.gather(*[enrich_art_piece_with_ai_async(client, art_pieces[index], model, limiter,
+                                                                    usage, cache)
+                                     for index in failed])
+    for index, enriched in zip(failed, retried):
+        results[index] = enriched
+    return results
+
+
+async def enrich_dataset_with_ai_async(client: "openai.AsyncOpenAI", pending: List[Tuple[str, Dict]],
+                                       on_result: Callable[[str, Dict], None], model: str = DEFAULT_MODEL,
+                                       concurrency: int = 8, limiter: Optional[ModelRateLimiter] = None,
+                                       usage: Optional[TokenUsage] = None, group_size: int = 1,
+                                       cache: Optional[LLMCache] = None) -> None:
+    """Enrich (period, art piece) pairs with up to `concurrency` requests in flight.
+    
+    With group_size > 1 each request covers that many art pieces. on_result
+    receives every result in the order of `pending`, so the output stays a
+    prefix of the dataset and can be resumed from. A request still rate
+    limited after RATE_LIMIT_RETRIES attempts raises openai.RateLimitError,
+    leaving the art pieces from there on for the next run.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    groups = [pending[start:start + group_size] for start in range(0, len(pending), group_size)]
+    
+    async def run_group(start: int, group: List[Tuple[str, Dict]]) -> List[Dict]:
+        async with semaphore:
+            if len(group) == 1:
+                art_piece = group[0][1]
+                print(f"\n[{start + 1}/{len(pending)}] Processing: {art_piece.get('title', 'Unknown')} "
+                      f"by {art_piece.get('artist', 'Unknown')}")
+            else:
+                print(f"\n[{start + 1}-{start + len(group)}/{len(pending)}] Processing {len(group)} art pieces")
+            return await enrich_group_with_ai_async(client, [art_piece for _, art_piece in group], model,
+                                                    limiter, usage, cache)
+    
+    tasks = [asyncio.create_task(run_group(number * group_size, group)) for number, group in enumerate(groups)]
+    try:
+        # Commit in dataset order; later artworks keep running while we wait on earlier ones
+        for group, task in zip(groups, tasks):
+            for (period, _), enriched_piece in zip(group, await task):
+                on_result(period, enriched_piece)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _save_batch_state(state: Dict) -> None:
+    with open(BATCH_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+def enrich_dataset_with_ai_batch(client: openai.OpenAI, dataset: Dict, enriched_dataset: Dict, output_file: str,
+                                 model: str = DEFAULT_MODEL, poll_interval: float = 60.0,
+                                 print_results: bool = False, usage: Optional[TokenUsage] = None,
+                                 cache: Optional[LLMCache] = None) -> None:
+    """Enrich every art piece not in the output yet through the Batch API.
+    
+    Renders the requests to JSONL, submits them, polls until the batches
+    finish and appends the results to enriched_dataset (saved to
+    output_file). Progress is kept in BATCH_STATE_FILE: an interrupted run
+    resumes polling instead of submitting again, and after failed requests
+    the next run resubmits only those, reusing the results already received.
+    Requests answered by the cache aren't submitted at all.
+    """
+    if os.path.exists(BATCH_STATE_FILE):
+        with open(BATCH_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        print(f"Resuming from {BATCH_STATE_FILE}: {len(state['batches'])} submitted batch(es), "
+              f"{len(state['results'])} results already received")
+    else:
+        pending = [(period, index) for period, art_pieces in dataset.items()
+                   for index in range(len(enriched_dataset.get(period, [])), len(art_pieces))]
+        if not pending:
+            print("Nothing left to enrich")
+            return
+        # requests: custom_id -> [period, index], in dataset order; results: custom_id -> model answer
+        state = {'model': model, 'requests': {str(number): [period, index]
+                                              for number, (period, index) in enumerate(pending)},
+                 'results': {}, 'batches': [], 'input_files': []}
+    
+    def request_for(custom_id: str) -> Dict:
+        period, index = state['requests'][custom_id]
+        return build_request(dataset[period][index], state['model'])
+    
+    if not state['batches']:
+        to_submit = [custom_id for custom_id in state['requests'] if custom_id not in state['results']]
+        if cache is not None:
+            for custom_id in to_submit:
+                cached = cache.lookup(request_for(custom_id))
+                if cached is not None:
+                    state['results'][custom_id] = cached[0]
+            answered = [custom_id for custom_id in to_submit if custom_id in state['results']]
+            if answered:
+                print(f"✓ {len(answered)} of {len(to_submit)} requests answered by the response cache")
+            to_submit = [custom_id for custom_id in to_submit if custom_id not in state['results']]
+        for start in range(0, len(to_submit), MAX_BATCH_REQUESTS):
+            path = f"dataset_AI.batch{start // MAX_BATCH_REQUESTS + 1}.jsonl"
+            count = write_batch_file(path, ((custom_id, request_for(custom_id))
+                                            for custom_id in to_submit[start:start + MAX_BATCH_REQUESTS]))
+            batch_id = submit_batch(client, path, metadata={'description': f"{output_file} enrichment"})
+            state['batches'].append(batch_id)
+            state['input_files'].append(path)
+            _save_batch_state(state)
+            print(f"✓ Submitted batch {batch_id} with {count} requests ({path})")
+    
+    batches = {}
+    if state['batches']:
+        print(f"Waiting for batches (polling every {poll_interval:g}s)...")
+        batches = wait_for_batches(client, state['batches'], poll_interval)
+    failed = 0
+    for batch in batches.values():
+        for custom_id, result in read_batch_results(client, batch).items():
+            content = completion_content(result)
+            if usage is not None and content is not None:
+                usage.record(result.get('usage'))
+            if content is None:
+                period, index = state['requests'][custom_id]
+                print(f"  ❌ {dataset[period][index].get('title', 'Unknown')}: {result['error']}")
+                failed += 1
+            else:
+                state['results'][custom_id] = content
+                if cache is not None and is_json_answer(content):
+                    period, index = state['requests'][custom_id]
+                    cache.store(request_for(custom_id), content, result.get('usage'),
+                                _label([dataset[period][index]]))
+    
+    # Append in dataset order; a period stops at its first artwork without a
+    # result so the output stays a prefix of the dataset
+    ingested = 0
+    blocked = set()
+    remaining = {}
+    for custom_id, (period, index) in state['requests'].items():
+        done = enriched_dataset.setdefault(period, [])
+        if index < len(done):
+            continue  # Already in the output
+        content = state['results'].get(custom_id)
+        if period in blocked or index != len(done) or content is None:
+            blocked.add(period)
+            remaining[custom_id] = [period, index]
+            continue
+        enriched_piece = parse_ai_response(content, dataset[period][index])
+        done.append(enriched_piece)
+        ingested += 1
+        if print_results:
+            print_artwork_result(enriched_piece)
+    save_dataset(output_file, enriched_dataset)
+    remove_files(state['input_files'])
+    print(f"✓ Ingested {ingested} results into {output_file}")
+    
+    if remaining:
+        # Keep the results waiting behind a failed request; the next run only resubmits the failures
+        _save_batch_state({'model': state['model'], 'requests': remaining,
+                           'results': {custom_id: state['results'][custom_id]
+                                       for custom_id in remaining if custom_id in state['results']},
+                           'batches': [], 'input_files': []})
+        print(f"⚠️  {len(remaining)} art pieces not ingested ({failed} failed requests); "
+              f"run again to resubmit the failures")
+    else:
+        remove_files([BATCH_STATE_FILE])
+
+
 def save_dataset(output_file: str, enriched_dataset: Dict) -> None:
     """Save the enriched dataset to JSON file."""
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -216,11 +696,37 @@ def print_artwork_result(enriched_piece: Dict) -> None:
     print("─" * 50)
 
 
-def main(print_results: bool = True):
+def print_summary(output_file: str, usage: TokenUsage, cache: Optional[LLMCache] = None) -> None:
+    """Print the end-of-run summary, including how much the prompt and response caches served."""
+    print(f"\n{'=' * 50}")
+    print(f"✓ AI enrichment complete!")
+    if usage.requests:
+        print(f"✓ {usage.report()}")
+    if cache is not None:
+        print(f"✓ Response cache ({cache.path}): {cache.stats['hits']} hits, {cache.stats['misses']} misses, "
+              f"{cache.stats['stores']} answers stored")
+    print(f"✓ Final dataset saved to {output_file}")
+    print(f"{'=' * 50}")
+
+
+def main(print_results: bool = True, async_mode: bool = False, concurrency: int = 8,
+         requests_per_minute: float = 500, tokens_per_minute: float = 30000, model: str = DEFAULT_MODEL,
+         batch_mode: bool = False, batch_poll_interval: float = 60.0, base_url: Optional[str] = None,
+         group_size: int = 1, cache_file: Optional[str] = LLM_CACHE_FILE):
     """Main function to enrich the dataset with AI.
     
     Args:
         print_results: If True, print the enriched result after each artwork.
+        async_mode: If True, send up to `concurrency` requests at once with the async client.
+        concurrency: Maximum requests in flight in async mode.
+        requests_per_minute: Request limit of the API key's rate-limit tier (async mode).
+        tokens_per_minute: Token limit of the API key's rate-limit tier (async mode).
+        model: Chat model to use.
+        batch_mode: If True, enrich everything through the Batch API (submit, poll, ingest).
+        batch_poll_interval: Seconds between batch status checks.
+        base_url: Alternative OpenAI-compatible API base URL (e.g. a local stub).
+        group_size: Art pieces enriched per request (failed ones are retried individually).
+        cache_file: SQLite file caching model answers by prompt hash (None to always call the API).
     """
     print("AI Art Dataset Enrichment")
     print("=" * 50)
@@ -234,7 +740,7 @@ def main(print_results: bool = True):
         return
     
     # Initialize OpenAI client
-    client = openai.OpenAI(api_key=api_key)
+    client = openai.OpenAI(api_key=api_key, base_url=base_url)
     
     # Read input dataset
     input_file = "dataset_complete.json"
@@ -261,6 +767,74 @@ def main(print_results: bool = True):
             print(f"Warning: Could not load existing file: {e}")
             print("Starting fresh...")
     
+    usage = TokenUsage()
+    cache = LLMCache(cache_file) if cache_file else None
+    if cache is not None:
+        print(f"Response cache: {cache_file} ({len(cache)} cached answers)")
+    if batch_mode:
+        if group_size > 1:
+            print("⚠️  --group-size is ignored in batch mode (batch requests are already half price)")
+        enrich_dataset_with_ai_batch(client, dataset, enriched_dataset, output_file, model=model,
+                                     poll_interval=batch_poll_interval, print_results=print_results, usage=usage,
+                                     cache=cache)
+        print_summary(output_file, usage, cache)
+        return
+    
+    # Everything not in the output yet, in dataset order
+    pending = [(period, art_piece) for period, art_pieces in dataset.items()
+               for art_piece in art_pieces[len(enriched_dataset.get(period, [])):]]
+    
+    def on_result(period: str, enriched_piece: Dict) -> None:
+        enriched_dataset.setdefault(period, []).append(enriched_piece)
+        if print_results:
+            print_artwork_result(enriched_piece)
+        save_dataset(output_file, enriched_dataset)
+    
+    if async_mode:
+        print(f"Async mode: {len(pending)} art pieces to enrich, up to {concurrency} requests in flight, "
+              f"{requests_per_minute:g} requests/min, {tokens_per_minute:g} tokens/min")
+        if group_size > 1:
+            print(f"Grouping {group_size} art pieces per request")
+        limiter = ModelRateLimiter(requests_per_minute, tokens_per_minute)
+        
+        async def run() -> None:
+            async with openai.AsyncOpenAI(api_key=api_key, base_url=base_url) as async_client:
+                await enrich_dataset_with_ai_async(async_client, pending, on_result, model=model,
+                                                   concurrency=concurrency, limiter=limiter, usage=usage,
+                                                   group_size=group_size, cache=cache)
+        
+        start_time = time.monotonic()
+        try:
+            asyncio.run(run())
+        except openai.RateLimitError as e:
+            # Everything before the rate-limited art piece is saved; a re-run picks up from there
+            print(f"\n❌ Still rate limited after {RATE_LIMIT_RETRIES} retries, stopping: {e}")
+            print(f"Re-run to resume from {output_file}")
+            print_summary(output_file, usage, cache)
+            return
+        elapsed = time.monotonic() - start_time
+        print(f"\n✓ {len(pending)} art pieces in {elapsed:.1f}s "
+              f"({len(pending) / elapsed if elapsed else 0:.2f}/s), "
+              f"{limiter.stats['wait_seconds']:.1f}s waiting on rate limits")
+        print_summary(output_file, usage, cache)
+        return
+    
+    if group_size > 1:
+        print(f"Grouped mode: {len(pending)} art pieces to enrich, {group_size} per request")
+        start_time = time.monotonic()
+        for start in range(0, len(pending), group_size):
+            group = pending[start:start + group_size]
+            print(f"\n[{start + 1}-{start + len(group)}/{len(pending)}] Processing {len(group)} art pieces")
+            enriched_pieces = enrich_group_with_ai(client, [art_piece for _, art_piece in group], model, usage,
+                                                   cache)
+            for (period, _), enriched_piece in zip(group, enriched_pieces):
+                on_result(period, enriched_piece)
+            print(f"  ✓ Saved progress to {output_file}")
+        elapsed = time.monotonic() - start_time
+        print(f"\n✓ {len(pending)} art pieces in {elapsed:.1f}s ({len(pending) / elapsed if elapsed else 0:.2f}/s)")
+        print_summary(output_file, usage, cache)
+        return
+    
     # Enrich dataset
     current_piece = 0
     
@@ -287,7 +861,8 @@ def main(print_results: bool = True):
             
             print(f"\n[{current_piece}/{total_pieces}] Processing: {title} by {artist}")
             
-            enriched_piece = enrich_art_piece_with_ai(client, art_piece)
+            requests_before = usage.requests
+            enriched_piece = enrich_art_piece_with_ai(client, art_piece, model, usage, cache)
             enriched_dataset[period].append(enriched_piece)
             
             # Print result if requested
@@ -298,20 +873,44 @@ def main(print_results: bool = True):
             save_dataset(output_file, enriched_dataset)
             print(f"  ✓ Saved progress to {output_file}")
             
-            # Rate limiting - be respectful to API
-            time.sleep(1)  # 1 second delay between requests
+            # Rate limiting - be respectful to API (cached answers made no request)
+            if usage.requests > requests_before:
+                time.sleep(1)  # 1 second delay between requests
     
-    print(f"\n{'=' * 50}")
-    print(f"✓ AI enrichment complete!")
-    print(f"✓ Final dataset saved to {output_file}")
-    print(f"{'=' * 50}")
+    print_summary(output_file, usage, cache)
 
 
 if __name__ == "__main__":
-    # Check for command-line argument to disable printing
-    print_results = True
-    if len(sys.argv) > 1 and sys.argv[1] in ['--no-print', '-n']:
-        print_results = False
+    parser = argparse.ArgumentParser(description="Enrich the art dataset with OpenAI.")
+    parser.add_argument('--no-print', '-n', dest='print_results', action='store_false',
+                        help="don't print each enriched result")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="send several requests concurrently with the async client")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="maximum requests in flight in async mode (default: 8)")
+    parser.add_argument('--rpm', type=float, default=500,
+                        help="requests per minute allowed by your rate-limit tier (default: 500)")
+    parser.add_argument('--tpm', type=float, default=30000,
+                        help="tokens per minute allowed by your rate-limit tier (default: 30000)")
+    parser.add_argument('--model', default=DEFAULT_MODEL,
+                        help=f"chat model to use (default: {DEFAULT_MODEL})")
+    parser.add_argument('--batch', action='store_true',
+                        help="enrich everything through the Batch API: submit, wait for completion, ingest")
+    parser.add_argument('--batch-poll', type=float, default=60.0, metavar='SECONDS',
+                        help="seconds between batch status checks (default: 60)")
+    parser.add_argument('--base-url', default=None,
+                        help="OpenAI-compatible API base URL, e.g. http://127.0.0.1:8001/v1 for benchmarks/stub_openai.py")
+    parser.add_argument('--group-size', type=int, default=1, metavar='N',
+                        help="enrich N art pieces (e.g. 5-20) per request; failed ones are retried individually")
+    parser.add_argument('--cache-file', default=LLM_CACHE_FILE, metavar='FILE',
+                        help=f"response cache; unchanged prompts are answered from it (default: {LLM_CACHE_FILE})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always call the API (answers aren't cached either)")
+    args = parser.parse_args()
+    if not args.print_results:
         print("Running in quiet mode (results will not be printed)")
     
-    main(print_results=print_results)
+    main(print_results=args.print_results, async_mode=args.async_mode, concurrency=args.concurrency,
+         requests_per_minute=args.rpm, tokens_per_minute=args.tpm, model=args.model, batch_mode=args.batch,
+         batch_poll_interval=args.batch_poll, base_url=args.base_url, group_size=max(1, args.group_size),
+         cache_file=None if args.no_cache else args.cache_file)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Incremental scanner for the lead image of a rendered Wikipedia article.
+
+The scanner is fed the article HTML chunk by chunk (html.parser based, no
+backtracking regexes over the whole page) and sets `done` as soon as the
+infobox image is known, or the lead image once the lead section is over,
+so the caller can stop reading the response. SVG images (icons, logos,
+maps) are never picked, so a page without a raster lead image is read to
+the end. Along the way it collects every upload.wikimedia.org image URL for
+the fallbacks.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+
+# Attributes that may hold an image URL, and the lazy-loading subset of them
+URL_ATTRIBUTES = ('src', 'href', 'data-src', 'data-image', 'data-file', 'data-original')
+LAZY_ATTRIBUTES = ('data-src', 'data-image')
+
+# Original (or thumbnail) files on upload.wikimedia.org, SVG excluded
+_ATTRIBUTE_URL_RE = re.compile(
+    r'https://upload\.wikimedia\.org/wikipedia/(?:commons|en)/[a-f0-9]/[a-f0-9]{2}/[^"]+\.(?:jpg|jpeg|png|gif|webp)$',
+    re.IGNORECASE,
+)
+_STANDALONE_URL_RE = re.compile(
+    r'https://upload\.wikimedia\.org/wikipedia/(?:commons|en)/[a-f0-9]/[a-f0-9]{2}/[^\s"\'<>\)]+\.(?:jpg|jpeg|png|gif|webp)',
+    re.IGNORECASE,
+)
+_LAZY_URL_RE = re.compile(r'upload\.wikimedia\.org.+\.(?:jpg|jpeg|png|gif|webp)$', re.IGNORECASE)
+
+
+def is_svg_url(url: str) -> bool:
+    """Whether a URL points to an SVG file or a rendition of one (usually an icon, not artwork)."""
+    url_lower = url.lower()
+    return '.svg' in url_lower or '%2esvg' in url_lower
+
+
+class ArticleImageScanner(HTMLParser):
+    """Finds the infobox image, the first content image and all Wikimedia image URLs."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # First non-SVG <img> after the infobox table / content container opens
+        self.infobox_image: Optional[str] = None
+        self.content_image: Optional[str] = None
+        # upload.wikimedia.org URLs in page order: as whole attribute values,
+        # anywhere in attributes or text, and in lazy-loading attributes
+        self.attribute_urls: List[str] = []
+        self.standalone_urls: List[str] = []
+        self.lazy_urls: List[str] = []
+        self.done = False
+        self._after_infobox = False
+        self._after_content_start = False
+    
+    def feed(self, data: str) -> None:
+        if not self.done:
+            super().feed(data)
+    
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if self.done:
+            return
+        attrs = {name: value for name, value in attrs if value}
+        if tag == 'table' and 'infobox' in attrs.get('class', '').lower():
+            self._after_infobox = True
+        elif tag == 'div' and 'mw-parser-output' in attrs.get('class', '').lower():
+            self._after_content_start = True
+        elif tag == 'img':
+            src = attrs.get('src') or attrs.get('data-src')
+            if src and not is_svg_url(src):
+                if self._after_infobox and self.infobox_image is None:
+                    self.infobox_image = src
+                    # The infobox image beats everything else
+                    self.done = True
+                if self._after_content_start and self.content_image is None and 'upload.wikimedia.org' in src:
+                    self.content_image = src
+        elif tag == 'h2' and self.content_image is not None:
+            # The infobox sits in the lead section; once it's over the lead image stands
+            self.done = True
+        
+        for name, value in attrs.items():
+            if 'upload.wikimedia.org' not in value:
+                continue
+            if name in URL_ATTRIBUTES and _ATTRIBUTE_URL_RE.match(value):
+                self.attribute_urls.append(value)
+            if name in LAZY_ATTRIBUTES and _LAZY_URL_RE.search(value):
+                self.lazy_urls.append(value)
+            self.standalone_urls.extend(_STANDALONE_URL_RE.findall(value))
+    
+    handle_startendtag = handle_starttag
+    
+    def handle_data(self, data: str) -> None:
+        if not self.done and 'upload.wikimedia.org' in data:
+            self.standalone_urls.extend(_STANDALONE_URL_RE.findall(data))
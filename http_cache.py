@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache backed by SQLite.
+
+Responses are keyed by normalized URL + query parameters, stored
+zlib-compressed, expire after a per-endpoint TTL and are revalidated with
+ETag / Last-Modified once stale. The cache is trimmed back under a size
+budget by evicting the least recently used entries.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+DAY = 24 * 60 * 60
+
+# Time-to-live (seconds) per endpoint kind, see HTTPCache.endpoint_for()
+DEFAULT_TTLS = {
+    'summary': 7 * DAY,
+    'html': 7 * DAY,
+    'api': 3 * DAY,
+    'search': 1 * DAY,
+    'not_found': 1 * DAY,
+    'default': 1 * DAY,
+}
+
+# Only these response headers are worth keeping alongside the body
+STORED_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+class CachedEntry:
+    """A response row loaded from the cache."""
+    
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes, expires_at: float):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+    
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+    
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers to revalidate this entry."""
+        headers = {}
+        if self.headers.get('etag'):
+            headers['If-None-Match'] = self.headers['etag']
+        if self.headers.get('last-modified'):
+            headers['If-Modified-Since'] = self.headers['last-modified']
+        return headers
+    
+    def to_response(self) -> requests.Response:
+        """Rebuild a requests.Response so callers can't tell it came from disk."""
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers) or 'utf-8'
+        response._content = self.body
+        response._content_consumed = True
+        return response
+
+
+class HTTPCache:
+    """SQLite-backed cache for HTTP GET responses."""
+    
+    def __init__(self, path: str = ".http_cache.sqlite", ttls: Optional[Dict[str, float]] = None,
+                 max_size_mb: float = 512.0):
+        """Open (creating if needed) the cache database.
+        
+        Args:
+            path: SQLite database file.
+            ttls: Per-endpoint TTL overrides in seconds (keys as in DEFAULT_TTLS).
+            max_size_mb: Compressed body budget; least recently used entries are evicted beyond it.
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict] = None) -> str:
+        """Normalize a URL and its params into a stable cache key."""
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            query.extend((str(k), str(v)) for k, v in params.items() if v is not None)
+        query.sort()
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+    
+    @staticmethod
+    def endpoint_for(url: str, params: Optional[Dict] = None) -> str:
+        """Classify a request into one of the TTL buckets."""
+        if '/page/summary/' in url:
+            return 'summary'
+        if '/page/html/' in url or '/page/structured-content/' in url or '/wiki/' in url:
+            return 'html'
+        if url.endswith('/w/api.php'):
+            if params and params.get('list') == 'search':
+                return 'search'
+            return 'api'
+        return 'default'
+    
+    def lookup(self, url: str, params: Optional[Dict] = None) -> Optional[CachedEntry]:
+        """Return the cached entry for a request (fresh or stale), or None."""
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        status, headers, body, expires_at = row
+        return CachedEntry(url, status, json.loads(headers), zlib.decompress(body), expires_at)
+    
+    def store(self, url: str, params: Optional[Dict], response: requests.Response) -> None:
+        """Store a response body under its request key."""
+        endpoint = 'not_found' if response.status_code == 404 else self.endpoint_for(url, params)
+        ttl = self.ttls.get(endpoint, self.ttls['default'])
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = zlib.compress(response.content, 6)
+        key = self.make_key(url, params)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, response.status_code, json.dumps(headers), body, len(body), now, now + ttl, now),
+            )
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            self.stats['stores'] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+    
+    def refresh(self, url: str, params: Optional[Dict], entry: CachedEntry) -> None:
+        """Extend a stale entry's lifetime after a 304 Not Modified."""
+        endpoint = 'not_found' if entry.status == 404 else self.endpoint_for(url, params)
+        ttl = self.ttls.get(endpoint, self.ttls['default'])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, expires_at = ?, last_access = ? WHERE key = ?",
+                (now, now + ttl, now, self.make_key(url, params)),
+            )
+            self._conn.commit()
+    
+    def _evict(self) -> None:
+        """Drop least recently used rows until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.stats['evictions'] += 1
+    
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+    
+    def get(self, fetch: Callable[..., requests.Response], url: str, params: Optional[Dict] = None,
+            **kwargs) -> requests.Response:
+        """GET through the cache.
+        
+        `fetch` is called like requests.Session.get for misses and revalidation.
+        """
+        entry = self.lookup(url, params)
+        if entry is not None and entry.is_fresh:
+            self._bump('hits')
+            return entry.to_response()
+        
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            headers.update(entry.validators())
+        response = fetch(url, params=params, headers=headers or None, **kwargs)
+        
+        if response.status_code == 304 and entry is not None:
+            self._bump('revalidated')
+            self.refresh(url, params, entry)
+            return entry.to_response()
+        
+        self._bump('misses')
+        # An action API error (e.g. a maxlag refusal) comes back as HTTP 200 but isn't an answer
+        if response.status_code in (200, 404) and 'MediaWiki-API-Error' not in response.headers:
+            self.store(url, params, response)
+        return response
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP transport for the dataset scripts.
+
+One requests.Session with keep-alive connection pools sized per host,
+gzip, separate connect/read timeouts and a cap on concurrent requests per
+host (held by a streamed response until it is closed). Every request is recorded in TransportMetrics (latency histogram,
+bytes transferred, status counts per host), which can be printed or dumped
+as JSON at the end of a run.
+
+geopy geocoders can use the same transport through ClientGeopyAdapter.
+"""
+
+import bisect
+import json
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_fixtures import FixtureStore
+
+# Optional geopy integration (only needed for geocoding)
+try:
+    from geopy.adapters import RequestsAdapter
+    GEOPY_AVAILABLE = True
+except ImportError:
+    RequestsAdapter = object
+    GEOPY_AVAILABLE = False
+
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HostPolicy:
+    """Connection pool size, concurrency cap and timeouts for one host."""
+    
+    def __init__(self, max_connections: int = 10, max_concurrent: int = 8, timeout: Optional[Timeout] = None):
+        """Initialize the policy.
+        
+        Args:
+            max_connections: Keep-alive connections pooled for the host.
+            max_concurrent: Requests allowed in flight to the host at once.
+            timeout: (connect, read) timeouts; None uses the client default.
+        """
+        self.max_connections = max_connections
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+
+
+# Defaults for the hosts the dataset scripts talk to
+DEFAULT_HOST_POLICIES = {
+    'upload.wikimedia.org': HostPolicy(max_connections=8, max_concurrent=4, timeout=(5.0, 60.0)),
+    'nominatim.openstreetmap.org': HostPolicy(max_connections=1, max_concurrent=1),
+}
+
+
+class TransportMetrics:
+    """Thread-safe per-host request metrics."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hosts: Dict[str, Dict] = {}
+    
+    def _host(self, host: str) -> Dict:
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = {
+                'requests': 0,
+                'errors': 0,
+                'bytes': 0,
+                'seconds': 0.0,
+                'statuses': {},
+                'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+            self.hosts[host] = stats
+        return stats
+    
+    def record(self, host: str, status: Optional[int], seconds: float, size: int = 0) -> None:
+        """Record one request (status None for a request that raised)."""
+        with self._lock:
+            stats = self._host(host)
+            stats['requests'] += 1
+            stats['seconds'] += seconds
+            stats['bytes'] += size
+            stats['latency_buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            key = str(status) if status is not None else 'error'
+            stats['statuses'][key] = stats['statuses'].get(key, 0) + 1
+            if status is None:
+                stats['errors'] += 1
+    
+    def percentile(self, host: str, fraction: float) -> float:
+        """Approximate latency percentile (upper bound of the bucket it falls in)."""
+        with self._lock:
+            buckets = list(self.hosts[host]['latency_buckets'])
+        target = fraction * sum(buckets)
+        running = 0
+        for index, count in enumerate(buckets):
+            running += count
+            if count and running >= target:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float('inf')
+        return 0.0
+    
+    def snapshot(self) -> Dict:
+        """A JSON-serializable copy of the metrics."""
+        with self._lock:
+            hosts = json.loads(json.dumps(self.hosts))
+        return {'latency_buckets': list(LATENCY_BUCKETS), 'hosts': hosts}
+    
+    def dump(self, path: str) -> None:
+        """Write the metrics to a JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+    
+    def report(self) -> str:
+        """Per-host summary table."""
+        lines = [f"{'host':<32} {'requests':>8} {'errors':>6} {'MB':>8} {'avg s':>6} {'p50 s':>6} {'p95 s':>6}  statuses"]
+        for host in sorted(self.hosts):
+            stats = self.hosts[host]
+            average = stats['seconds'] / stats['requests'] if stats['requests'] else 0.0
+            statuses = ', '.join(f"{status}: {count}" for status, count in sorted(stats['statuses'].items()))
+            lines.append(
+                f"{host[:32]:<32} {stats['requests']:>8} {stats['errors']:>6} {stats['bytes'] / (1024 * 1024):>8.2f} "
+                f"{average:>6.2f} {self.percentile(host, 0.5):>6.2f} {self.percentile(host, 0.95):>6.2f}  {statuses}"
+            )
+        return '\n'.join(lines)
+
+
+class HTTPClient:
+    """Pooled, metered HTTP client shared by the dataset scripts."""
+    
+    def __init__(self, user_agent: str, timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 pool_size: int = 10, max_concurrent_per_host: int = 8,
+                 host_policies: Optional[Dict[str, HostPolicy]] = None,
+                 fixtures: Optional[FixtureStore] = None):
+        """Create the session and its connection pools.
+        
+        Args:
+            user_agent: User-Agent header sent with every request.
+            timeout: Default (connect, read) timeouts.
+            pool_size: Keep-alive connections per host without a specific policy.
+            max_concurrent_per_host: Requests in flight per host without a specific policy.
+            host_policies: Per-host overrides (default: DEFAULT_HOST_POLICIES).
+            fixtures: Record responses to, or replay them from, this fixture store.
+        """
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_concurrent_per_host = max_concurrent_per_host
+        self.host_policies = dict(DEFAULT_HOST_POLICIES if host_policies is None else host_policies)
+        self.metrics = TransportMetrics()
+        self.fixtures = fixtures
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+        
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        self._mount_adapters()
+    
+    def _mount_adapters(self) -> None:
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # requests picks the longest matching prefix, so these win for their hosts
+        for host, policy in self.host_policies.items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.max_connections)
+            self.session.mount(f"https://{host}/", adapter)
+            self.session.mount(f"http://{host}/", adapter)
+    
+    def set_pool_size(self, size: int) -> None:
+        """Resize the default connection pools and concurrency cap (e.g. to match a worker count)."""
+        self.pool_size = size
+        self.max_concurrent_per_host = size
+        with self._slots_lock:
+            self._slots = {host: slot for host, slot in self._slots.items() if host in self.host_policies}
+        for adapter in set(self.session.adapters.values()):
+            adapter.close()
+        self._mount_adapters()
+    
+    def _policy(self, host: str) -> HostPolicy:
+        return self.host_policies.get(host) or HostPolicy(self.pool_size, self.max_concurrent_per_host)
+    
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        """The semaphore holding the host's concurrent request slots."""
+        with self._slots_lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self._policy(host).max_concurrent)
+                self._slots[host] = slot
+        return slot
+    
+    @staticmethod
+    def _release_on_close(response: requests.Response, slot: threading.BoundedSemaphore) -> None:
+        """Keep a streamed response's slot until it is closed (or garbage collected)."""
+        release = weakref.finalize(response, slot.release)  # Runs at most once
+        close = response.close
+        
+        def close_and_release() -> None:
+            try:
+                close()
+            finally:
+                release()
+        response.close = close_and_release
+    
+    def _timeout(self, host: str, timeout: Optional[Timeout]) -> Tuple[float, float]:
+        """Resolve a request timeout; a single number is taken as the read timeout."""
+        default = self._policy(host).timeout or self.timeout
+        if timeout is None:
+            return default if isinstance(default, tuple) else (default, default)
+        if isinstance(timeout, tuple):
+            return timeout
+        connect = default[0] if isinstance(default, tuple) else default
+        return (min(connect, timeout), timeout)
+    
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the shared session, recording its metrics.
+        
+        Streamed responses are counted by their Content-Length, since the body
+        is read later by the caller, and keep their host slot until the caller
+        closes them. With a fixture store, responses are recorded (bodies then
+        read in full) or replayed instead of sent.
+        """
+        host = urlparse(url).netloc
+        kwargs['timeout'] = self._timeout(host, kwargs.get('timeout'))
+        streamed = kwargs.get('stream') and self.fixtures is None
+        slot = self._slot(host)
+        slot.acquire()
+        try:
+            start = time.perf_counter()
+            try:
+                if self.fixtures is not None and self.fixtures.replaying:
+                    response = self.fixtures.replay(method, url, kwargs.get('params'))
+                else:
+                    response = self.session.request(method, url, **kwargs)
+                    if not streamed:
+                        response.content  # Read the body inside the slot and the timing
+            except requests.RequestException:
+                self.metrics.record(host, None, time.perf_counter() - start)
+                raise
+        except BaseException:
+            slot.release()
+            raise
+        if streamed:
+            self._release_on_close(response, slot)
+        else:
+            slot.release()
+        elapsed = time.perf_counter() - start
+        if self.fixtures is not None and not self.fixtures.replaying:
+            self.fixtures.record(method, url, kwargs.get('params'), response, elapsed)
+        if kwargs.get('stream'):
+            size = int(response.headers.get('Content-Length') or 0)
+        else:
+            # Bytes on the wire (compressed), falling back to the decoded body size
+            size = response.raw.tell() if hasattr(response.raw, 'tell') else len(response.content or b'')
+        self.metrics.record(host, response.status_code, elapsed, size)
+        return response
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+    
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request('HEAD', url, **kwargs)
+    
+    def close(self) -> None:
+        self.session.close()
+
+
+class _ClientSession:
+    """The part of requests.Session that geopy's RequestsAdapter uses, backed by an HTTPClient."""
+    
+    def __init__(self, client: HTTPClient):
+        self.client = client
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.client.get(url, **kwargs)
+    
+    def close(self) -> None:
+        pass  # The client outlives the geocoder
+
+
+class ClientGeopyAdapter(RequestsAdapter):
+    """geopy adapter sending requests through an HTTPClient.
+    
+    geopy's own error handling (timeouts, HTTP errors -> geopy exceptions)
+    is kept; only the transport is swapped. Use via
+    Nominatim(..., adapter_factory=geopy_adapter_factory(client)).
+    """
+    
+    def __init__(self, client: HTTPClient, **kwargs):
+        if not GEOPY_AVAILABLE:
+            raise ImportError("geopy is required for ClientGeopyAdapter")
+        super().__init__(**kwargs)
+        self.session.close()
+        self.session = _ClientSession(client)
+
+
+def geopy_adapter_factory(client: HTTPClient):
+    """Return an adapter_factory for geopy geocoders that uses `client`."""
+    def factory(**kwargs):
+        return ClientGeopyAdapter(client, **kwargs)
+    return factory
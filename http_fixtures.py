@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Record/replay fixtures for HTTP exchanges.
+
+In record mode every response that goes through HTTPClient is stored in a
+SQLite fixture file (zlib-compressed body, headers, status and the time it
+took). In replay mode HTTPClient answers from the fixture file instead of
+the network, optionally sleeping for the recorded or a fixed latency, so
+enrichment runs can be profiled and compared offline and deterministically.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from http_cache import HTTPCache
+
+
+# Headers that describe the wire encoding, not the (decoded) body we store
+_TRANSFER_HEADERS = ('content-encoding', 'transfer-encoding', 'connection', 'keep-alive')
+
+
+class FixtureMissing(requests.RequestException):
+    """Replay mode got a request that was never recorded."""
+
+
+class FixtureStore:
+    """SQLite file of recorded HTTP exchanges, keyed by method + normalized URL."""
+    
+    def __init__(self, path: str, mode: str = 'replay', latency: Optional[float] = None,
+                 recorded_latency: bool = False):
+        """Open the fixture file (record mode creates it if needed).
+        
+        Args:
+            path: SQLite fixture file.
+            mode: 'record' to capture network responses, 'replay' to serve them.
+            latency: Fixed delay (seconds) added to every replayed response.
+            recorded_latency: Replay each response after the time it originally took.
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"unknown fixture mode {mode!r}")
+        if mode == 'replay' and not os.path.exists(path):
+            raise FileNotFoundError(f"fixture file {path} not found (record it first with --record)")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded_latency = recorded_latency
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS exchanges (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                elapsed REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+    
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+        return f"{method.upper()} {HTTPCache.make_key(url, params)}"
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM exchanges").fetchone()[0]
+    
+    def record(self, method: str, url: str, params: Optional[Dict], response: requests.Response,
+               elapsed: float) -> None:
+        """Store a network response (its body is read in full)."""
+        body = response.content
+        headers = {name.lower(): value for name, value in response.headers.items()
+                   if name.lower() not in _TRANSFER_HEADERS}
+        if 'content-encoding' in response.headers and method.upper() != 'HEAD':
+            headers['content-length'] = str(len(body))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exchanges VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(method, url, params), response.url or url, response.status_code,
+                 json.dumps(headers), zlib.compress(body, 6), elapsed),
+            )
+            self._conn.commit()
+            self.stats['recorded'] += 1
+    
+    def replay(self, method: str, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """Rebuild the recorded response for a request, after the configured latency.
+        
+        Raises FixtureMissing if the request was never recorded.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, elapsed FROM exchanges WHERE key = ?",
+                (self.make_key(method, url, params),),
+            ).fetchone()
+            self.stats['replayed' if row else 'missing'] += 1
+        if row is None:
+            raise FixtureMissing(f"no recorded response for {method.upper()} {HTTPCache.make_key(url, params)}")
+        final_url, status, headers, body, elapsed = row
+        delay = (elapsed if self.recorded_latency else 0.0) + (self.latency or 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        response.url = final_url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = get_encoding_from_headers(response.headers) or 'utf-8'
+        response._content = zlib.decompress(body)
+        response._content_consumed = True
+        return response
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
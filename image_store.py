@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+In-memory index of the downloaded images directory.
+
+The directory is listed once with os.scandir; lookups by filename stem are
+then answered from memory and the index is updated in place as images are
+written, so checking whether an artwork already has an image costs no
+filesystem calls.
+
+The store is also content-addressed: every file's SHA-256 (and the source
+URL it was downloaded from) is kept in a small JSON index next to the
+images. Files with identical content are hardlinked to one copy, and a
+source URL that was already downloaded is linked instead of fetched again.
+
+Usage (report, and link existing duplicates):
+    python image_store.py [images_dir] [--dedupe]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# Image extensions in order of preference (SVG is deliberately excluded)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+# Content index kept inside the images directory
+INDEX_FILENAME = '.content_index.json'
+INDEX_VERSION = 1
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StoredImage:
+    """An image file in the store."""
+    
+    def __init__(self, name: str, size: int, mtime: float, inode: Optional[Tuple[int, int]] = None):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        # (device, inode): hardlinked copies share it
+        self.inode = inode
+    
+    @property
+    def stem(self) -> str:
+        return os.path.splitext(self.name)[0]
+    
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.name)[1].lower()
+    
+    @property
+    def size_mb(self) -> float:
+        return self.size / (1024 * 1024)
+
+
+class ImageStore:
+    """Index of image files in a directory: filename stem -> files with that stem."""
+    
+    def __init__(self, images_dir: str = "images", index_file: Optional[str] = None):
+        """Build the index with a single scan of images_dir (missing directories are empty).
+        
+        Args:
+            images_dir: Directory holding the images.
+            index_file: Content index (default: images_dir/.content_index.json).
+        """
+        self.images_dir = images_dir
+        self.index_file = index_file or os.path.join(images_dir, INDEX_FILENAME)
+        self._by_stem: Dict[str, Dict[str, StoredImage]] = {}
+        self._lock = threading.Lock()
+        # name -> {'sha256', 'size', 'mtime'}, source URL -> sha256, sha256 -> name holding it
+        self._hashes: Dict[str, Dict] = {}
+        self._urls: Dict[str, str] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._hashed = False
+        self.stats = {'linked': 0, 'bytes_reclaimed': 0, 'downloads_skipped': 0}
+        self._load_index()
+        self.refresh()
+    
+    def refresh(self) -> None:
+        """Rebuild the index from one os.scandir of the directory."""
+        by_stem: Dict[str, Dict[str, StoredImage]] = {}
+        if os.path.isdir(self.images_dir):
+            with os.scandir(self.images_dir) as entries:
+                for entry in entries:
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext.lower() not in IMAGE_EXTENSIONS or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    by_stem.setdefault(stem, {})[entry.name] = StoredImage(
+                        entry.name, stat.st_size, stat.st_mtime, (stat.st_dev, stat.st_ino))
+        with self._lock:
+            self._by_stem = by_stem
+            self._hashed = False
+    
+    def path(self, name: str) -> str:
+        """Full path of a file in the store."""
+        return os.path.join(self.images_dir, name)
+    
+    def find(self, stem: str) -> Optional[str]:
+        """Return the filename stored under a stem, preferring extensions in IMAGE_EXTENSIONS order."""
+        with self._lock:
+            files = self._by_stem.get(stem)
+            if not files:
+                return None
+            return min(files.values(), key=lambda f: IMAGE_EXTENSIONS.index(f.extension)).name
+    
+    def get(self, name: str) -> Optional[StoredImage]:
+        """Return the index entry for a filename, if present."""
+        with self._lock:
+            return self._by_stem.get(os.path.splitext(name)[0], {}).get(name)
+    
+    def add(self, name: str) -> StoredImage:
+        """Record a file just written to the directory (stats that one file)."""
+        stat = os.stat(self.path(name))
+        image = StoredImage(name, stat.st_size, stat.st_mtime, (stat.st_dev, stat.st_ino))
+        with self._lock:
+            self._by_stem.setdefault(image.stem, {})[name] = image
+        return image
+    
+    def remove(self, name: str) -> None:
+        """Forget a file that was deleted from the directory."""
+        with self._lock:
+            files = self._by_stem.get(os.path.splitext(name)[0])
+            if files is not None:
+                files.pop(name, None)
+                if not files:
+                    del self._by_stem[os.path.splitext(name)[0]]
+            entry = self._hashes.pop(name, None)
+            if entry is not None and self._by_hash.get(entry['sha256']) == name:
+                del self._by_hash[entry['sha256']]
+    
+    def files(self) -> List[StoredImage]:
+        """All indexed images, sorted by filename."""
+        with self._lock:
+            return sorted((f for files in self._by_stem.values() for f in files.values()), key=lambda f: f.name)
+    
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(files) for files in self._by_stem.values())
+    
+    def _load_index(self) -> None:
+        """Load the content index (an unreadable or outdated index starts empty)."""
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable image index {self.index_file}: {e}")
+            return
+        if data.get('version') == INDEX_VERSION:
+            self._hashes = data.get('files', {})
+            self._urls = data.get('urls', {})
+    
+    def save_index(self) -> None:
+        """Write the content index atomically."""
+        if not os.path.isdir(self.images_dir):
+            return
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'files': dict(self._hashes), 'urls': dict(self._urls)}
+        temp_path = self.index_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_file)
+    
+    def _hash_file(self, image: StoredImage) -> str:
+        """SHA-256 of an indexed file, reusing the index entry while size and mtime are unchanged."""
+        with self._lock:
+            entry = self._hashes.get(image.name)
+        if entry is not None and entry['size'] == image.size and entry['mtime'] == image.mtime:
+            return entry['sha256']
+        digest = file_sha256(self.path(image.name))
+        with self._lock:
+            self._hashes[image.name] = {'sha256': digest, 'size': image.size, 'mtime': image.mtime}
+        return digest
+    
+    def _ensure_hashed(self) -> None:
+        """Hash every file not hashed yet (only files new or changed since the index was saved are read)."""
+        if self._hashed:
+            return
+        files = self.files()
+        by_hash: Dict[str, str] = {}
+        for image in files:
+            by_hash.setdefault(self._hash_file(image), image.name)
+        with self._lock:
+            current = {image.name for image in files}
+            self._hashes = {name: entry for name, entry in self._hashes.items() if name in current}
+            self._by_hash = by_hash
+            self._hashed = True
+    
+    def content_hash(self, name: str) -> Optional[str]:
+        """SHA-256 of a stored file, or None if it isn't in the store."""
+        image = self.get(name)
+        return self._hash_file(image) if image is not None else None
+    
+    def find_by_url(self, url: str) -> Optional[str]:
+        """Name of a stored file downloaded from `url` earlier, if its content is still present."""
+        with self._lock:
+            digest = self._urls.get(url)
+        if digest is None:
+            return None
+        self._ensure_hashed()
+        with self._lock:
+            return self._by_hash.get(digest)
+    
+    def alias(self, name: str, target: str) -> bool:
+        """Make `name` a hardlink to the stored file `target` (a copy where hardlinks aren't supported).
+        
+        An existing file under `name` is replaced atomically. Returns True if hardlinked.
+        """
+        temp_path = self.path(name) + '.link'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(self.path(target), temp_path)
+            linked = True
+        except OSError:
+            shutil.copy2(self.path(target), temp_path)
+            linked = False
+        os.replace(temp_path, self.path(name))
+        image = self.add(name)
+        with self._lock:
+            target_entry = self._hashes.get(target)
+            if target_entry is not None:
+                self._hashes[name] = {'sha256': target_entry['sha256'], 'size': image.size, 'mtime': image.mtime}
+        return linked
+    
+    def link_download(self, url: str, name: str) -> Optional[str]:
+        """Store `name` as a link to an earlier download of `url`, skipping the download.
+        
+        Returns the name of the file it was linked to, or None if the URL is unknown.
+        """
+        target = self.find_by_url(url)
+        if target is None or target == name:
+            return None
+        self.alias(name, target)
+        with self._lock:
+            self.stats['downloads_skipped'] += 1
+        return target
+    
+    def ingest(self, name: str, source_url: Optional[str] = None) -> Optional[str]:
+        """Record a file just written to the directory, deduplicating it by content.
+        
+        If another stored file has the same content, `name` is replaced by a
+        hardlink to it and that file's name is returned (None otherwise).
+        """
+        self._ensure_hashed()
+        image = self.add(name)
+        digest = self._hash_file(image)
+        with self._lock:
+            if source_url:
+                self._urls[source_url] = digest
+            original = self._by_hash.setdefault(digest, name)
+        if original == name or self.get(original) is None:
+            with self._lock:
+                self._by_hash[digest] = name
+            return None
+        if self.get(original).inode != image.inode:
+            self.alias(name, original)
+            with self._lock:
+                self.stats['linked'] += 1
+                self.stats['bytes_reclaimed'] += image.size
+        return original
+    
+    def duplicates(self) -> Dict[str, List[StoredImage]]:
+        """sha256 -> files with that content, for every content stored under more than one name."""
+        self._ensure_hashed()
+        groups: Dict[str, List[StoredImage]] = {}
+        for image in self.files():
+            groups.setdefault(self._hash_file(image), []).append(image)
+        return {digest: images for digest, images in groups.items() if len(images) > 1}
+    
+    def dedupe(self) -> Tuple[int, int]:
+        """Hardlink every duplicate to one copy of its content. Returns (files linked, bytes reclaimed)."""
+        linked = reclaimed = 0
+        for images in self.duplicates().values():
+            original = images[0]
+            for image in images[1:]:
+                if image.inode == original.inode:
+                    continue
+                if self.alias(image.name, original.name):
+                    linked += 1
+                    reclaimed += image.size
+        with self._lock:
+            self.stats['linked'] += linked
+            self.stats['bytes_reclaimed'] += reclaimed
+        return linked, reclaimed
+    
+    def disk_usage(self) -> Tuple[int, int]:
+        """(bytes across all filenames, bytes actually on disk counting hardlinked files once)."""
+        files = self.files()
+        physical = {image.inode or image.name: image.size for image in files}
+        return sum(image.size for image in files), sum(physical.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report (and hardlink) duplicate images in the image store.")
+    parser.add_argument('images_dir', nargs='?', default="images", help="images directory (default: images)")
+    parser.add_argument('--dedupe', action='store_true', help="replace duplicates with hardlinks to one copy")
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.images_dir):
+        print(f"Images directory '{args.images_dir}' not found!")
+        return
+    
+    store = ImageStore(args.images_dir)
+    duplicates = store.duplicates()
+    logical, physical = store.disk_usage()
+    print(f"{len(store)} images, {len(store.files()) - sum(len(images) - 1 for images in duplicates.values())} "
+          f"distinct, {logical / (1024 * 1024):.1f} MB by name, {physical / (1024 * 1024):.1f} MB on disk")
+    
+    for images in sorted(duplicates.values(), key=lambda images: images[0].name):
+        linked = all(image.inode == images[0].inode for image in images)
+        print(f"  {images[0].size / (1024 * 1024):5.2f} MB x{len(images)}{' (linked)' if linked else ''}: "
+              + ', '.join(image.name for image in images))
+    
+    if args.dedupe:
+        linked, reclaimed = store.dedupe()
+        print(f"✓ Linked {linked} duplicates, reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+    else:
+        pending = sum(image.size for images in duplicates.values() for image in images[1:]
+                      if image.inode != images[0].inode)
+        if pending:
+            print(f"Run with --dedupe to reclaim {pending / (1024 * 1024):.1f} MB")
+    store.save_index()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL journal of enriched records.
+
+Every enriched record is appended as one line as soon as it is finished,
+with fsyncs batched by count and time, so an interrupted run loses at most
+the last batch. A rerun skips the records already in the journal, and a
+final compaction streams the journal into the nested-by-period output JSON
+without holding the dataset's records in memory.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from manifest import record_hash
+
+
+class EnrichmentJournal:
+    """JSONL journal: one {"period", "index", "hash", "record"} object per line.
+    
+    Lines for results that came from a transient failure also carry "retry": true.
+    """
+    
+    def __init__(self, path: str, fsync_every: int = 20, fsync_interval: float = 2.0):
+        """Open the journal for appending, creating it if needed.
+        
+        Args:
+            path: Journal file.
+            fsync_every: Records appended between fsyncs.
+            fsync_interval: Longest time (seconds) an appended record may wait for an fsync.
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._repair_tail()
+        self._file = open(path, 'a', encoding='utf-8')
+    
+    def _repair_tail(self) -> None:
+        """Cut off a partially written last line left by a crash."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Scan back to the last complete line
+            position = size
+            while position > 0:
+                step = min(65536, position)
+                f.seek(position - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(position - step + newline + 1)
+                    return
+                position -= step
+            f.truncate(0)
+    
+    def append(self, period: str, index: int, source: Dict, enriched: Dict, retry: bool = False) -> None:
+        """Record the enriched result for dataset[period][index] (whose input record is `source`).
+        
+        retry flags a result that came from a transient failure (see retries()).
+        """
+        entry = {'period': period, 'index': index, 'hash': record_hash(source), 'record': enriched}
+        if retry:
+            entry['retry'] = True
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+    
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+    
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+    
+    def _index(self, dataset: Dict[str, List[Dict]]) -> Dict[Tuple[str, int], int]:
+        """Map (period, index) -> file offset of the latest line that matches the current input record.
+        
+        Lines for records that have since been edited, moved or removed are ignored.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+        hashes: Dict[Tuple[str, int], Optional[str]] = {}
+        offsets = {}
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = (entry['period'], entry['index'])
+                except (ValueError, KeyError):
+                    offset += len(line)
+                    continue
+                if key not in hashes:
+                    pieces = dataset.get(key[0])
+                    hashes[key] = record_hash(pieces[key[1]]) if pieces and 0 <= key[1] < len(pieces) else None
+                if hashes[key] is not None and entry.get('hash') == hashes[key]:
+                    offsets[key] = offset
+                offset += len(line)
+        return offsets
+    
+    def completed(self, dataset: Dict[str, List[Dict]]) -> Set[Tuple[str, int]]:
+        """(period, index) of every dataset record already finished in the journal."""
+        return set(self._index(dataset))
+    
+    def iter_records(self, dataset: Dict[str, List[Dict]]) -> Iterator[Tuple[str, int, Optional[Dict]]]:
+        """Yield (period, index, enriched record or None if missing) in dataset order."""
+        offsets = self._index(dataset)
+        with open(self.path, 'rb') as f:
+            for period, pieces in dataset.items():
+                for index in range(len(pieces)):
+                    offset = offsets.get((period, index))
+                    if offset is None:
+                        yield period, index, None
+                        continue
+                    f.seek(offset)
+                    yield period, index, json.loads(f.readline())['record']
+    
+    def retries(self, dataset: Dict[str, List[Dict]]) -> Set[Tuple[str, int]]:
+        """(period, index) of every finished record whose latest result was flagged for retry."""
+        offsets = self._index(dataset)
+        flagged = set()
+        with open(self.path, 'rb') as f:
+            for key, offset in offsets.items():
+                f.seek(offset)
+                if json.loads(f.readline()).get('retry'):
+                    flagged.add(key)
+        return flagged
+    
+    def compact(self, dataset: Dict[str, List[Dict]], output_file: str) -> int:
+        """Write the nested-by-period JSON for the dataset from the journal, one record at a time.
+        
+        The output matches json.dump(..., indent=2, ensure_ascii=False) and is
+        replaced atomically. Raises ValueError (leaving output_file untouched)
+        if a record is missing from the journal. Returns the number of records written.
+        """
+        temp_path = output_file + '.tmp'
+        written = 0
+        records = self.iter_records(dataset)
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as out:
+                out.write('{')
+                for position, (period, pieces) in enumerate(dataset.items()):
+                    out.write(f"{',' if position else ''}\n  {json.dumps(period, ensure_ascii=False)}: [")
+                    for index in range(len(pieces)):
+                        _, _, enriched = next(records)
+                        if enriched is None:
+                            raise ValueError(f"journal has no result for {period!r} #{index}")
+                        body = json.dumps(enriched, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+                        out.write(f"{',' if index else ''}\n    {body}")
+                        written += 1
+                    out.write('\n  ]' if pieces else ']')
+                out.write('\n}' if dataset else '}')
+            os.replace(temp_path, output_file)
+        finally:
+            records.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return written
+    
+    def remove(self) -> None:
+        """Close and delete the journal (after a successful compaction)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of LLM chat completions backed by SQLite.
+
+Answers are keyed by a SHA-256 hash of everything that determines them
+(model, temperature, system message and prompt), and stored
+zlib-compressed together with the usage the API reported. Re-running the
+AI enrichment with unchanged prompts, e.g. while iterating on
+post-processing, is then answered from disk without API calls.
+
+Usage:
+    python llm_cache.py [cache file] [--list N] [--model MODEL] [--prune-older-than DAYS]
+                        [--prune-unused DAYS] [--prune-model MODEL] [--max-size-mb MB]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+DAY = 24 * 60 * 60
+
+
+class LLMCache:
+    """SQLite-backed cache of chat completion answers."""
+    
+    def __init__(self, path: str = ".llm_cache.sqlite"):
+        """Open (creating if needed) the cache database."""
+        self.path = path
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                label TEXT NOT NULL,
+                content BLOB NOT NULL,
+                usage TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(request: Dict) -> str:
+        """Hash of the model, temperature and messages of a chat completion request."""
+        material = json.dumps([request['model'], request.get('temperature'),
+                               [[message['role'], message['content']] for message in request['messages']]],
+                              ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+    
+    def lookup(self, request: Dict) -> Optional[Tuple[str, Optional[Dict]]]:
+        """Return (answer text, usage it cost when fetched) for a request, or None."""
+        key = self.make_key(request)
+        with self._lock:
+            row = self._conn.execute("SELECT content, usage FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                               (time.time(), key))
+            self._conn.commit()
+            self.stats['hits'] += 1
+        content, usage = row
+        return zlib.decompress(content).decode('utf-8'), json.loads(usage) if usage else None
+    
+    def store(self, request: Dict, content: str, usage=None, label: str = '') -> None:
+        """Store an answer (and its usage, an SDK object or dict) under the request's key."""
+        if usage is not None and not isinstance(usage, dict):
+            usage = usage.model_dump()
+        body = zlib.compress(content.encode('utf-8'), 6)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (self.make_key(request), request['model'], label, body,
+                 json.dumps(usage) if usage is not None else None, len(body), now, now),
+            )
+            self._conn.commit()
+            self.stats['stores'] += 1
+    
+    def entries(self, limit: Optional[int] = None, model: Optional[str] = None) -> List[Dict]:
+        """Cached answers, most recently used first (without their content)."""
+        query = "SELECT key, model, label, size, created_at, last_access, hits, usage FROM completions"
+        args: list = []
+        if model:
+            query += " WHERE model = ?"
+            args.append(model)
+        query += " ORDER BY last_access DESC"
+        if limit:
+            query += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        columns = ('key', 'model', 'label', 'size', 'created_at', 'last_access', 'hits', 'usage')
+        entries = [dict(zip(columns, row)) for row in rows]
+        for entry in entries:
+            entry['usage'] = json.loads(entry['usage']) if entry['usage'] else None
+        return entries
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Per model: answers cached, compressed bytes, times served and the tokens those hits saved."""
+        models: Dict[str, Dict] = {}
+        for entry in self.entries():
+            stats = models.setdefault(entry['model'], {'entries': 0, 'bytes': 0, 'hits': 0, 'tokens_saved': 0})
+            stats['entries'] += 1
+            stats['bytes'] += entry['size']
+            stats['hits'] += entry['hits']
+            stats['tokens_saved'] += entry['hits'] * ((entry['usage'] or {}).get('total_tokens') or 0)
+        return models
+    
+    def prune(self, older_than_days: Optional[float] = None, unused_days: Optional[float] = None,
+              model: Optional[str] = None, max_size_mb: Optional[float] = None) -> int:
+        """Delete answers matching all given conditions (created / last used more than N days ago, model).
+        
+        With max_size_mb, least recently used answers are also dropped until
+        the cache fits. Returns the number of answers deleted.
+        """
+        now = time.time()
+        conditions, args = [], []
+        if older_than_days is not None:
+            conditions.append("created_at < ?")
+            args.append(now - older_than_days * DAY)
+        if unused_days is not None:
+            conditions.append("last_access < ?")
+            args.append(now - unused_days * DAY)
+        if model:
+            conditions.append("model = ?")
+            args.append(model)
+        with self._lock:
+            deleted = 0
+            if conditions:
+                deleted += self._conn.execute("DELETE FROM completions WHERE " + " AND ".join(conditions),
+                                              args).rowcount
+            if max_size_mb is not None:
+                budget = int(max_size_mb * 1024 * 1024)
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+                for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_access").fetchall():
+                    if total <= budget:
+                        break
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    total -= size
+                    deleted += 1
+            self._conn.commit()
+            if deleted:
+                self._conn.execute("VACUUM")
+        return deleted
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and prune the LLM response cache.")
+    parser.add_argument('cache_file', nargs='?', default=".llm_cache.sqlite",
+                        help="cache database (default: .llm_cache.sqlite)")
+    parser.add_argument('--list', type=int, default=0, metavar='N', help="show the N most recently used answers")
+    parser.add_argument('--model', default=None, help="only list answers of this model")
+    parser.add_argument('--prune-model', default=None, metavar='MODEL', help="delete the answers of MODEL")
+    parser.add_argument('--prune-older-than', type=float, default=None, metavar='DAYS',
+                        help="delete answers cached more than DAYS ago")
+    parser.add_argument('--prune-unused', type=float, default=None, metavar='DAYS',
+                        help="delete answers not used for DAYS")
+    parser.add_argument('--max-size-mb', type=float, default=None, metavar='MB',
+                        help="delete least recently used answers until the cache is under MB")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.cache_file):
+        print(f"Cache file '{args.cache_file}' not found!")
+        return
+    
+    cache = LLMCache(args.cache_file)
+    if (args.prune_older_than is not None or args.prune_unused is not None or args.prune_model
+            or args.max_size_mb is not None):
+        deleted = cache.prune(older_than_days=args.prune_older_than, unused_days=args.prune_unused,
+                              model=args.prune_model, max_size_mb=args.max_size_mb)
+        print(f"✓ Deleted {deleted} cached answers")
+    
+    summary = cache.summary()
+    print(f"{len(cache)} cached answers in {args.cache_file} ({os.path.getsize(args.cache_file) / (1024 * 1024):.1f} MB)")
+    for model, stats in sorted(summary.items()):
+        print(f"  {model}: {stats['entries']} answers, {stats['bytes'] / 1024:.0f} KB, served {stats['hits']} times "
+              f"(~{stats['tokens_saved']} tokens saved)")
+    
+    if args.list:
+        now = time.time()
+        for entry in cache.entries(limit=args.list, model=args.model):
+            print(f"  {entry['key'][:12]}  {entry['model']:<14} {entry['hits']:>4} hits  "
+                  f"{(now - entry['last_access']) / DAY:5.1f}d ago  {entry['label'][:60]}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Manifest for incremental dataset enrichment.
+
+Maps a content hash of every input record to the enriched record produced
+for it, so a rerun only has to enrich records that are new or were edited
+since the last run. Final outcomes are kept, including an existing image, no
+article or no image on Wikipedia; records that hit a transient failure (a
+failed request or download) are enriched again on the next run.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+# Bump when enrichment output changes in a way that should invalidate old results
+MANIFEST_VERSION = 1
+
+
+def record_hash(record: Dict) -> str:
+    """Stable hash of an input record (key order and whitespace don't matter)."""
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class EnrichmentManifest:
+    """Input-record hash -> enriched record, persisted as JSON."""
+    
+    def __init__(self, path: str):
+        """Load the manifest at path (an unreadable or outdated manifest starts empty)."""
+        self.path = path
+        self.records: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.records = data.get('records', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable manifest {path}: {e}")
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def lookup(self, record: Dict) -> Optional[Dict]:
+        """Return the enriched result for an unchanged input record, if known."""
+        return self.records.get(record_hash(record))
+    
+    def update(self, record: Dict, enriched: Dict, retry: bool = False) -> bool:
+        """Remember a result, unless it came from a transient failure (retry). Returns whether it was kept."""
+        key = record_hash(record)
+        if retry:
+            self.records.pop(key, None)
+            return False
+        self.records[key] = enriched
+        return True
+    
+    def seed_from_output(self, dataset: Dict[str, List[Dict]], output_file: str) -> int:
+        """Adopt results from a previous output file that has no manifest yet.
+        
+        A previous enriched record is reused for an input record when every
+        input field still has the same value and it has an image (without
+        one, the old output can't tell a failed download from a final
+        outcome). Returns the number adopted.
+        """
+        if not os.path.exists(output_file):
+            return 0
+        with open(output_file, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        by_key = {}
+        for pieces in previous.values():
+            for enriched in pieces:
+                by_key.setdefault((enriched.get('title'), enriched.get('artist')), enriched)
+        adopted = 0
+        for pieces in dataset.values():
+            for record in pieces:
+                enriched = by_key.get((record.get('title'), record.get('artist')))
+                if (enriched is not None and enriched.get('image_filename')
+                        and all(enriched.get(k) == v for k, v in record.items())):
+                    adopted += self.update(record, enriched)
+        return adopted
+    
+    def reusable(self, dataset: Dict[str, List[Dict]]) -> Dict[Tuple[str, int], Dict]:
+        """Return {(period, index): enriched record} for every unchanged input record."""
+        reused = {}
+        for period, pieces in dataset.items():
+            for index, record in enumerate(pieces):
+                enriched = self.lookup(record)
+                if enriched is not None:
+                    reused[(period, index)] = enriched
+        return reused
+    
+    def prune(self, dataset: Dict[str, List[Dict]]) -> None:
+        """Drop entries for records no longer in the dataset."""
+        current = {record_hash(record) for pieces in dataset.values() for record in pieces}
+        self.records = {h: enriched for h, enriched in self.records.items() if h in current}
+    
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'records': self.records}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
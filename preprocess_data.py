@@ -20,6 +20,8 @@ except ImportError:
     GeocoderTimedOut = Exception
     GeocoderServiceError = Exception
 
+from http_client import HTTPClient, geopy_adapter_factory
+
 def parse_year(year_str: str) -> Tuple[float, str]:
     """
     Parse year string into numeric value and display string.
@@ -304,7 +306,9 @@ def preprocess_data(input_file: str, output_file: str, geocode: bool = True, geo
         
         if needs_geocoding:
             print("Initializing geocoder...")
-            geolocator = Nominatim(user_agent="artwork_visualization")
+            # Geocoding goes through the shared pooled transport (keep-alive, metrics)
+            http = HTTPClient(user_agent="artwork_visualization")
+            geolocator = Nominatim(user_agent="artwork_visualization", adapter_factory=geopy_adapter_factory(http))
             print("Geocoding locations (this may take a while due to rate limiting)...")
     
     # Geocode artworks that need it
@@ -336,6 +340,8 @@ def preprocess_data(input_file: str, output_file: str, geocode: bool = True, geo
         save_geocoded_data(geocoded_output, geocoded_file)
         total_with_coords = sum(1 for period in geocoded_output.values() for item in period if item.get('coordinates'))
         print(f"Geocoding complete. Saved {total_with_coords} artworks with coordinates to {geocoded_file}.")
+        print(f"HTTP transport:\n{http.metrics.report()}")
+        http.close()
     
     # Parse years and collect unique types and regions
     parsed_years = []
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiting helpers.
+
+Used to keep request rates polite towards Wikipedia/Wikimedia while many
+lookups are in flight at once, and to stay within the OpenAI requests- and
+tokens-per-minute limits when enriching with AI.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+    
+    Tokens refill continuously at `rate` per second up to `capacity`. Each
+    call to acquire() blocks until enough tokens are available. The rate can
+    be changed on the fly and the bucket paused (e.g. for a Retry-After).
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        """Initialize the bucket full, refilling at `rate` tokens per second."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(max(capacity, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        # _last may lie in the future while the bucket is paused
+        if now > self._last:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+    
+    def reserve(self, tokens: float) -> float:
+        """Take `tokens` from the bucket and return how long to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = max(0.0, self._last - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+    
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate, keeping the tokens earned so far."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+    
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next `seconds`, and don't accumulate any meanwhile."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._last = max(self._last, now + seconds)
+    
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available. Returns the time spent waiting."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Like acquire(), but sleeps without blocking the event loop."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """Keeps one token bucket per host.
+    
+    The rate adapts to server pressure: every throttling response halves the
+    host's rate (down to `min_rate`) and each success wins back a twentieth
+    of its configured rate.
+    """
+    
+    def __init__(self, rate: float = 5.0, burst: float = 10.0,
+                 per_host: Optional[Dict[str, Tuple[float, float]]] = None, min_rate: float = 0.2):
+        """Initialize the limiter.
+        
+        Args:
+            rate: Default requests per second allowed for each host.
+            burst: Default bucket capacity for each host.
+            per_host: Optional {host: (rate, burst)} overrides.
+            min_rate: Lowest rate backoff() will slow a host down to.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host or {}
+        self.min_rate = min_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, host: str) -> TokenBucket:
+        """Return (creating if needed) the bucket for a host."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.per_host.get(host, (self.rate, self.burst))
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+            return bucket
+    
+    def acquire(self, host: str) -> float:
+        """Block until a request to `host` is allowed. Returns the time spent waiting."""
+        return self.bucket(host).acquire()
+    
+    def configured_rate(self, host: str) -> float:
+        """The rate a host starts at (and recovers to)."""
+        return self.per_host.get(host, (self.rate, self.burst))[0]
+    
+    def backoff(self, host: str, retry_after: Optional[float] = None) -> float:
+        """Halve a host's rate after a throttling response, pausing it for `retry_after` seconds.
+        
+        Returns the new rate.
+        """
+        bucket = self.bucket(host)
+        rate = max(min(self.min_rate, self.configured_rate(host)), bucket.rate / 2)
+        bucket.set_rate(rate)
+        if retry_after:
+            bucket.pause(retry_after)
+        return rate
+    
+    def recover(self, host: str) -> None:
+        """Raise a slowed-down host's rate a step back towards its configured rate."""
+        bucket = self.bucket(host)
+        target = self.configured_rate(host)
+        if bucket.rate < target:
+            bucket.set_rate(min(target, bucket.rate + target / 20))
+
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for a model API.
+    
+    A request is let through once both buckets can cover it: one request
+    and its estimated token count. Each bucket holds `burst_seconds` worth of
+    its limit, so a fresh run can't spend a whole minute's budget at once.
+    """
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, burst_seconds: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute * burst_seconds / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute * burst_seconds / 60.0)
+        self.stats = {'requests': 0, 'tokens': 0, 'wait_seconds': 0.0}
+    
+    async def acquire(self, tokens: int) -> float:
+        """Wait until a request of `tokens` tokens is allowed. Returns the time spent waiting."""
+        # Reserve from both buckets at once so the waits overlap instead of adding up
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.stats['requests'] += 1
+        self.stats['tokens'] += tokens
+        self.stats['wait_seconds'] += wait
+        return wait
+    
+    def pause(self, seconds: float) -> None:
+        """Let no requests through for `seconds` (e.g. after a rate-limit error)."""
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
@@ -8,18 +8,21 @@ import os
 from PIL import Image
 from pathlib import Path
 
+from image_store import ImageStore
+
 def get_file_size_mb(filepath):
     """Get file size in MB."""
     return os.path.getsize(filepath) / (1024 * 1024)
 
-def resize_image_to_max_size(image_path, max_size_mb=1.0, max_dimension=2000):
+def resize_image_to_max_size(image_path, max_size_mb=1.0, max_dimension=2000, current_size_mb=None):
     """Resize image to be at most max_size_mb MB, maintaining aspect ratio."""
     try:
         # Convert Path to string if needed
         image_path_str = str(image_path)
         
-        # Get current file size
-        current_size_mb = get_file_size_mb(image_path_str)
+        # Get current file size (unless the caller already knows it)
+        if current_size_mb is None:
+            current_size_mb = get_file_size_mb(image_path_str)
         
         if current_size_mb <= max_size_mb:
             print(f"  ✓ {os.path.basename(image_path_str)}: {current_size_mb:.2f} MB (OK)")
@@ -113,12 +116,9 @@ def main():
         print(f"Images directory '{images_dir}' not found!")
         return
     
-    # Find all image files
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-    image_files = []
-    for ext in image_extensions:
-        image_files.extend(images_dir.glob(f"*{ext}"))
-        image_files.extend(images_dir.glob(f"*{ext.upper()}"))
+    # Find all image files (one directory scan, sizes included)
+    store = ImageStore(str(images_dir))
+    image_files = store.files()
     
     if not image_files:
         print("No images found!")
@@ -131,14 +131,14 @@ def main():
     total_original_size = 0
     total_new_size = 0
     
-    for image_path in sorted(image_files):
-        original_size = get_file_size_mb(image_path)
-        total_original_size += original_size
+    for image in image_files:
+        total_original_size += image.size_mb
         
-        if resize_image_to_max_size(image_path):
+        if resize_image_to_max_size(store.path(image.name), current_size_mb=image.size_mb):
             resized_count += 1
+            image = store.add(image.name)
         
-        total_new_size += get_file_size_mb(image_path)
+        total_new_size += image.size_mb
     
     print(f"\nSummary:")
     print(f"  Total images: {len(image_files)}")
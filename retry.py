@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Retry policy for HTTP requests to Wikipedia/Wikimedia.
+
+Decides which responses are worth retrying (throttling, transient server
+errors and MediaWiki maxlag refusals) and how long to wait before the next
+attempt: the server's Retry-After when given, otherwise exponential backoff
+with full jitter.
+"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+import requests
+
+
+# Statuses that mean "try again later" rather than "this will never work"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Statuses that mean the server wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_maxlag(response: requests.Response) -> bool:
+    """True if the MediaWiki API refused the request because replication lag exceeded maxlag."""
+    return response.headers.get('MediaWiki-API-Error') == 'maxlag'
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring Retry-After."""
+    
+    def __init__(self, max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 retry_statuses: Tuple[int, ...] = RETRY_STATUSES):
+        """Initialize the policy.
+        
+        Args:
+            max_retries: Retries after the first attempt (0 disables retrying).
+            backoff_base: Upper bound of the first backoff delay in seconds; doubles per retry.
+            backoff_max: Cap for any single delay, including Retry-After.
+            retry_statuses: HTTP statuses that are retried.
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+    
+    def should_retry(self, response: requests.Response) -> bool:
+        """Whether a response is a transient failure worth another attempt."""
+        return response.status_code in self.retry_statuses or is_maxlag(response)
+    
+    def is_throttled(self, response: Optional[requests.Response]) -> bool:
+        """Whether a response asks us to reduce the request rate."""
+        return response is not None and (response.status_code in THROTTLE_STATUSES or is_maxlag(response))
+    
+    def retry_after(self, response: Optional[requests.Response]) -> Optional[float]:
+        """The server-requested delay for a response, capped at backoff_max."""
+        if response is None:
+            return None
+        delay = parse_retry_after(response.headers.get('Retry-After'))
+        return None if delay is None else min(delay, self.backoff_max)
+    
+    def backoff(self, attempt: int) -> float:
+        """Jittered delay before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Per-artwork stage tracing for dataset enrichment.
+
+Every artwork gets an ArtworkTrace that times the enrichment stages
+(search, summary, infobox, image_url, download, resize), counts requests,
+cache and memo hits and bytes downloaded, and notes which image method won.
+StageTracer appends the finished traces to a JSONL file and prints p50/p95
+per stage at the end of a run.
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+# Stages in pipeline order (for the summary table)
+STAGES = ('search', 'summary', 'infobox', 'image_url', 'download', 'resize')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ArtworkTrace:
+    """Stage durations and counters for one artwork.
+    
+    Stages may nest (e.g. a summary fetch while looking for the image URL);
+    time is attributed to the innermost stage only, so stage durations add up
+    to at most the artwork's total.
+    """
+    
+    def __init__(self, title: str, artist: str):
+        self.record = {
+            'title': title,
+            'artist': artist,
+            'stages': {},
+            'requests': 0,
+            'cache_hits': 0,
+            'memo_hits': 0,
+            'bytes': 0,
+            'image_bytes': 0,
+            'rate_wait_seconds': 0.0,
+            'image_method': None,
+            'outcome': None,
+        }
+        self._start = time.perf_counter()
+        self._stack: List[List] = []  # [stage name, time the stage last resumed]
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block as stage `name` (durations of repeated stages add up)."""
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.add_stage(parent[0], now - parent[1])
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, resumed = self._stack.pop()
+            self.add_stage(name, now - resumed)
+            if self._stack:
+                self._stack[-1][1] = now
+    
+    def add_stage(self, name: str, seconds: float) -> None:
+        stages = self.record['stages']
+        stages[name] = stages.get(name, 0.0) + seconds
+    
+    def add(self, key: str, amount: float = 1) -> None:
+        self.record[key] += amount
+    
+    def note(self, key: str, value) -> None:
+        self.record[key] = value
+    
+    def finish(self) -> Dict:
+        """Close the trace and return its record."""
+        if 'total_seconds' not in self.record:
+            self.record['total_seconds'] = time.perf_counter() - self._start
+        return self.record
+
+
+class StageTracer:
+    """Writes artwork traces to a JSONL file and summarizes them."""
+    
+    def __init__(self, path: Optional[str] = None):
+        """Open the trace file (None keeps only the in-memory summary)."""
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = {}
+        self._methods: Dict[str, int] = {}
+        self._totals = {'artworks': 0, 'requests': 0, 'cache_hits': 0, 'memo_hits': 0, 'bytes': 0}
+    
+    def write(self, trace: ArtworkTrace) -> None:
+        """Record a finished artwork."""
+        record = trace.finish()
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+                self._file.flush()
+            for name, seconds in record['stages'].items():
+                self._durations.setdefault(name, []).append(seconds)
+            self._durations.setdefault('total', []).append(record['total_seconds'])
+            method = record['image_method'] or 'none'
+            self._methods[method] = self._methods.get(method, 0) + 1
+            self._totals['artworks'] += 1
+            for key in ('requests', 'cache_hits', 'memo_hits'):
+                self._totals[key] += record[key]
+            self._totals['bytes'] += record['bytes'] + record['image_bytes']
+    
+    def summary(self) -> str:
+        """Per-stage p50/p95 table, image method counts and totals."""
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+            methods = dict(self._methods)
+            totals = dict(self._totals)
+        lines = [f"{'stage':<10} {'artworks':>8} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'total s':>8}"]
+        names = [name for name in STAGES if name in durations]
+        names += sorted(name for name in durations if name not in STAGES and name != 'total')
+        for name in names + ['total']:
+            values = durations.get(name, [])
+            lines.append(f"{name:<10} {len(values):>8} {percentile(values, 0.5):>7.2f} {percentile(values, 0.95):>7.2f} "
+                         f"{max(values, default=0.0):>7.2f} {sum(values):>8.1f}")
+        artworks = totals['artworks'] or 1
+        lines.append("Image method: " + ', '.join(f"{method} {count}" for method, count in
+                                                   sorted(methods.items(), key=lambda item: -item[1])))
+        lines.append(f"Per artwork: {totals['requests'] / artworks:.1f} requests, "
+                     f"{totals['cache_hits'] / artworks:.1f} cache hits, {totals['memo_hits'] / artworks:.1f} memo hits, "
+                     f"{totals['bytes'] / artworks / 1024:.0f} KB downloaded")
+        return '\n'.join(lines)
+    
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
@@ -0,0 +1,60 @@
+"""Checks for the incremental lead-image scan of article HTML (run with: python -m pytest tests)."""
+
+import pytest
+
+from enrich_dataset import WikipediaArtEnricher
+from html_images import ArticleImageScanner
+
+
+ICON = "//upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Icon.svg/20px-Icon.svg.png"
+PAINTING = "https://upload.wikimedia.org/wikipedia/commons/1/12/Painting.jpg"
+PAINTING_THUMB = "//upload.wikimedia.org/wikipedia/commons/thumb/1/12/Painting.jpg/250px-Painting.jpg"
+
+
+def scan(html: str, chunk_size: int = 7) -> ArticleImageScanner:
+    scanner = ArticleImageScanner()
+    for start in range(0, len(html), chunk_size):
+        scanner.feed(html[start:start + chunk_size])
+        if scanner.done:
+            break
+    scanner.close()
+    return scanner
+
+
+@pytest.fixture
+def enricher(tmp_path):
+    return WikipediaArtEnricher(images_dir=str(tmp_path))
+
+
+def test_infobox_image_stops_the_scan(enricher):
+    scanner = scan(f'<div class="mw-parser-output"><table class="infobox"><tr><td><img src="{PAINTING_THUMB}">'
+                   f'</td></tr></table><p><a href="https://upload.wikimedia.org/wikipedia/commons/2/23/Other.jpg">'
+                   f'x</a></p></div>')
+    assert scanner.done
+    assert scanner.attribute_urls == []
+    assert enricher._image_url_from_scan(scanner) == PAINTING
+
+
+def test_svg_infobox_icon_falls_back_to_page_links(enricher):
+    # The old regex fallbacks (Methods 4/5) found Painting.jpg here; the scan must not stop at the icon
+    scanner = scan(f'<div class="mw-parser-output"><table class="infobox"><tr><td><img src="{ICON}">'
+                   f'</td></tr></table><p>See <a href="{PAINTING}">the painting</a>.</p>'
+                   f'<h2>History</h2><p>More text</p></div>')
+    assert scanner.infobox_image is None
+    assert not scanner.done
+    assert enricher._image_url_from_scan(scanner) == PAINTING
+
+
+def test_svg_icon_before_infobox_painting_is_skipped(enricher):
+    scanner = scan(f'<div class="mw-parser-output"><table class="infobox"><tr><td><img src="{ICON}">'
+                   f'<img src="{PAINTING_THUMB}"></td></tr></table></div>')
+    assert scanner.done
+    assert enricher._image_url_from_scan(scanner) == PAINTING
+
+
+def test_lead_content_image_without_infobox(enricher):
+    scanner = scan(f'<div class="mw-parser-output"><p><img src="{ICON}"></p><figure><img src="{PAINTING_THUMB}">'
+                   f'</figure><h2>History</h2><img src="//upload.wikimedia.org/wikipedia/commons/thumb/3/34/'
+                   f'Later.jpg/200px-Later.jpg"></div>')
+    assert scanner.done
+    assert enricher._image_url_from_scan(scanner) == PAINTING
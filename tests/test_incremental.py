@@ -0,0 +1,76 @@
+"""Checks for incremental enrichment across edits and reruns (run with: python -m pytest tests)."""
+
+import json
+
+import pytest
+
+import enrich_dataset
+from enrich_dataset import DumpArtEnricher
+from manifest import EnrichmentManifest
+from wiki_dump import write_dump
+
+
+MONA_LISA = """{{Infobox artwork
+| image_file = Mona Lisa.jpg
+| medium = [[Oil painting|Oil]] on [[poplar]] panel
+| museum = [[Louvre]]
+}}
+The '''''Mona Lisa''''' is a half-length portrait painting by [[Leonardo da Vinci]].
+"""
+
+STARRY_NIGHT = """{{Infobox artwork
+| image_file = Starry Night.jpg
+| museum = [[Museum of Modern Art]]
+}}
+'''''The Starry Night''''' is an oil-on-canvas painting by [[Vincent van Gogh]].
+"""
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_dump([('Mona Lisa', MONA_LISA), ('The Starry Night', STARRY_NIGHT)], 'dump.xml.bz2')
+    dataset = {'Renaissance': [{'title': 'Mona Lisa', 'artist': 'Leonardo da Vinci', 'year': '1503'},
+                               {'title': 'Lost sketch', 'artist': 'Unknown', 'year': '1500'}],
+               'Post-Impressionism': [{'title': 'The Starry Night', 'artist': 'Vincent van Gogh'}]}
+    with open('dataset.json', 'w', encoding='utf-8') as f:
+        json.dump(dataset, f)
+    # Mona Lisa's image is already downloaded
+    enricher = DumpArtEnricher(None, images_dir='images')
+    with open(f"images/{enricher.image_base_filename(dataset['Renaissance'][0])}.jpg", 'wb') as f:
+        f.write(b'\xff\xd8\xff\xd9')
+    # No network here: every image download fails, which is a transient failure
+    monkeypatch.setattr(DumpArtEnricher, 'download_image', lambda self, url, filename: False)
+    return tmp_path
+
+
+def run() -> dict:
+    enrich_dataset.main(incremental=True, cache_file=None, dump_file='dump.xml.bz2', max_retries=0)
+    with open('dataset_complete.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_edited_record_with_existing_image_keeps_its_metadata(workdir):
+    output = run()
+    mona_lisa, lost_sketch = output['Renaissance']
+    assert mona_lisa['wikipedia_url'].endswith('/Mona%20Lisa')
+    assert mona_lisa['location'] == 'Louvre'
+    assert mona_lisa['image_filename'].startswith('images/')
+    assert lost_sketch['wikipedia_url'] is None
+    
+    with open('dataset.json', encoding='utf-8') as f:
+        dataset = json.load(f)
+    dataset['Renaissance'][0]['year'] = '1503–1519'
+    with open('dataset.json', 'w', encoding='utf-8') as f:
+        json.dump(dataset, f)
+    mona_lisa = run()['Renaissance'][0]
+    assert mona_lisa['year'] == '1503–1519'
+    assert mona_lisa['wikipedia_url'].endswith('/Mona%20Lisa')
+    assert mona_lisa['description'].startswith('The Mona Lisa')
+    assert mona_lisa['medium'] == 'Oil on poplar panel'
+    
+    # Final outcomes (existing image, no article) are reused; the failed download is not
+    manifest = EnrichmentManifest('dataset_complete.manifest.json')
+    assert manifest.lookup(dataset['Renaissance'][0]) == mona_lisa
+    assert manifest.lookup(dataset['Renaissance'][1]) is not None
+    assert manifest.lookup(dataset['Post-Impressionism'][0]) is None
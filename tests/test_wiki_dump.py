@@ -0,0 +1,114 @@
+"""Checks for the offline dump reader on a generated multistream dump (run with: python -m pytest tests)."""
+
+import hashlib
+import threading
+
+import pytest
+
+from enrich_dataset import DumpArtEnricher
+from wiki_dump import MAX_REDIRECTS, WikipediaDump, commons_image_url, normalize_title, write_dump
+
+
+MONA_LISA = """{{Short description|Painting by Leonardo da Vinci}}
+{{Infobox artwork
+| image_file = Mona Lisa, by Leonardo da Vinci, from C2RMF retouched.jpg
+| title = ''Mona Lisa''
+| artist = [[Leonardo da Vinci]]
+| year = {{circa|1503}}–1506
+| medium = [[Oil painting|Oil]] on [[poplar]] panel
+| height_metric = 77
+| width_metric = 53
+| dimensions = 77 cm × 53 cm
+| museum = [[Louvre]]<ref>{{cite web|title=Mona Lisa}}</ref>
+| city = [[Paris]]
+}}
+The '''''Mona Lisa''''' is a half-length portrait painting by the Italian artist [[Leonardo da Vinci]].
+
+== History ==
+Leonardo began painting the ''Mona Lisa'' in 1503.
+"""
+
+STARRY_NIGHT = """{{Infobox artwork
+| image_file = Van Gogh - Starry Night - Google Art Project.jpg
+| artist = [[Vincent van Gogh]]
+| medium = [[Oil-on-canvas]]
+| museum = [[Museum of Modern Art]]
+}}
+'''''The Starry Night''''' is an oil-on-canvas painting by [[Vincent van Gogh]].
+"""
+
+
+@pytest.fixture
+def dump_path(tmp_path):
+    pages = [('Mona Lisa', MONA_LISA),
+             ('La Gioconda', '#REDIRECT [[Mona Lisa]]'),
+             ('Gioconda', '#REDIRECT [[La Gioconda]]'),
+             ('The Starry Night', STARRY_NIGHT)]
+    pages += [(f"Filler {number}", f"Filler article {number}.") for number in range(10)]
+    path = str(tmp_path / 'enwiki-test-pages-articles-multistream.xml.bz2')
+    # Several streams, so lookups have to seek to the right one
+    write_dump(pages, path, pages_per_stream=3)
+    return path
+
+
+def test_commons_image_url():
+    name = "Mona_Lisa,_by_Leonardo_da_Vinci,_from_C2RMF_retouched.jpg"
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()
+    url = commons_image_url("mona Lisa, by Leonardo da Vinci, from C2RMF retouched.jpg")
+    assert url.startswith(f"https://upload.wikimedia.org/wikipedia/commons/{digest[0]}/{digest[:2]}/Mona_Lisa")
+    assert url.endswith("_retouched.jpg")
+    assert normalize_title("the_starry  night") == "The starry night"
+
+
+def test_lead_text_infobox_and_image(dump_path):
+    dump = WikipediaDump(dump_path)
+    page = dump.page('Mona Lisa')
+    assert page.title == 'Mona Lisa'
+    assert page.summary.startswith("The Mona Lisa is a half-length portrait painting")
+    infobox = page.infobox
+    assert infobox['location'] == 'Louvre'
+    assert infobox['medium'] == 'Oil on poplar panel'
+    assert infobox['dimensions'] == '77 cm × 53 cm'
+    assert page.image_filename == "Mona Lisa, by Leonardo da Vinci, from C2RMF retouched.jpg"
+    assert page.image_url == commons_image_url(page.image_filename)
+
+
+def test_redirects_and_case_insensitive_fallback(dump_path):
+    dump = WikipediaDump(dump_path)
+    pages = dump.pages(['Gioconda', 'la_gioconda', 'THE STARRY NIGHT', 'Not in the dump'])
+    assert pages['Gioconda'].title == 'Mona Lisa'
+    assert pages['la_gioconda'].title == 'Mona Lisa'
+    assert pages['THE STARRY NIGHT'].title == 'The Starry Night'
+    assert pages['Not in the dump'] is None
+    # One pass over the index for all titles, plus one per redirect hop
+    assert dump.stats['index_scans'] <= 1 + MAX_REDIRECTS
+
+
+def test_dump_enricher(dump_path, tmp_path):
+    enricher = DumpArtEnricher(WikipediaDump(dump_path), images_dir=str(tmp_path / 'images'))
+    assert enricher.search_wikipedia('la gioconda') == 'Mona Lisa'
+    assert enricher.get_page_summary('Mona Lisa')['extract'].startswith("The Mona Lisa")
+    assert enricher.extract_infobox_data('The Starry Night')['location'] == 'Museum of Modern Art'
+    assert enricher.get_image_url('Mona Lisa') == commons_image_url(
+        "Mona Lisa, by Leonardo da Vinci, from C2RMF retouched.jpg")
+    assert enricher.search_wikipedia('Missing painting') is None
+
+
+def test_concurrent_misses_share_index_passes(dump_path, tmp_path):
+    dump = WikipediaDump(dump_path)
+    lookups = []
+    pages = dump.pages
+    dump.pages = lambda wanted: lookups.append(sorted(wanted)) or pages(wanted)
+    enricher = DumpArtEnricher(dump, images_dir=str(tmp_path / 'images'))
+    titles = ['Mona Lisa', 'The Starry Night', 'Gioconda', 'Missing'] * 4
+    results = {}
+    threads = [threading.Thread(target=lambda title=title: results.setdefault(title, enricher.search_wikipedia(title)))
+               for title in titles]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'Mona Lisa': 'Mona Lisa', 'The Starry Night': 'The Starry Night',
+                       'Gioconda': 'Mona Lisa', 'Missing': None}
+    # Every lookup resolves at least one title nobody had resolved yet
+    assert 1 <= len(lookups) <= len(set(titles))
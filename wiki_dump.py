@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Reader for Wikipedia pages-articles-multistream XML dumps.
+
+A multistream dump is a concatenation of independent bz2 streams of ~100
+pages each, and its companion index (offset:page_id:title per line) gives
+the byte offset of the stream holding every title. WikipediaDump scans the
+index once for all wanted titles, then seeks to and decompresses only the
+streams that contain them. Pages yield the lead summary, infobox fields and
+lead image, so enrichment needs no API calls.
+"""
+
+import bz2
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from wikitext import lead_image_filename, lead_text, parse_infobox, redirect_target
+
+
+COMMONS_UPLOAD_URL = "https://upload.wikimedia.org/wikipedia/commons"
+
+# Redirect chains followed before giving up
+MAX_REDIRECTS = 2
+
+
+def normalize_title(title: str) -> str:
+    """MediaWiki title normalization: underscores to spaces, first letter upper case."""
+    title = ' '.join(title.replace('_', ' ').split())
+    return title[:1].upper() + title[1:]
+
+
+def commons_image_url(filename: str) -> str:
+    """upload.wikimedia.org URL of a Commons file (the path is derived from the name's MD5)."""
+    name = normalize_title(filename).replace(' ', '_')
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()
+    return f"{COMMONS_UPLOAD_URL}/{digest[0]}/{digest[:2]}/{quote(name)}"
+
+
+class DumpPage:
+    """An article from the dump, with the fields enrichment needs derived lazily."""
+    
+    def __init__(self, title: str, wikitext: str):
+        self.title = title
+        self.wikitext = wikitext
+    
+    @property
+    def summary(self) -> str:
+        return lead_text(self.wikitext)
+    
+    @property
+    def infobox(self) -> Dict[str, str]:
+        return parse_infobox(self.wikitext)
+    
+    @property
+    def image_filename(self) -> Optional[str]:
+        return lead_image_filename(self.wikitext)
+    
+    @property
+    def image_url(self) -> Optional[str]:
+        """URL of the lead image, assuming it is on Commons (where nearly all free images live)."""
+        filename = self.image_filename
+        return commons_image_url(filename) if filename else None
+
+
+class WikipediaDump:
+    """Title lookups in a multistream dump through its offset index."""
+    
+    def __init__(self, dump_path: str, index_path: Optional[str] = None, cached_streams: int = 4):
+        """Open a dump.
+        
+        Args:
+            dump_path: pages-articles-multistream.xml.bz2 file.
+            index_path: Its index (default: the matching -index.txt.bz2 next to it).
+            cached_streams: Decompressed streams kept in memory for repeated lookups.
+        """
+        self.dump_path = dump_path
+        self.index_path = index_path or self.default_index_path(dump_path)
+        for path in (self.dump_path, self.index_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"dump file {path} not found")
+        self.cached_streams = cached_streams
+        self.stats = {'index_scans': 0, 'streams_read': 0, 'bytes_decompressed': 0}
+        # Normalized title -> stream offset (None: not in the dump)
+        self._offsets: Dict[str, Optional[int]] = {}
+        self._streams: "OrderedDict[int, Dict[str, str]]" = OrderedDict()
+    
+    @staticmethod
+    def default_index_path(dump_path: str) -> str:
+        """enwiki-...-multistream.xml.bz2 -> enwiki-...-multistream-index.txt.bz2"""
+        base = dump_path[:-len('.xml.bz2')] if dump_path.endswith('.xml.bz2') else dump_path
+        return base + '-index.txt.bz2'
+    
+    def _scan_index(self, titles: Set[str]) -> None:
+        """Find the stream offsets of `titles` (normalized) with one pass over the index.
+        
+        Titles not found exactly are matched case-insensitively.
+        """
+        wanted = {title for title in titles if title not in self._offsets}
+        if not wanted:
+            return
+        folded: Dict[str, List[str]] = {}
+        for title in wanted:
+            folded.setdefault(title.casefold(), []).append(title)
+        loose: Dict[str, int] = {}
+        opener = bz2.open if self.index_path.endswith('.bz2') else open
+        self.stats['index_scans'] += 1
+        with opener(self.index_path, 'rt', encoding='utf-8') as index:
+            for line in index:
+                offset, _, title = line.rstrip('\n').split(':', 2)
+                if title in wanted:
+                    self._offsets[title] = int(offset)
+                for variant in folded.get(title.casefold(), ()):
+                    loose.setdefault(variant, int(offset))
+        for title in wanted:
+            if title not in self._offsets:
+                self._offsets[title] = loose.get(title)
+    
+    def _read_stream(self, offset: int) -> Dict[str, str]:
+        """Decompress the bz2 stream at `offset` and return {title (and casefolded title): wikitext}."""
+        if offset in self._streams:
+            self._streams.move_to_end(offset)
+            return self._streams[offset]
+        decompressor = bz2.BZ2Decompressor()
+        pieces = []
+        with open(self.dump_path, 'rb') as f:
+            f.seek(offset)
+            while not decompressor.eof:
+                chunk = f.read(256 * 1024)
+                if not chunk:
+                    break
+                pieces.append(decompressor.decompress(chunk))
+        xml = b''.join(pieces).decode('utf-8')
+        self.stats['streams_read'] += 1
+        self.stats['bytes_decompressed'] += len(xml)
+        
+        pages = {}
+        position = 0
+        while True:
+            start = xml.find('<page>', position)
+            if start < 0:
+                break
+            end = xml.find('</page>', start)
+            if end < 0:
+                break
+            position = end + len('</page>')
+            page = ET.fromstring(xml[start:position])
+            title = page.findtext('title') or ''
+            text = page.findtext('revision/text') or ''
+            pages[title] = text
+            pages.setdefault(title.casefold(), text)
+        
+        self._streams[offset] = pages
+        while len(self._streams) > self.cached_streams:
+            self._streams.popitem(last=False)
+        return pages
+    
+    def _load(self, titles: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """Return {title: (title as stored, wikitext)} for the titles found, reading each stream once."""
+        by_offset: Dict[int, List[str]] = {}
+        for title in titles:
+            offset = self._offsets.get(title)
+            if offset is not None:
+                by_offset.setdefault(offset, []).append(title)
+        found = {}
+        for offset in sorted(by_offset):
+            pages = self._read_stream(offset)
+            for title in by_offset[offset]:
+                text = pages.get(title)
+                if text is None:
+                    text = pages.get(title.casefold())
+                    stored = next((t for t in pages if t.casefold() == title.casefold()), title)
+                else:
+                    stored = title
+                if text is not None:
+                    found[title] = (stored, text)
+        return found
+    
+    def pages(self, titles: Iterable[str]) -> Dict[str, Optional[DumpPage]]:
+        """Look up many titles at once, following redirects.
+        
+        Returns {requested title: DumpPage or None if not in the dump}; the
+        page's title is the article's own (after redirects).
+        """
+        requested = {title: normalize_title(title) for title in titles}
+        current = dict(requested)  # requested title -> title to look up next
+        results: Dict[str, Optional[DumpPage]] = {}
+        for _ in range(MAX_REDIRECTS + 1):
+            if not current:
+                break
+            self._scan_index(set(current.values()))
+            loaded = self._load(set(current.values()))
+            following = {}
+            for title, lookup in current.items():
+                if lookup not in loaded:
+                    results[title] = None
+                    continue
+                stored, text = loaded[lookup]
+                target = redirect_target(text)
+                if target:
+                    following[title] = normalize_title(target)
+                else:
+                    results[title] = DumpPage(stored, text)
+            current = following
+        for title in current:
+            results[title] = None  # Redirect chain too long
+        return results
+    
+    def page(self, title: str) -> Optional[DumpPage]:
+        return self.pages([title])[title]
+
+
+def write_dump(pages: List[Tuple[str, str]], dump_path: str, index_path: Optional[str] = None,
+               pages_per_stream: int = 100) -> None:
+    """Write (title, wikitext) pages as a multistream dump plus index, e.g. for test fixtures."""
+    from xml.sax.saxutils import escape
+    
+    index_path = index_path or WikipediaDump.default_index_path(dump_path)
+    index_lines = []
+    with open(dump_path, 'wb') as dump:
+        dump.write(bz2.compress(b'<mediawiki xml:lang="en">\n  <siteinfo><sitename>Wikipedia</sitename></siteinfo>\n'))
+        for start in range(0, len(pages), pages_per_stream):
+            offset = dump.tell()
+            xml = []
+            for page_id, (title, text) in enumerate(pages[start:start + pages_per_stream], start + 1):
+                index_lines.append(f"{offset}:{page_id}:{title}\n")
+                xml.append(f"  <page>\n    <title>{escape(title)}</title>\n    <ns>0</ns>\n    <id>{page_id}</id>\n"
+                           f"    <revision>\n      <text xml:space=\"preserve\">{escape(text)}</text>\n    </revision>\n"
+                           f"  </page>\n")
+            dump.write(bz2.compress(''.join(xml).encode('utf-8')))
+        dump.write(bz2.compress(b'</mediawiki>\n'))
+    with bz2.open(index_path, 'wt', encoding='utf-8') as index:
+        index.writelines(index_lines)
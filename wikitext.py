@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Wikitext helpers for extracting artwork metadata.
+
+The infobox parser walks the {{Infobox ...}} template once, splitting its
+parameters only on top-level pipes (so piped wikilinks and nested templates
+survive), and maps field aliases through a precompiled table. The lead
+helpers reduce an article's lead section to a plain-text summary and find
+its lead image, for working from raw wikitext (e.g. a dump) without the API.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# Infobox parameters naming the lead image
+IMAGE_PARAMS = ('image', 'image_file', 'image file', 'imagefile')
+
+# Output field -> infobox parameter names, in order of preference
+INFOBOX_FIELD_ALIASES = {
+    'location': ('location', 'museum', 'collection', 'repository'),
+    'dimensions': ('dimensions', 'size', 'height'),
+    'medium': ('medium',),
+    'style': ('style',),
+    'movement': ('movement',),
+}
+
+# Parameter name -> (output field, preference rank)
+_ALIAS_TABLE = {
+    alias: (field, rank)
+    for field, aliases in INFOBOX_FIELD_ALIASES.items()
+    for rank, alias in enumerate(aliases)
+}
+
+# Templates whose last positional argument is the text to keep
+_TEXT_TEMPLATES = {'nowrap', 'nobr', 'lang', 'small', 'not a typo', 'transl'}
+
+# Range words used between the numbers of a {{convert}} template
+_CONVERT_JOINERS = {'x': '×', 'by': '×', '×': '×', '-': '–', '–': '–', 'to': 'to', 'and': 'and'}
+
+_INFOBOX_START_RE = re.compile(r'\{\{\s*infobox[\s_]', re.IGNORECASE)
+# Flat templates/links are matched whole so their pipes never need looking at
+_TOKEN_RE = re.compile(r'\{\{[^{}]*\}\}|\[\[[^\[\]]*\]\]|\{\{|\}\}|\[\[|\]\]|\||<!--.*?(?:-->|$)', re.DOTALL)
+_COMMENT_RE = re.compile(r'<!--.*?(?:-->|$)', re.DOTALL)
+_REF_RE = re.compile(r'<ref[^>]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+_BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+_TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+_EXTERNAL_LINK_RE = re.compile(r'\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]')
+_QUOTES_RE = re.compile(r"'{2,}")
+_SPACE_RE = re.compile(r'[ \t\r\n]+')
+_SEPARATORS_RE = re.compile(r'(?:\s*,\s*){2,}')
+_NUMBER_RE = re.compile(r'^[\d.,]+$')
+_REDIRECT_RE = re.compile(r'^\s*#redirect\s*:?\s*\[\[([^\]|#]+)', re.IGNORECASE)
+_HEADING_RE = re.compile(r'^==[^=\n].*$', re.MULTILINE)
+_FILE_LINK_RE = re.compile(r'\[\[\s*(?:file|image)\s*:', re.IGNORECASE)
+_FILE_PREFIX_RE = re.compile(r'^\s*(?:\[\[)?\s*(?:file|image)\s*:\s*', re.IGNORECASE)
+# Separators left inside parentheses once pronunciation/language templates are dropped
+_PAREN_OPEN_RE = re.compile(r'\(\s*(?:[;,]\s*)+')
+_PAREN_CLOSE_RE = re.compile(r'(?:\s*[;,])+\s*\)')
+_EMPTY_PARENS_RE = re.compile(r'\s*\(\s*\)')
+_IMAGE_NAME_RE = re.compile(r'\.(?:jpe?g|png|gif|webp|tiff?)$', re.IGNORECASE)
+
+
+def _scan(text: str, start: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """Scan a template starting at text[start] ('{{').
+    
+    Returns (end offset just past the closing '}}', spans of its top-level
+    segments). Links and nested templates are skipped as units.
+    """
+    depth = 1
+    links = 0
+    segment_start = start + 2
+    segments = []
+    for match in _TOKEN_RE.finditer(text, start + 2):
+        token = match.group()
+        if len(token) > 2 and token[0] != '<':
+            continue  # A whole nested template or link
+        if token == '{{':
+            depth += 1
+        elif token == '}}':
+            depth -= 1
+            if depth == 0:
+                segments.append((segment_start, match.start()))
+                return match.end(), segments
+        elif token == '[[':
+            links += 1
+        elif token == ']]':
+            links = max(0, links - 1)
+        elif token == '|' and depth == 1 and links == 0:
+            segments.append((segment_start, match.start()))
+            segment_start = match.end()
+    # Unterminated template: treat the rest of the text as its body
+    segments.append((segment_start, len(text)))
+    return len(text), segments
+
+
+def find_infobox(wikitext: str) -> Optional[Dict[str, str]]:
+    """Return the raw parameters of the first {{Infobox ...}} template.
+    
+    Keys are lower-cased and stripped; values are left as raw wikitext.
+    Returns None if the page has no infobox.
+    """
+    match = _INFOBOX_START_RE.search(wikitext)
+    if not match:
+        return None
+    _, segments = _scan(wikitext, match.start())
+    params = {}
+    for seg_start, seg_end in segments[1:]:  # First segment is the template name
+        segment = wikitext[seg_start:seg_end]
+        key, sep, value = segment.partition('=')
+        if sep:
+            params.setdefault(key.strip().lower(), value)
+    return params
+
+
+def _convert_text(args: List[str]) -> str:
+    """Render {{convert|77|x|53|cm|in}} as '77 × 53 cm' (the source measurement only)."""
+    words = []
+    for arg in args:
+        arg = arg.strip()
+        if '=' in arg:
+            break
+        if _NUMBER_RE.match(arg):
+            words.append(arg)
+        elif arg.lower() in _CONVERT_JOINERS and words:
+            words.append(_CONVERT_JOINERS[arg.lower()])
+        else:
+            words.append(arg)  # Source unit; anything after it is the conversion target
+            break
+    return ' '.join(words)
+
+
+def _expand_templates(value: str) -> str:
+    """Replace nested templates with their text where it is meaningful, otherwise drop them."""
+    while '{{' in value:
+        start = value.find('{{')
+        end, segments = _scan(value, start)
+        name = value[segments[0][0]:segments[0][1]].strip().lower()
+        args = [value[a:b] for a, b in segments[1:]]
+        replacement = ''
+        if name in _TEXT_TEMPLATES and args:
+            replacement = args[-1]
+        elif name in ('convert', 'cvt') and args:
+            replacement = _convert_text(args)
+        elif name in ('circa', 'c.') and args:
+            replacement = f"c. {args[0].strip()}"
+        value = value[:start] + replacement + value[end:]
+    return value
+
+
+def _replace_links(value: str) -> str:
+    """Turn [[target|label]] into label and [[target]] into target."""
+    out = []
+    pos = 0
+    while True:
+        start = value.find('[[', pos)
+        if start < 0:
+            break
+        end = value.find(']]', start)
+        if end < 0:
+            break
+        out.append(value[pos:start])
+        inner = value[start + 2:end]
+        if inner.startswith('[['):
+            inner = inner[2:]
+        out.append(inner.rsplit('|', 1)[-1])
+        pos = end + 2
+    out.append(value[pos:])
+    return ''.join(out)
+
+
+def clean_value(value: str) -> str:
+    """Reduce an infobox parameter value to plain text."""
+    has_markup = '<' in value
+    if has_markup:
+        value = _COMMENT_RE.sub('', value)
+        value = _REF_RE.sub('', value)
+        value = _BR_RE.sub(', ', value)
+    if '{{' in value:
+        value = _expand_templates(value)
+    if '[[' in value:
+        value = _replace_links(value)
+    if '[' in value:
+        value = _EXTERNAL_LINK_RE.sub(r'\1', value)
+    if has_markup:
+        value = _TAG_RE.sub('', value)
+    if "''" in value:
+        value = _QUOTES_RE.sub('', value)
+    value = _SPACE_RE.sub(' ', value)
+    if ',' in value:
+        value = _SEPARATORS_RE.sub(', ', value)
+    return value.strip(' ,;')
+
+
+def parse_infobox(wikitext: str) -> Dict[str, str]:
+    """Extract location, dimensions, medium, style and movement from an article's infobox."""
+    params = find_infobox(wikitext)
+    if not params:
+        return {}
+    best = {}
+    for key, raw in params.items():
+        alias = _ALIAS_TABLE.get(key)
+        if alias is None:
+            continue
+        field, rank = alias
+        if field in best and best[field][0] <= rank:
+            continue
+        value = clean_value(raw)
+        if value:
+            best[field] = (rank, value)
+    return {field: value for field, (rank, value) in best.items()}
+
+
+def redirect_target(wikitext: str) -> Optional[str]:
+    """Return the target title of a #REDIRECT page, or None."""
+    match = _REDIRECT_RE.match(wikitext)
+    return match.group(1).strip().replace('_', ' ') if match else None
+
+
+def _file_link_spans(text: str) -> List[Tuple[int, int]]:
+    """Spans of [[File:...]] / [[Image:...]] links, including links nested in their captions."""
+    spans = []
+    for match in _FILE_LINK_RE.finditer(text):
+        if spans and match.start() < spans[-1][1]:
+            continue  # Inside the previous file link's caption
+        depth = 0
+        pos = match.start()
+        while pos < len(text):
+            if text.startswith('[[', pos):
+                depth += 1
+                pos += 2
+            elif text.startswith(']]', pos):
+                depth -= 1
+                pos += 2
+                if depth == 0:
+                    break
+            else:
+                pos += 1
+        spans.append((match.start(), pos))
+    return spans
+
+
+def _image_name(value: str) -> Optional[str]:
+    """Normalize an image reference ('File:X.jpg', '[[File:X.jpg|thumb]]' or 'X.jpg') to 'X.jpg'."""
+    value = _FILE_PREFIX_RE.sub('', _COMMENT_RE.sub('', value)).split('|')[0].strip(' []\n')
+    if not value or not _IMAGE_NAME_RE.search(value):
+        return None  # Empty, or SVG and other non-photo formats
+    return value.replace('_', ' ')
+
+
+def lead_image_filename(wikitext: str) -> Optional[str]:
+    """Return the lead image's file name (without 'File:'): the infobox image, else the first image in the lead."""
+    params = find_infobox(wikitext) or {}
+    for key in IMAGE_PARAMS:
+        if params.get(key):
+            name = _image_name(params[key])
+            if name:
+                return name
+    heading = _HEADING_RE.search(wikitext)
+    lead = wikitext[:heading.start()] if heading else wikitext
+    for start, end in _file_link_spans(lead):
+        name = _image_name(lead[start:end])
+        if name:
+            return name
+    return None
+
+
+def lead_text(wikitext: str) -> str:
+    """Reduce the lead section to plain text: its first paragraph, like the REST summary extract."""
+    heading = _HEADING_RE.search(wikitext)
+    lead = wikitext[:heading.start()] if heading else wikitext
+    lead = _REF_RE.sub('', _COMMENT_RE.sub('', lead))
+    if '{{' in lead:
+        lead = _expand_templates(lead)
+    spans = _file_link_spans(lead)
+    for start, end in reversed(spans):
+        lead = lead[:start] + lead[end:]
+    for paragraph in re.split(r'\n\s*\n', lead):
+        # Skip table and list debris left around the templates
+        if paragraph.lstrip().startswith(('{|', '|', '!', '*', '#', ':', ';')):
+            continue
+        text = _replace_links(paragraph)
+        text = _EXTERNAL_LINK_RE.sub(r'\1', text)
+        text = _TAG_RE.sub('', text)
+        text = _QUOTES_RE.sub('', text)
+        text = _SPACE_RE.sub(' ', text)
+        if '(' in text:
+            text = _EMPTY_PARENS_RE.sub('', _PAREN_CLOSE_RE.sub(')', _PAREN_OPEN_RE.sub('(', text)))
+        text = text.strip()
+        if text:
+            return text
+    return ''